@@ -1,3 +1,8 @@
 from .heuristic import get_conv_action, get_convolution_heuristic, compute_score
 from .state import State
+from .knowledge import TreeKnowledge
 from .mcts import Connect4MCTS
+from .tree import ArrayTree
+from .array_mcts import Connect4ArrayMCTS
+from .parallel import RootParallelMCTS
+from .tree_parallel import Connect4TreeParallelMCTS
@@ -0,0 +1,314 @@
+import numpy as np
+import math
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+from agents.common import PlayerAction
+from agents.bitboard import BitBoard, CELL_BITS
+from agents.evaluation import evaluate_boards
+from agents.playout import random_playouts
+
+from agents.agent_mcts.mcts import Connect4MCTS, playout_score
+from agents.agent_mcts.heuristic import get_conv_action
+from agents.agent_mcts.tree import ArrayTree, NO_NODE
+
+# arguments of Connect4MCTS that only apply to its State tree, with their defaults
+_STATE_TREE_ONLY = {
+    'max_nodes': None, 'max_bytes': None, 'memory_policy': 'prune', 'ponder': False, 'prior': None,
+    'transpositions': False
+}
+
+
+class Connect4ArrayMCTS(Connect4MCTS):
+    def __init__(
+            self,
+            *args,
+            capacity: int = 1024,
+            batch_size: int = 1,
+            batch_evaluation: str = 'playout',
+            heuristic_scale: float = 200.,
+            **kwargs):
+        """
+        Connect4MCTS on an ArrayTree: nodes are indices into preallocated arrays instead of State objects, and
+        selection, expansion and backpropagation work on those indices. Rollouts always run on BitBoards.
+        Takes the arguments of Connect4MCTS, except those that only apply to its State tree.
+
+        :type capacity: number of nodes preallocated by the tree, it grows geometrically beyond that
+        :type batch_size: number of leaves selected with virtual loss and evaluated together per round.
+            One leaf per iteration as in Connect4MCTS if 1
+        :type batch_evaluation: how batched leaves are evaluated, 'playout' for max(1, playouts_per_leaf)
+            vectorized random playouts per leaf, 'heuristic' for the line heuristic mapped to a win probability
+        :type heuristic_scale: heuristic value at which the 'heuristic' evaluation gives a win probability of 0.73
+        :type self.iterations: number of iterations (evaluated leaves) of the last move
+        :type self.iterations_per_second: iterations of the last move divided by its wall-clock time
+        """
+        for name, default in _STATE_TREE_ONLY.items():
+            if kwargs.get(name, default) != default:
+                raise ValueError(f'{name} is only supported by the State tree of Connect4MCTS')
+        super().__init__(*args, **kwargs)
+        if batch_evaluation not in ('playout', 'heuristic'):
+            raise ValueError(f'unknown batch_evaluation {batch_evaluation}')
+        self._batch_size = batch_size
+        self._batch_evaluation = batch_evaluation
+        self._heuristic_scale = heuristic_scale
+        self.iterations = 0
+        self.iterations_per_second = 0.
+        self._capacity = capacity
+        self._tree = ArrayTree(capacity)
+        self._root = self._tree.add_root(0, 0)
+
+    def get_tree(self) -> ArrayTree:
+        """
+        Getter function returning the search tree
+
+        :return: tree, its root is index 0
+        """
+        return self._tree
+
+    def flush_tree(self) -> None:
+        """
+        Resetting the tree to a blank board. Used this when changing player
+
+        :return: None
+        """
+        self._tree = ArrayTree(self._capacity)
+        self._root = self._tree.add_root(0, 0)
+
+    def tree_size(self) -> Tuple[int, int]:
+        """
+        Current size of the tree
+
+        :return: tuple of the number of nodes and the bytes of the used part of the arrays
+        """
+        tree = self._tree
+        return len(tree), tree.nbytes * len(tree) // tree.capacity
+
+    def set_current_board(self, board: np.ndarray) -> None:
+        """
+        Set the current board state in which agent would base the decision on.
+        If board state has been simulated before, its subtree is kept and becomes the new tree
+
+        :param board: current board state
+        :return: None
+        """
+        bitboard = BitBoard.from_array(board, self._player)
+        node = self._tree.find(bitboard.position, bitboard.mask)
+
+        if node == NO_NODE:
+            self._tree = ArrayTree(self._capacity)
+            self._tree.add_root(bitboard.position, bitboard.mask)
+        elif node != self._root:
+            self._tree = self._tree.subtree(node)
+
+    def evaluate_node(self, node: int) -> float:
+        """
+        Simulating a game starting from a node
+
+        :param node: index of the node
+        :return: playout score for the agent
+        """
+        bitboard = self._tree.bitboard(node, self._player)
+        if self._tree.terminal[node]:
+            return playout_score(
+                bitboard.check_end_state(self._player), bitboard.check_end_state(self._competing_player)
+            )
+        return self.play_out(bitboard)
+
+    def rollout_node(self, node: int) -> None:
+        """
+        Simulating a game starting from a node and adding the result to the node and its ancestors
+
+        :param node: index of the node
+        :return: None
+        """
+        if self._batch_playouts() and not self._tree.terminal[node]:
+            score, playouts = self.play_out_batch(self._tree.bitboard(node, self._player))
+            self._tree.backpropagate(node, score, playouts=playouts)
+        else:
+            self._tree.backpropagate(node, self.evaluate_node(node))
+
+    def expand_node(self, node: int) -> None:
+        """
+        Same expansion as Connect4MCTS.expand, adding the children of a node as one block
+
+        :param node: index of the node
+        :return: None
+        """
+        if self._tree.terminal[node]:
+            return
+
+        game = self._tree.bitboard(node, self._player)
+        policy = self._line_policy(game.to_array())
+        pieces, masks, actions, terminal = [], [], [], []
+
+        def add(action: PlayerAction, is_terminal: bool) -> None:
+            pieces.append(game.pieces(self._player))
+            masks.append(game.mask)
+            actions.append(action)
+            terminal.append(is_terminal)
+
+        for action in game.valid_actions():
+            game.play(action)
+
+            if game.is_win() or game.is_full():
+                add(action, True)
+            elif policy is not None:
+                policy.play(action, self._player)
+                game.play(policy.choose(self._competing_player))
+                add(action, game.is_win() or game.is_full())
+                game.undo()
+                policy.undo(action, self._player)
+            elif self._use_heuristic:
+                game.play(get_conv_action(game.to_array(), self._competing_player))
+                add(action, game.is_win() or game.is_full())
+                game.undo()
+            else:
+                actions_2 = game.valid_actions()
+                np.random.shuffle(actions_2)
+                for action2 in actions_2[:self._expansion_rate]:
+                    game.play(action2)
+                    add(action, game.is_win() or game.is_full())
+                    game.undo()
+
+            game.undo()
+
+        self._tree.add_children(node, pieces, masks, actions, terminal)
+
+    def select_leaf(self) -> int:
+        """
+        Selects children by UCB1 down to a leaf. A leaf that already has a finished playout is expanded and its
+        first child returned instead. A leaf whose only playouts are still pending is returned as it is
+
+        :return: index of the node to roll out
+        """
+        tree = self._tree
+        if tree.is_leaf(self._root):
+            self.expand_node(self._root)
+
+        node = self._root
+        while not tree.is_leaf(node):
+            node = tree.select_child(node, self._c, math.log(max(tree.visits[self._root], 1)))
+
+        if tree.playouts(node) > 0:
+            self.expand_node(node)
+            if not tree.is_leaf(node):
+                node = int(tree.first_child[node])
+        return node
+
+    def iterate(self) -> None:
+        """
+        The mcts algorithm on the array tree. Selects a leaf, rolls it out and backpropagates the result.
+
+        :return: None
+        """
+        self.rollout_node(self.select_leaf())
+
+    def evaluate_batch(self, nodes: Sequence[int]) -> (np.ndarray, np.ndarray):
+        """
+        Evaluates a batch of leaves with one vectorized call. Terminal leaves get their exact result
+
+        :param nodes: indices of the leaves
+        :return: tuple of summed scores for the agent and number of playouts, one entry per leaf
+        """
+        tree = self._tree
+        nodes = np.asarray(nodes)
+        terminal = tree.terminal[nodes]
+        scores = np.zeros(nodes.shape[0])
+        playouts = np.ones(nodes.shape[0], dtype=np.int64)
+
+        for i in np.flatnonzero(terminal):
+            scores[i] = self.evaluate_node(int(nodes[i]))
+
+        open_nodes = nodes[~terminal]
+        if open_nodes.size == 0:
+            return scores, playouts
+
+        pieces = tree.pieces[open_nodes]
+        masks = tree.masks[open_nodes]
+        if self._batch_evaluation == 'playout':
+            n = max(1, self._playouts_per_leaf)
+            counts = random_playouts(pieces, masks, n)
+            scores[~terminal] = counts[:, 0] + 0.5 * counts[:, 1]
+            playouts[~terminal] = n
+        else:
+            own = (CELL_BITS & pieces[:, None, None]) != 0
+            other = (CELL_BITS & (pieces ^ masks)[:, None, None]) != 0
+            boards = own.astype(np.int8) - other.astype(np.int8)  # agent as 1, competing player as -1
+            values = evaluate_boards(boards, 1)
+            scores[~terminal] = 1 / (1 + np.exp(-values / self._heuristic_scale))
+        return scores, playouts
+
+    def iterate_batch(self, batch_size: int) -> int:
+        """
+        Selects up to batch_size leaves, each with a virtual loss on its path so that the next selection
+        spreads out, evaluates them together and backpropagates all results
+
+        :param batch_size: number of leaves
+        :return: number of leaves evaluated
+        """
+        tree = self._tree
+        nodes = []
+        for _ in range(batch_size):
+            node = self.select_leaf()
+            tree.add_virtual_loss(node, 1)
+            nodes.append(node)
+
+        scores, playouts = self.evaluate_batch(nodes)
+        for node, score, n in zip(nodes, scores, playouts):
+            tree.backpropagate(node, score, virtual_loss=1, playouts=int(n))
+        return len(nodes)
+
+    def run_iteration(self, deadline: Optional[float] = None) -> None:
+        """
+        Run iteration of mcts algorithm, in batches of _batch_size leaves if it is bigger than 1.
+        Stop when whether time _max_t is up, _max_iter leaves are evaluated or the deadline has passed, and with
+        _early_stop once the move is decided. The clock is read every _check_every iterations only
+
+        :param deadline: time.time() by which the search has to stop, on top of the budget of the agent
+        :return: None
+        """
+        start = time.time()
+        deadline = self._deadline(start, deadline)
+        self.iterations = 0
+        self.stopped_early = False
+        next_check = self._check_every
+        while self._time_curb or self.iterations < self._max_iter:
+            if self._batch_size <= 1:
+                self.iterate()
+                self.iterations += 1
+            elif self._time_curb:
+                self.iterations += self.iterate_batch(self._batch_size)
+            else:
+                self.iterations += self.iterate_batch(min(self._batch_size, self._max_iter - self.iterations))
+
+            if self.iterations >= next_check:
+                next_check = self.iterations + self._check_every
+                if self._budget_spent(start, deadline):
+                    break
+        elapsed = time.time() - start
+        self.iterations_per_second = self.iterations / elapsed if elapsed > 0 else 0.
+
+    def action_visits(self) -> Dict[PlayerAction, int]:
+        """
+        Visits of the root's children summed per move of the agent
+
+        :return: dictionary of action to visits
+        """
+        tree = self._tree
+        visits = {}
+        for child in tree.children(self._root):
+            action = PlayerAction(tree.actions[child])
+            visits[action] = visits.get(action, 0) + int(tree.visits[child])
+        return visits
+
+    def choose_action(self) -> PlayerAction:
+        """
+        Choose the action of the root's child with the highest mean score, or the most visited action with
+        _early_stop, see is_decided
+
+        :return: action for the agent
+        """
+        if self._early_stop and not self._tree.is_leaf(self._root):
+            visits = self.action_visits()
+            return PlayerAction(max(visits, key=visits.get))
+        return PlayerAction(self._tree.actions[self._tree.best_child(self._root)])
@@ -1,9 +1,12 @@
 import numpy as np
 
-from agents.common import BoardPiece, PlayerAction, PLAYER1, PLAYER2
-from agents.common import apply_player_action,  check_valid_action
+from agents.common import BoardPiece, PlayerAction, NO_PLAYER, PLAYER1
+from agents.common import Board
+from agents.evaluation import evaluate_board, line_sums, LineEvaluator, CELL_LINES, LINE_SCORES, ROWS, COLS
 
-from scipy.signal import convolve2d
+# plain python copies, indexing lists is much cheaper than indexing small arrays in the rollout loop
+_CELL_LINES = [tuple(lines.tolist()) for lines in CELL_LINES]
+_LINE_SCORES = LINE_SCORES.tolist()
 
 
 def compute_score(convolved_board: np.ndarray) -> float:
@@ -28,69 +31,108 @@ def compute_score(convolved_board: np.ndarray) -> float:
 
 def get_convolution_heuristic(board: np.ndarray, player: BoardPiece) -> float:
     """
-    get the heuristic value based on convolutions of kernels
+    get the heuristic value of all four-cell lines, equal to the sum of compute_score over convolutions of
+    vertical, horizontal and diagonal kernels
 
     :param board: current board state
     :param player: currently playing player
     :return: heuristic value
     """
-    board_tr = np.zeros_like(board)
-
-    kernel_v = np.ones((4, 1), dtype=int)
-    kernel_h = np.ones((1, 4), dtype=int)
-
-    kernel_dl = np.zeros((4, 4), dtype=int)
-    np.fill_diagonal(kernel_dl, val=1)
-
-    kernel_dr = np.flipud(kernel_dl)
-
-    if player == PLAYER1:
-        board_tr[board == PLAYER1] = 1
-        board_tr[board == PLAYER2] = -1
-    else:
-        board_tr[board == PLAYER1] = -1
-        board_tr[board == PLAYER2] = 1
-
-    ret = 0
-    conv_v = convolve2d(kernel_v, board_tr, mode='valid')
-    ret += compute_score(conv_v)
-
-    conv_h = convolve2d(kernel_h, board_tr, mode='valid')
-    ret += compute_score(conv_h)
-
-    conv_dl = convolve2d(kernel_dl, board_tr, mode='valid')
-    ret += compute_score(conv_dl)
-
-    conv_dr = convolve2d(kernel_dr, board_tr, mode='valid')
-    ret += compute_score(conv_dr)
-
-    return ret
+    return evaluate_board(board, player)
 
 
 def get_conv_action(board: np.ndarray, player: BoardPiece) -> PlayerAction:
     """
-    get the action that returns the biggest heuristic
+    get the action that returns the biggest heuristic. Candidate moves are scored by the change of the heuristic
+    on the lines through their landing cell
 
     :param board: current board state
     :param player: currently turning player
     :return: action that maximizes the convolution heuristic
     """
 
-    actions = np.arange(7).tolist()
+    game = Board(board, player)
+    evaluator = LineEvaluator(board, player)
+    rows = board.shape[0]
 
     h_val = -np.inf
     chosen_action = -1
 
-    for action in actions:
-        if check_valid_action(board, action):
-            new_board = apply_player_action(board, action, player, copy=True)
-            cur_h_val = get_convolution_heuristic(new_board, player)
+    for action in game.valid_actions():
+        cur_h_val = evaluator.delta(rows - 1 - game.heights[action], action, player)
 
-            if cur_h_val > h_val:
-                chosen_action = action
-                h_val = cur_h_val
+        if cur_h_val > h_val:
+            chosen_action = action
+            h_val = cur_h_val
 
     return chosen_action
 
 
-
+class GreedyLinePolicy:
+    def __init__(self, board: np.ndarray, player: BoardPiece = PLAYER1):
+        """
+        Picks the same moves as get_conv_action, but keeps the line sums and column heights between moves,
+        so that a move only touches the lines through its cell instead of rebuilding the evaluation
+
+        :param board: board of shape (6, 7) the policy starts from
+        :param player: player whose perspective the line sums take, either player can be moved
+        :type self.sums: list of line sums, see line_sums
+        :type self.heights: number of pieces in each column
+        """
+        self.player = player
+        self.sums = line_sums(board, player).tolist()
+        self.heights = (board != NO_PLAYER).sum(axis=0).tolist()
+
+    def delta(self, action: PlayerAction, piece: BoardPiece) -> int:
+        """
+        Change of the heuristic for `piece` if it is dropped into column `action`
+
+        :param action: column that is not full
+        :param piece: BoardPiece to drop
+        :return: heuristic difference from the perspective of `piece`
+        """
+        step = 1 if piece == self.player else -1
+        ret = 0
+        for line in _CELL_LINES[(ROWS - 1 - self.heights[action]) * COLS + action]:
+            line_sum = self.sums[line] + 4
+            ret += _LINE_SCORES[line_sum + step] - _LINE_SCORES[line_sum]
+        return ret * step
+
+    def choose(self, piece: BoardPiece) -> PlayerAction:
+        """
+        :param piece: BoardPiece to move
+        :return: column with the biggest heuristic gain, the first one on ties
+        """
+        chosen_action = -1
+        h_val = -np.inf
+        for action in range(COLS):
+            if self.heights[action] < ROWS:
+                cur_h_val = self.delta(action, piece)
+                if cur_h_val > h_val:
+                    chosen_action = action
+                    h_val = cur_h_val
+        return chosen_action
+
+    def play(self, action: PlayerAction, piece: BoardPiece) -> None:
+        """
+        Updates the line sums for `piece` dropped into column `action`
+
+        :param action: column that is not full
+        :param piece: BoardPiece dropped
+        """
+        step = 1 if piece == self.player else -1
+        for line in _CELL_LINES[(ROWS - 1 - self.heights[action]) * COLS + action]:
+            self.sums[line] += step
+        self.heights[action] += 1
+
+    def undo(self, action: PlayerAction, piece: BoardPiece) -> None:
+        """
+        Takes back the last piece dropped into column `action`
+
+        :param action: column
+        :param piece: BoardPiece removed
+        """
+        self.heights[action] -= 1
+        step = 1 if piece == self.player else -1
+        for line in _CELL_LINES[(ROWS - 1 - self.heights[action]) * COLS + action]:
+            self.sums[line] -= step
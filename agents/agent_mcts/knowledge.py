@@ -0,0 +1,144 @@
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+from agents.common import BoardPiece
+from agents.bitboard import BitBoard
+from agents.opening_book import EMPTY_KEY, canonical_key, hash_slot
+
+from agents.agent_mcts.state import State
+
+KNOWLEDGE_DTYPE = np.dtype([('key', '<u8'), ('visits', '<u4'), ('score', '<f4')])
+
+
+class TreeKnowledge:
+    def __init__(self, table: np.ndarray, path: Optional[str] = None):
+        """
+        Visits and scores of searched positions stored in an open addressing hash table with linear probing,
+        the same layout as OpeningBook. The table is a structured array of KNOWLEDGE_DTYPE, usually memory-mapped
+        from a .npy file, and holds every position only once for itself and its mirror image.
+        Scores are from the perspective of the player to move, who is the agent in every node of the tree.
+
+        :param table: array whose length is a power of two
+        :param path: file the table is memory-mapped from. Pickling then passes the path instead of the table,
+            so that worker processes map the same pages
+        """
+        self._table = table
+        self._bits = int(len(table)).bit_length() - 1
+        self._path = path
+
+    def __reduce__(self):
+        if self._path is not None:
+            return TreeKnowledge.load, (self._path, True)
+        return TreeKnowledge, (np.asarray(self._table),)
+
+    @classmethod
+    def from_stats(cls, stats: Dict[int, Tuple[int, float]]) -> 'TreeKnowledge':
+        """
+        Builds the hash table from a dictionary of canonical keys and statistics
+
+        :param stats: dictionary of canonical_key to visits and summed score
+        :return: TreeKnowledge holding the statistics, at most half full
+        """
+        bits = max(1, (2 * len(stats) - 1).bit_length())
+        table = np.zeros(1 << bits, dtype=KNOWLEDGE_DTYPE)
+        table['key'] = EMPTY_KEY
+
+        size_mask = (1 << bits) - 1
+        for key, (visits, score) in stats.items():
+            slot = hash_slot(key, bits)
+            while table['key'][slot] != EMPTY_KEY:
+                slot = (slot + 1) & size_mask
+            table[slot] = (key, min(visits, np.iinfo(np.uint32).max), score)
+
+        return cls(table)
+
+    @classmethod
+    def from_tree(cls, root: State, player: BoardPiece, min_visits: int = 1) -> 'TreeKnowledge':
+        """
+        Collects the statistics of every node of a search tree with at least min_visits visits. Positions that
+        occur more than once, as transpositions or mirror images, keep the statistics of their most visited node.
+        Summing them would count the same visits again on every save, as all of those nodes get the stored
+        statistics back when they are warm-started
+
+        :param root: root of the tree
+        :param player: BoardPiece of the agent that grew the tree
+        :param min_visits: visits below which a node and its subtree are left out
+        :return: TreeKnowledge
+        """
+        stats = {}
+        seen = {id(root)}
+        stack = [root]
+        while stack:
+            state = stack.pop()
+            if state.get_n() < min_visits:
+                continue
+            key, _ = canonical_key(BitBoard.from_array(state.get_board(), player))
+            if state.get_n() > stats.get(key, (0, 0.))[0]:
+                stats[key] = (state.get_n(), state.get_score())
+            for child in state.get_children():
+                if id(child) not in seen:
+                    seen.add(id(child))
+                    stack.append(child)
+
+        return cls.from_stats(stats)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'TreeKnowledge':
+        """
+        Loads statistics written by save
+
+        :param path: .npy file
+        :param mmap: memory-map the file read-only instead of reading it, so processes share the pages
+        :return: TreeKnowledge
+        """
+        if mmap:
+            return cls(np.load(path, mmap_mode='r'), path)
+        return cls(np.load(path))
+
+    def save(self, path: str) -> None:
+        """
+        Writes the hash table as .npy file
+
+        :param path: file name
+        :return: None
+        """
+        np.save(path, np.asarray(self._table))
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._table['key'] != EMPTY_KEY))
+
+    @property
+    def nbytes(self) -> int:
+        """
+        :return: size of the table in bytes
+        """
+        return int(self._table.nbytes)
+
+    def lookup(self, bitboard: BitBoard) -> Optional[Tuple[int, float]]:
+        """
+        Looks up the statistics of a position or of its mirror image
+
+        :param bitboard: position
+        :return: tuple of visits and summed score for the player to move, None if the position is not stored
+        """
+        key, _ = canonical_key(bitboard)
+        size_mask = (1 << self._bits) - 1
+        slot = hash_slot(key, self._bits)
+        while True:
+            entry = self._table[slot]
+            stored = int(entry['key'])
+            if stored == key:
+                return int(entry['visits']), float(entry['score'])
+            if stored == EMPTY_KEY:
+                return None
+            slot = (slot + 1) & size_mask
+
+    def lookup_board(self, board: np.ndarray, player: BoardPiece) -> Optional[Tuple[int, float]]:
+        """
+        Same as lookup for an ndarray board
+
+        :param board: board state
+        :param player: BoardPiece of the player to move
+        :return: tuple of visits and summed score for the player to move, None if the position is not stored
+        """
+        return self.lookup(BitBoard.from_array(board, player))
@@ -1,17 +1,41 @@
 import numpy as np
-from typing import Optional, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from agents.common import BoardPiece, SavedState, PLAYER1, PLAYER2, NO_PLAYER, PlayerAction
-from agents.common import apply_player_action, check_end_state, check_valid_action
+from agents.common import check_end_state, Board
 from agents.common import GameState
+from agents.bitboard import BitBoard
+from agents.playout import random_playouts
+from agents.solver import Solver, solve_endgame, SOLVER_THRESHOLD
+from agents.opening_book import OpeningBook
 
 from agents.agent_mcts import State
+from agents.agent_mcts.state import board_key
 from agents.agent_mcts import get_conv_action
+from agents.agent_mcts.heuristic import GreedyLinePolicy
+from agents.agent_mcts.knowledge import TreeKnowledge
 
 import math
+import threading
 import time
 
 
+def playout_score(end_game_state: GameState, competing_state: GameState) -> float:
+    """
+    Score of a finished game for the agent. check_end_state reports IS_DRAW for a full board whenever the player
+    it is asked for has no four in a row, so the last cell may well have been filled by a win of the other player
+
+    :param end_game_state: check_end_state of the finished game for the agent
+    :param competing_state: check_end_state of the finished game for the competing player
+    :return: 1 for a win, 0.5 for a draw and 0 for a loss
+    """
+    if end_game_state == GameState.IS_WIN:
+        return 1  # agent winning the game
+    if competing_state == GameState.IS_WIN:
+        return 0
+    return 0.5
+
+
 class Connect4MCTS:
     def __init__(
             self,
@@ -19,7 +43,20 @@ class Connect4MCTS:
             expansion_rate: int = 1,
             curb_iter_time: bool = False,
             max_t: float = 2,
-            max_iter: int = 100):
+            max_iter: int = 100,
+            use_bitboard: bool = False,
+            solver_threshold: int = SOLVER_THRESHOLD,
+            book: Optional[OpeningBook] = None,
+            playouts_per_leaf: int = 1,
+            fast_heuristic: bool = False,
+            ponder: bool = False,
+            transpositions: bool = False,
+            check_every: int = 16,
+            early_stop: bool = False,
+            prior: Optional[TreeKnowledge] = None,
+            max_nodes: Optional[int] = None,
+            max_bytes: Optional[int] = None,
+            memory_policy: str = 'prune'):
         """
         Implementation of a Monte-Carlo tree search agent on  game of connect 4
 
@@ -30,6 +67,42 @@ class Connect4MCTS:
         :type max_t: maximum time in second. iteration stops when t > max_t
         :type max_iter: number of maximum iteration
         :type curb_iter_time: use time limit instead of iteration number
+        :type use_bitboard: simulate rollouts on a BitBoard instead of ndarray copies
+        :type solver_threshold: play the move of the exact solver instead of searching when at most this many cells
+            are empty, 0 never solves
+        :type book: opening book, its move is played without searching if the position is in it
+        :type playouts_per_leaf: number of random playouts per rollout. More than one are played at once by the
+            vectorized random_playouts and counted as that many visits. Only valid if use_heuristic is False
+        :type fast_heuristic: pick the heuristic moves of rollouts and expansion with a GreedyLinePolicy that is
+            updated move by move instead of calling get_conv_action on every board. Same moves, much faster.
+            Only valid if use_heuristic is True
+        :type ponder: keep searching in a background thread after a move is returned, until the next move is asked
+            for or the budget of a move is used up. The tree below the chosen move is then reused.
+            The thread shares the GIL with the rest of the process, so it only adds search time while the process
+            waits outside of Python, e.g. for a human or another process. Against an agent in the same process it
+            takes its time from the opponent's search. Public methods that change the tree stop it first.
+            Only supported by the State tree of Connect4MCTS itself, not by its subclasses
+        :type transpositions: share the node of a position reached by different move orders, making the tree a
+            directed acyclic graph. Playout results and proofs are then propagated along the path of the iteration as
+            well. A shared node that gets proven proves its first parent right away and its other parents once an
+            iteration passes through them
+        :type check_every: number of iterations between two reads of the clock and checks for early stopping
+        :type early_stop: choose the most visited move instead of the best mean score, and stop the search as soon as
+            no other move can reach its visits in the iterations left, estimated from the speed so far under a time
+            budget
+        :type prior: visits and scores saved from earlier searches, see save_tree. New nodes of a stored position
+            start with its statistics, and their parent and its ancestors are raised to the visits of the children.
+            Only supported by the State tree of Connect4MCTS itself
+        :type max_nodes: number of nodes the tree may hold, unbounded if None. It can be exceeded by the children of
+            one expansion
+        :type max_bytes: approximate memory the tree may take, see State.nbytes, unbounded if None
+        :type memory_policy: what happens once the tree is full, 'prune' to drop the subtrees of the least visited
+            nodes until it is a quarter smaller, 'freeze' to stop expanding and keep refining the existing leaves.
+            max_nodes, max_bytes and memory_policy are only supported by the State tree of Connect4MCTS itself
+        :type self.ponder_iterations: number of iterations of the last pondering
+        :type self.pruned_nodes: number of nodes dropped by pruning since the agent was created
+        :type self.iterations: number of iterations of the last move
+        :type self.stopped_early: True if the last move was decided before its budget was used up
         """
         self._expansion_rate = expansion_rate
 
@@ -39,15 +112,52 @@ class Connect4MCTS:
         self._max_t = max_t
         self._max_iter = max_iter
 
+        self._use_bitboard = use_bitboard
+
+        self._solver_threshold = solver_threshold
+        self._solver = Solver()
+
+        self._book = book
+
+        self._playouts_per_leaf = playouts_per_leaf
+
+        self._fast_heuristic = fast_heuristic
+
+        self._ponder = ponder
+        self._ponder_thread = None
+        self._ponder_stop = threading.Event()
+        self.ponder_iterations = 0
+
+        self._transpositions = transpositions
+        self._nodes: Dict[bytes, State] = {}
+
+        self._check_every = max(1, check_every)
+        self._early_stop = early_stop
+        self.iterations = 0
+        self.stopped_early = False
+
+        self._prior = prior
+        self._warm_visits = 0
+        self._warm_score = 0.
+
+        if memory_policy not in ('prune', 'freeze'):
+            raise ValueError(f'unknown memory_policy {memory_policy}')
+        self._max_nodes = max_nodes
+        self._max_bytes = max_bytes
+        self._memory_policy = memory_policy
+        self._tree_nodes = 0
+        self._tree_bytes = 0
+        self.pruned_nodes = 0
+
         self._root_node = State(board=np.zeros((6, 7)))
+        self._register_nodes()
+        self._tree_nodes, self._tree_bytes = 1, self._root_node.nbytes()
         self._player = NO_PLAYER
         self._past_player = NO_PLAYER
         self._competing_player = NO_PLAYER
 
         self._c = 2
 
-        self._back_propagation_path = []
-
     def set_player(self, player: BoardPiece) -> None:
         """
         Set which player the agent would play. Flush tree if the agent switches to another BoardPiece
@@ -55,6 +165,7 @@ class Connect4MCTS:
         :param player: turning agent
         :return: None
         """
+        self.stop_pondering()
         self._player = player
 
         if player == PLAYER1:
@@ -69,17 +180,96 @@ class Connect4MCTS:
     def set_current_board(self, board: np.ndarray) -> None:
         """
         Set the current board state in which agent would base the decision on.
-        If board state has been simulated before, the 'knowledge' tree would be transferred
+        If board state is a child of the root, that child becomes the new root and the rest of the tree is dropped.
+        Children hold the agent's move together with the reply, so the next board of the agent is always one of them
 
         :param board: current board state
         :return: None
         """
-        ret = self._root_node.find_child(board)
-
-        if ret[0]:
-            self._root_node = ret[1]
+        self.stop_pondering()
+        if self._root_node.get_key() == board_key(board):
+            return
+
+        child = self._root_node.get_child(board)
+        if child is not None:
+            child.make_root()
+            self._root_node = child
         else:
             self._root_node = State(board)
+            self._warm_start(self._root_node)
+        self._register_nodes()
+        self._sync_tree_size()
+
+    def _register_nodes(self) -> None:
+        """
+        Rebuilds the transposition table from the nodes reachable from the root, dropping the unreachable ones.
+        A shared node whose first parent is no longer reachable is linked to a reachable one, so that proofs reach
+        the live ancestors and the old tree can be freed
+
+        :return: None
+        """
+        self._nodes = {}
+        if not self._transpositions:
+            return
+        self._nodes[self._root_node.get_key()] = self._root_node
+        stack = [self._root_node]
+        while stack:
+            state = stack.pop()
+            for child in state.get_children():
+                if child.get_key() not in self._nodes:
+                    self._nodes[child.get_key()] = child
+                    child.set_parent(state)
+                    stack.append(child)
+
+    def _warm_start(self, state: State) -> None:
+        """
+        Adds the statistics of the prior to a new node, if its position is stored. The added visits are counted
+        until _balance_prior is called for the parent
+
+        :param state: node without visits
+        :return: None
+        """
+        if self._prior is None:
+            return
+        stats = self._prior.lookup_board(state.get_board(), self._player)
+        if stats is not None:
+            visits, score = stats
+            state.update(score, visits)
+            self._warm_visits += visits
+            self._warm_score += score
+
+    def _balance_prior(self, state: State, covered: int = 0) -> None:
+        """
+        Raises the visits of a node and its ancestors to the visits its new children were warm-started with, so that
+        a node has at least as many visits as its children. The added visits carry the mean score of the new children.
+        At most the warm-started visits are added: with transpositions, the children the node already had may carry
+        visits through other parents, which are not new
+
+        :param state: node whose children were just added
+        :param covered: visits of the children the node already had
+        :return: None
+        """
+        warm_visits, warm_score = self._warm_visits, self._warm_score
+        self._warm_visits = 0
+        self._warm_score = 0.
+        if self._prior is None or warm_visits == 0:
+            return
+        deficit = min(warm_visits, warm_visits + covered - state.get_n())
+        if deficit > 0:
+            state.backpropagate(deficit * warm_score / warm_visits, deficit)
+
+    def save_tree(self, path: str, min_visits: int = 1) -> TreeKnowledge:
+        """
+        Saves the visits and scores of the tree for warm starts of later searches, see TreeKnowledge
+
+        :param path: .npy file
+        :param min_visits: visits below which a node and its subtree are left out
+        :return: the saved TreeKnowledge
+        """
+        self.stop_pondering()
+        knowledge = TreeKnowledge.from_tree(self._root_node, self._player, min_visits)
+        knowledge.save(path)
+        return knowledge
 
     def get_root_node(self) -> State:
         """
@@ -103,48 +293,227 @@ class Connect4MCTS:
 
         :return:None
         """
+        self.stop_pondering()
         self._root_node = State(board=np.zeros((6, 7)))
+        self._register_nodes()
+        self._sync_tree_size()
+
+    def tree_size(self) -> Tuple[int, int]:
+        """
+        Current size of the tree, walking all of its nodes
 
-    def rollout(self, state: State, backprop_path: List) -> None:
+        :return: tuple of the number of distinct nodes and their approximate memory in bytes, see State.nbytes
+        """
+        nodes = 0
+        nbytes = 0
+        for state in self._root_node.iter_subtree():
+            nodes += 1
+            nbytes += state.nbytes()
+        return nodes, nbytes
+
+    def _bounded(self) -> bool:
+        """
+        :return: True if the tree has a node or byte budget
+        """
+        return self._max_nodes is not None or self._max_bytes is not None
+
+    def _sync_tree_size(self) -> None:
+        """
+        Recounts the size of the tree that is kept track of between iterations if the tree has a budget
+
+        :return: None
+        """
+        if self._bounded():
+            self._tree_nodes, self._tree_bytes = self.tree_size()
+
+    def _make_room(self) -> bool:
+        """
+        Keeps the tree within its budget before an iteration, see memory_policy
+
+        :return: True if leaves may be expanded
+        """
+        full = (
+            (self._max_nodes is not None and self._tree_nodes >= self._max_nodes)
+            or (self._max_bytes is not None and self._tree_bytes >= self._max_bytes)
+        )
+        if not full:
+            return True
+        if self._memory_policy == 'freeze':
+            return False
+        return self.prune_tree(self._tree_nodes * 3 // 4) > 0
+
+    def prune_tree(self, max_nodes: int) -> int:
+        """
+        Drops the subtrees of the least visited nodes until at most max_nodes nodes are left. A node is kept if all
+        of its ancestors below the root have more visits than a threshold, the nodes at the threshold keep their
+        statistics and become leaves again. The children of the root are always kept, and so are the children of
+        proven nodes, as a proven node becomes a root without children otherwise, which has no move to choose
+
+        :param max_nodes: number of nodes to keep at most, unless the root or proven nodes have more children
+        :return: number of nodes dropped
+        """
+        self.stop_pondering()
+        root = self._root_node
+        # smallest visits of the unproven ancestors below the root, for every node
+        ancestor_visits = []
+        seen = {id(root)}
+        stack = [(child, math.inf) for child in root.get_children()]
+        while stack:
+            state, visits = stack.pop()
+            if id(state) in seen:
+                continue
+            seen.add(id(state))
+            ancestor_visits.append(visits)
+            if state.get_proven() is None:
+                visits = min(visits, state.get_n())
+            stack.extend((child, visits) for child in state.get_children())
+
+        if len(ancestor_visits) < max_nodes:
+            return 0
+        ancestor_visits.sort(reverse=True)
+        threshold = ancestor_visits[max(max_nodes - 1, 0)]
+
+        seen = {id(root)}
+        stack = [root]
+        while stack:
+            for child in stack.pop().get_children():
+                if id(child) in seen:
+                    continue
+                seen.add(id(child))
+                if child.get_n() <= threshold and child.get_proven() is None:
+                    child.remove_children()
+                else:
+                    stack.append(child)
+
+        self._register_nodes()
+        nodes, nbytes = self.tree_size()
+        if self._bounded():
+            self._tree_nodes, self._tree_bytes = nodes, nbytes
+        dropped = len(ancestor_visits) + 1 - nodes
+        self.pruned_nodes += dropped
+        return dropped
+
+    def rollout(self, state: State, path: Optional[List[State]] = None) -> None:
         """
         Simulating a game starting from given state. Actions are taken randomly. When finally reaches end state,
-        root node will start back-propagating according to backprop_path
+        the result is backpropagated from the state up to the root
 
-        :param state: root node in which rollout will be performed. State should have zero score and zero iteration
-        :param backprop_path: list containing children index relative to root node in which back propagation would be
-            performed
+        :param state: node in which rollout will be performed
+        :param path: nodes from the root down to state to backpropagate along, the parent links of state if None
         :return: None
         """
-        cur_board = state.get_board()
-        cur_player = self._player
-        score = 0
+        score, playouts = self.evaluate(state)
+        if path is None:
+            state.backpropagate(score, playouts)
+        else:
+            for node in path:
+                node.update(score, playouts)
+
+    def evaluate(self, state: State) -> Tuple[float, int]:
+        """
+        Simulating a game starting from given state, or taking the proven score of the state
+
+        :param state: node in which rollout will be performed
+        :return: tuple of the summed playout scores for the agent and the number of playouts
+        """
+        if state.get_proven() is not None:
+            return state.get_proven(), 1
+        elif state.is_terminal():
+            board = state.get_board()
+            score = playout_score(
+                check_end_state(board, self._player), check_end_state(board, self._competing_player)
+            )
+        elif self._batch_playouts():
+            return self.play_out_batch(BitBoard.from_array(state.get_board(), self._player))
+        elif self._use_bitboard:
+            score = self.simulate_bitboard(state.get_board())
+        else:
+            score = self.simulate(state.get_board())
 
-        while ((check_end_state(cur_board, PLAYER1) == GameState.STILL_PLAYING) and
-                (check_end_state(cur_board, PLAYER2) == GameState.STILL_PLAYING)):
+        return score, 1
 
-            if self._use_heuristic:
-                action = get_conv_action(cur_board, cur_player)
+    def simulate(self, cur_board: np.ndarray) -> float:
+        """
+        Play a game until the end starting from cur_board, with the agent to move
+
+        :param cur_board: board of an unfinished game the simulation starts from. Moves are played on it in place
+        :return: playout score of the game for the agent
+        """
+        game = Board(cur_board, self._player)
+        policy = self._line_policy(cur_board)
+        playing = True
+        while playing:
+            if policy is not None:
+                action = policy.choose(game.player)
+                policy.play(action, game.player)
+            elif self._use_heuristic:
+                action = get_conv_action(game.array, game.player)
             else:
-                while True:
-                    action = np.random.choice(7)
-                    if check_valid_action(cur_board, action):
-                        break
+                action = np.random.choice(game.valid_actions())
 
-            cur_board = apply_player_action(cur_board, action, cur_player, copy=True)
+            game.play(action)
+            playing = not (game.is_win() or game.is_full())
 
-            if cur_player == PLAYER1:
-                cur_player = PLAYER2
+        return playout_score(game.check_end_state(self._player), game.check_end_state(self._competing_player))
+
+    def simulate_bitboard(self, cur_board: np.ndarray) -> float:
+        """
+        Same as simulate, but plays the game on a BitBoard
+
+        :param cur_board: board of an unfinished game the simulation starts from
+        :return: playout score of the game for the agent
+        """
+        return self.play_out(BitBoard.from_array(cur_board, self._player))
+
+    def _line_policy(self, board: np.ndarray) -> Optional[GreedyLinePolicy]:
+        """
+        :param board: board the heuristic moves start from
+        :return: GreedyLinePolicy for the board, None if get_conv_action or random moves are used
+        """
+        if self._use_heuristic and self._fast_heuristic:
+            return GreedyLinePolicy(board, self._player)
+        return None
+
+    def _batch_playouts(self) -> bool:
+        """
+        :return: True if rollouts are played by the vectorized random_playouts
+        """
+        return not self._use_heuristic and self._playouts_per_leaf > 1
+
+    def play_out_batch(self, bitboard: BitBoard) -> Tuple[float, int]:
+        """
+        Play _playouts_per_leaf random games at once from a position
+
+        :param bitboard: position of an unfinished game with the agent to move
+        :return: tuple of the summed playout scores for the agent and the number of playouts
+        """
+        wins, draws, _ = random_playouts(bitboard.position, bitboard.mask, self._playouts_per_leaf)[0]
+        return wins + 0.5 * draws, self._playouts_per_leaf
+
+    def play_out(self, bitboard: BitBoard) -> float:
+        """
+        Play a game until the end on a BitBoard
+
+        :param bitboard: position of an unfinished game with the agent to move. Moves are played on it in place
+        :return: playout score of the game for the agent
+        """
+        policy = self._line_policy(bitboard.to_array())
+        playing = True
+        while playing:
+            if policy is not None:
+                action = policy.choose(bitboard.player)
+                policy.play(action, bitboard.player)
+            elif self._use_heuristic:
+                action = get_conv_action(bitboard.to_array(), bitboard.player)
             else:
-                cur_player = PLAYER1
+                action = np.random.choice(bitboard.valid_actions())
 
-        end_game_state = check_end_state(cur_board, self._player)
-        if end_game_state == GameState.IS_WIN:
-            score = 1  # agent winning the game
-        elif end_game_state == GameState.IS_DRAW:
-            score = 0.5
+            bitboard.play(action)
+            playing = not (bitboard.is_win() or bitboard.is_full())
 
-        state.set_score(score)
-        self._root_node.backpropagate(backprop_path)
+        return playout_score(
+            bitboard.check_end_state(self._player), bitboard.check_end_state(self._competing_player)
+        )
 
     def expand(self, state: State) -> None:
         """
@@ -155,61 +524,121 @@ class Connect4MCTS:
         :param state: tree node in which expansion would be performed
         :return: None
         """
-        actions_1 = np.arange(7)
-        actions_2 = np.arange(7)
-
-        board = state.get_board()
+        if state.is_terminal():
+            return
+
+        nbytes = state.nbytes() if self._bounded() else 0
+        self._warm_visits, self._warm_score = 0, 0.
+        game = Board(state.get_board(), self._player)
+        policy = self._line_policy(game.array)
+
+        for action in game.valid_actions():
+            game.play(action)
+
+            if game.is_win() or game.is_full():
+                self._add_child(state, game, action, 0)
+            elif policy is not None:
+                n_replies = len(game.valid_actions())
+                policy.play(action, self._player)
+                game.play(policy.choose(self._competing_player))
+                self._add_child(state, game, action, n_replies)
+                game.undo()
+                policy.undo(action, self._player)
+            elif self._use_heuristic:
+                n_replies = len(game.valid_actions())
+                game.play(get_conv_action(game.array, self._competing_player))
+                self._add_child(state, game, action, n_replies)
+                game.undo()
+            else:
+                actions_2 = game.valid_actions()
+                np.random.shuffle(actions_2)
+                for action2 in actions_2[:self._expansion_rate]:
+                    game.play(action2)
+                    self._add_child(state, game, action, len(actions_2))
+                    game.undo()
 
-        if check_end_state(board, self._player) == GameState.STILL_PLAYING:
-            for action in actions_1:
-                if check_valid_action(board, action):
-                    new_board = apply_player_action(board, action, self._player, copy=True)
+            game.undo()
 
-                    if self._use_heuristic:
-                        action2 = get_conv_action(new_board, self._competing_player)
-                        new_board_2 = apply_player_action(new_board, action2, self._competing_player, copy=True)
-                        new_child = State(new_board_2)
-                        state.add_child(new_child)
-                    else:
-                        count_2 = 0
-                        np.random.shuffle(actions_2)
-                        for action2 in actions_2:
-                            if check_valid_action(new_board, action2):
-                                new_board_2 = apply_player_action(new_board, action2, self._competing_player, copy=True)
-                                new_child = State(new_board_2)
-                                state.add_child(new_child)
+        if self._bounded():
+            self._tree_bytes += state.nbytes() - nbytes
+        self._balance_prior(state)
+        state.propagate_proof()
 
-                                count_2 += 1
-                                if count_2 >= self._expansion_rate:
-                                    break
+    def _add_child(self, state: State, game: Board, action: PlayerAction, n_replies: int) -> None:
+        """
+        Adds the position of game as child of state. A child in which the game has ended is proven with its result.
+        With transpositions, the node of a position that is already in the tree is added instead of a new one
 
-    def iterate(self) -> None:
+        :param state: parent node
+        :param game: position of the child
+        :param action: move of the agent leading to the child
+        :param n_replies: number of replies of the competing player to `action`
+        :return: None
+        """
+        if self._transpositions:
+            child = self._nodes.get(board_key(game.array))
+            if child is not None:
+                state.add_child(child, action, n_replies)
+                return
+
+        terminal = game.is_win() or game.is_full()
+        child = State(game.array, terminal=terminal, action=action, n_replies=n_replies)
+        if terminal:
+            child.set_proven(
+                playout_score(game.check_end_state(self._player), game.check_end_state(self._competing_player))
+            )
+        else:
+            self._warm_start(child)
+        state.add_child(child)
+        if self._bounded():
+            self._tree_nodes += 1
+            self._tree_bytes += child.nbytes()
+        if self._transpositions:
+            self._nodes[child.get_key()] = child
+
+    def iterate(self, action: Optional[PlayerAction] = None) -> None:
         """
         The mcts algorithm. perform rollout when reaching a leaf node with no simulation amd will expand otherwise.
-        It will select the node that maximize the UCB1 value.
+        It will select the node that maximize the UCB1 value. A full tree is pruned first or not expanded,
+        see memory_policy.
 
+        :param action: only select children of the root reached by this move of the agent, all if None
         :return: None
         """
+        expandable = self._make_room() if self._bounded() else True
         if len(self._root_node.get_children()) == 0:
             self.expand(self._root_node)
 
         cur_state = self._root_node
-        back_propagation_path = []
+        # shared nodes have several parents, so with transpositions the results follow the path of the iteration
+        path = [cur_state] if self._transpositions else None
         while True:
             if cur_state.is_leaf_node():
-                if cur_state.get_n() == 0:
-                    self.rollout(cur_state, back_propagation_path)
-                    break
-                else:
+                if cur_state.get_n() != 0 and expandable:
                     self.expand(cur_state)
                     if len(cur_state.get_children()) != 0:
-                        back_propagation_path.append(0)
-                        self.rollout(cur_state.get_children()[0], back_propagation_path)
-                    break
+                        cur_state = cur_state.get_children()[0]
+                        if path is not None:
+                            path.append(cur_state)
+                self.rollout(cur_state, path)
+                if path is not None:
+                    cur_state.propagate_proof(path)
+                break
             else:
+                children = cur_state.get_children()
+                if action is not None and cur_state is self._root_node:
+                    children = [
+                        child for child, child_action in zip(children, cur_state.get_child_actions())
+                        if child_action == action
+                    ]
+                # proven children have a known score, sample them only once nothing else is left
+                skip_proven = any(child.get_proven() is None for child in children)
+
                 idx = -1
                 ucb1 = -math.inf
-                for i, child in enumerate(cur_state.get_children()):
+                for i, child in enumerate(children):
+                    if skip_proven and child.get_proven() is not None:
+                        continue
                     n = child.get_n()
 
                     if n == 0:
@@ -223,65 +652,240 @@ class Connect4MCTS:
                         idx = i
                         ucb1 = new_val
 
-                cur_state = cur_state.get_children()[idx]
-                back_propagation_path.append(idx)
+                cur_state = children[idx]
+                if path is not None:
+                    path.append(cur_state)
 
-    def run_iteration(self) -> None:
+    def run_iteration(self, deadline: Optional[float] = None) -> None:
         """
         Run iteration of mcts algorithm. Stop when whether time _max_t is up or the number of iteration is bigger than
-        _max_iter
+        _max_iter, when the deadline has passed, or as soon as the root is proven. With _early_stop, also stop once
+        the move is decided, see is_decided. The clock is read every _check_every iterations only
 
+        :param deadline: time.time() by which the search has to stop, on top of the budget of the agent
         :return: None
         """
+        self.stop_pondering()
+        start = time.time()
+        deadline = self._deadline(start, deadline)
+        self.iterations = 0
+        self.stopped_early = False
+        while self._root_node.get_proven() is None:
+            if not self._time_curb and self.iterations >= self._max_iter:
+                break
+            self.iterate()
+            self.iterations += 1
+            if self.iterations % self._check_every == 0 and self._budget_spent(start, deadline):
+                break
+
+    def _deadline(self, start: float, deadline: Optional[float]) -> Optional[float]:
+        """
+        :param start: time.time() at the start of the search
+        :param deadline: deadline given by the caller, None if there is none
+        :return: earliest of the deadline and the end of the time budget, None if neither applies
+        """
         if self._time_curb:
-            cur_time = time.time()
-            while True:
-                self.iterate()
-                elapsed = time.time() - cur_time
-                if elapsed > self._max_t:
-                    break
-        else:
-            for _ in range(self._max_iter):
-                self.iterate()
+            return start + self._max_t if deadline is None else min(deadline, start + self._max_t)
+        return deadline
+
+    def _budget_spent(self, start: float, deadline: Optional[float]) -> bool:
+        """
+        Reads the clock and checks whether the search has to or may stop
+
+        :param start: time.time() at the start of the search
+        :param deadline: time.time() by which the search has to stop, None if only _max_iter applies
+        :return: True if the deadline has passed or, with _early_stop, the move is decided
+        """
+        remaining = math.inf
+        if deadline is not None:
+            now = time.time()
+            if now >= deadline:
+                return True
+            if now > start:
+                remaining = self.iterations / (now - start) * (deadline - now)
+        if not self._time_curb:
+            remaining = min(remaining, self._max_iter - self.iterations)
+
+        if self._early_stop and self.is_decided(remaining):
+            self.stopped_early = True
+            return True
+        return False
+
+    def action_visits(self) -> Dict[PlayerAction, int]:
+        """
+        Visits of the root's children summed per move of the agent
+
+        :return: dictionary of action to visits
+        """
+        visits = {}
+        for child, action in zip(self._root_node.get_children(), self._root_node.get_child_actions()):
+            visits[action] = visits.get(action, 0) + child.get_n()
+        return visits
+
+    def is_decided(self, remaining: float) -> bool:
+        """
+        Checks whether more iterations can change the most visited move, which is the move chosen with _early_stop:
+        no other move that is not proven lost may reach its visits in the iterations left. Only a proof found in the
+        iterations left could still change the move
+
+        :param remaining: upper bound of the iterations left
+        :return: True if the move is decided
+        """
+        visits = self.action_visits()
+        if not visits:
+            return False
+        proofs = self._root_node.get_action_proofs()
+        leader = self._most_visited_action(visits, proofs)
+        if proofs.get(leader) == 1:
+            return True
+        others = [n for action, n in visits.items() if action != leader and proofs.get(action) != 0]
+        # an iteration adds up to playouts_per_leaf visits
+        return not others or visits[leader] - max(others) > remaining * max(1, self._playouts_per_leaf)
+
+    @staticmethod
+    def _most_visited_action(
+            visits: Dict[PlayerAction, int],
+            proofs: Dict[PlayerAction, Optional[float]]) -> PlayerAction:
+        """
+        :param visits: visits per action, see action_visits
+        :param proofs: proven score per action, see State.get_action_proofs
+        :return: proven win if there is one, otherwise the most visited action that is not proven lost if any
+        """
+        return max(visits, key=lambda action: (proofs.get(action) == 1, proofs.get(action) != 0, visits[action]))
 
-    def choose_action(self) -> BoardPiece:
+    def choose_action(self) -> PlayerAction:
         """
         Choose action based on scores of the root node's children. Score will be scaled by the number of simulation
-        performed to prefer immediate winning action.
+        performed to prefer immediate winning action. Proven moves count with their exact score and are preferred
+        over unproven moves of the same score. With _early_stop, the most visited move is chosen instead, see
+        is_decided.
 
         :return: action for the agent
         """
-        max_score = -math.inf
-        child_idx = -1
-        for i, child in enumerate(self._root_node.get_children()):
-            score = child.get_score() / child.get_n()
+        proofs = self._root_node.get_action_proofs()
+        if self._early_stop and self._root_node.get_children():
+            return PlayerAction(self._most_visited_action(self.action_visits(), proofs))
+
+        max_score = (-math.inf, False)
+        action = -1
+        for child, child_action in zip(self._root_node.get_children(), self._root_node.get_child_actions()):
+            proven = proofs[child_action]
+            if proven is not None:
+                score = (proven, True)
+            elif child.get_n() > 0:
+                score = (child.get_score() / child.get_n(), False)
+            else:
+                continue
             if max_score < score:
-                child_idx = i
+                action = child_action
                 max_score = score
 
-        winning_board = self._root_node.get_children()[child_idx].get_board() == self._player
-        cur_board = self._root_node.get_board() == self._player
+        return PlayerAction(action)
 
-        bool_board = np.where(cur_board != winning_board)
-        action = bool_board[1].astype(np.int8)
-
-        return action
-
-    def generate_move_mcts(self, board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState]) \
-            -> Tuple[PlayerAction, SavedState]:
+    def generate_move_mcts(
+            self,
+            board: np.ndarray,
+            player: BoardPiece,
+            saved_state: Optional[SavedState],
+            deadline: Optional[float] = None) -> Tuple[PlayerAction, SavedState]:
         """
         Generate action by mcts agent.
 
         :param board: current board state
         :param player: turning player
         :param saved_state: unused
+        :param deadline: time.time() by which the search has to stop, on top of the budget of the agent
         :return: tuple of chosen action and saved state
         """
+        self.stop_pondering()
         self.set_player(player)
+        self.iterations = 0
+
+        if self._book is not None:
+            book_move = self._book.lookup_board(board, player)
+            if book_move is not None:
+                return book_move, saved_state
+
+        solved = solve_endgame(board, player, self._solver, self._solver_threshold)
+        if solved is not None:
+            return PlayerAction(solved.move), saved_state
+
         self.set_current_board(board)
-        self.run_iteration()
+        self.run_iteration(deadline)
 
         action = self.choose_action()
 
+        if self._ponder:
+            self.start_pondering(action)
+
         return action, saved_state
 
+    def start_pondering(self, action: PlayerAction) -> None:
+        """
+        Adds every reply of the competing player to `action` to the root and starts growing their subtrees in a
+        background thread, so that the next root is in the tree whatever the reply
+
+        :param action: move of the agent that was played
+        :return: None
+        """
+        self.stop_pondering()
+
+        game = Board(self._root_node.get_board(), self._player)
+        game.play(action)
+        if not (game.is_win() or game.is_full()):
+            replies = game.valid_actions()
+            covered = sum(child.get_n() for child in self._root_node.get_children())
+            self._warm_visits, self._warm_score = 0, 0.
+            for reply in replies:
+                game.play(reply)
+                if self._root_node.get_child(game.array) is None:
+                    self._add_child(self._root_node, game, action, len(replies))
+                game.undo()
+            self._balance_prior(self._root_node, covered)
+            self._root_node.propagate_proof()
+
+        self._ponder_stop.clear()
+        self._ponder_thread = threading.Thread(target=self._ponder_worker, args=(action,), daemon=True)
+        self._ponder_thread.start()
+
+    def stop_pondering(self) -> None:
+        """
+        Stops the background search and waits for its current iteration to finish. Does nothing when called by the
+        background search itself
+
+        :return: None
+        """
+        if self._ponder_thread is not None and self._ponder_thread is not threading.current_thread():
+            self._ponder_stop.set()
+            self._ponder_thread.join()
+            self._ponder_thread = None
+
+    def wait_pondering(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until the background search has used up the budget of a move, without stopping it
+
+        :param timeout: seconds to wait at most, no limit if None
+        :return: True if no background search is running anymore
+        """
+        thread = self._ponder_thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    def _ponder_worker(self, action: PlayerAction) -> None:
+        """
+        Iterates below `action` until stopped or until the budget of a move is used up
+
+        :param action: move of the agent that was played
+        :return: None
+        """
+        start = time.time()
+        self.ponder_iterations = 0
+        while not self._ponder_stop.is_set():
+            if self._time_curb and time.time() - start > self._max_t:
+                break
+            if not self._time_curb and self.ponder_iterations >= self._max_iter:
+                break
+            self.iterate(action)
+            self.ponder_iterations += 1
@@ -0,0 +1,182 @@
+import numpy as np
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from agents.common import BoardPiece, PlayerAction
+
+from agents.agent_mcts.mcts import Connect4MCTS
+
+COLS = 7
+
+
+def root_child_stats(agent: Connect4MCTS) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Visits and scores of the root's children summed per move of the agent. Children that share the agent's move
+    but differ in the reply are merged
+
+    :param agent: agent after running its iterations
+    :return: tuple of float arrays of shape (7,) holding visits, scores and proven scores per column,
+        the proven score is nan if the move is not proven
+    """
+    root = agent.get_root_node()
+    visits = np.zeros(COLS)
+    scores = np.zeros(COLS)
+    proven = np.full(COLS, np.nan)
+    for child, action in zip(root.get_children(), root.get_child_actions()):
+        visits[action] += child.get_n()
+        scores[action] += child.get_score()
+    for action, score in root.get_action_proofs().items():
+        if score is not None:
+            proven[action] = score
+    return visits, scores, proven
+
+
+def _search_worker(
+        kwargs: dict,
+        board: np.ndarray,
+        player: BoardPiece,
+        seed: int,
+        deadline: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int, float]:
+    """
+    Grows one independent tree in a worker process
+
+    :param kwargs: arguments of Connect4MCTS, including the budget of the worker
+    :param board: board of the root
+    :param player: BoardPiece of the agent
+    :param seed: seed of the random playouts of the worker
+    :param deadline: time.time() by which the search of the worker has to stop, None for the budget only
+    :return: tuple of root child visits, scores and proven scores, number of playouts and elapsed seconds
+    """
+    np.random.seed(seed)
+    agent = Connect4MCTS(**kwargs)
+    agent.set_player(player)
+    agent.set_current_board(board)
+
+    start = time.time()
+    agent.run_iteration(deadline)
+    elapsed = time.time() - start
+
+    visits, scores, proven = root_child_stats(agent)
+    return visits, scores, proven, agent.get_root_node().get_n(), elapsed
+
+
+class RootParallelMCTS(Connect4MCTS):
+    def __init__(self, n_workers: int = 4, split_budget: bool = False, **kwargs):
+        """
+        Root parallel Monte-Carlo tree search: every move, n_workers processes grow independent trees from the
+        same root and the visits and scores of the root's children are summed before choosing the action.
+        Takes the arguments of Connect4MCTS, which are passed on to the workers, except ponder: the workers only
+        live for the search of a move.
+
+        :type n_workers: number of worker processes
+        :type split_budget: divide max_iter among the workers, so that the total number of iterations stays the
+            same. Otherwise every worker runs max_iter iterations. Time budgets apply to each worker as they run
+            in parallel
+        :type self.playouts: number of playouts of the last move, summed over the workers
+        :type self.playouts_per_second: playouts of the last move divided by its wall-clock time
+        """
+        if kwargs.get('ponder', False):
+            raise ValueError('ponder is not supported by RootParallelMCTS')
+        super().__init__(**kwargs)
+        self._worker_kwargs = dict(kwargs, book=None, solver_threshold=0)
+        self._n_workers = n_workers
+        self._split_budget = split_budget
+        self._pool = None
+        self._shutdown_pool = None
+
+        self._visits = np.zeros(COLS)
+        self._scores = np.zeros(COLS)
+        self._proven = np.full(COLS, np.nan)
+        self.playouts = 0
+        self.playouts_per_second = 0.
+
+    def _worker_budget(self, worker: int) -> int:
+        """
+        :param worker: index of the worker
+        :return: number of iterations of the worker
+        """
+        if not self._split_budget:
+            return self._max_iter
+        return self._max_iter // self._n_workers + (worker < self._max_iter % self._n_workers)
+
+    def close(self) -> None:
+        """
+        Shuts the worker processes down. They are started again by the next move. Leaving a with block of the
+        agent closes it as well, and the processes of an agent that is garbage collected without close are shut
+        down by a finalizer
+
+        :return: None
+        """
+        if self._pool is not None:
+            self._shutdown_pool()
+            self._pool = None
+
+    def __enter__(self) -> 'RootParallelMCTS':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def run_iteration(self, deadline: Optional[float] = None) -> None:
+        """
+        Runs the search of all workers and merges their root statistics
+
+        :param deadline: time.time() by which the workers have to stop, on top of their budget
+        :return: None
+        """
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self._n_workers)
+            self._shutdown_pool = weakref.finalize(self, self._pool.shutdown)
+
+        board = self._root_node.get_board()
+        seeds = np.random.randint(0, 2 ** 31, self._n_workers)
+
+        start = time.time()
+        futures = [
+            self._pool.submit(
+                _search_worker, dict(self._worker_kwargs, max_iter=self._worker_budget(i)),
+                board, self._player, int(seeds[i]), deadline
+            )
+            for i in range(self._n_workers)
+        ]
+        results = [future.result() for future in futures]
+        elapsed = time.time() - start
+
+        self._visits = sum(result[0] for result in results)
+        self._scores = sum(result[1] for result in results)
+        # proofs are exact, so any worker that found one is right
+        self._proven = np.fmax.reduce([result[2] for result in results])
+        self.playouts = int(sum(result[3] for result in results))
+        self.playouts_per_second = self.playouts / elapsed if elapsed > 0 else 0.
+
+    def get_root_stats(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Getter function returning the merged root statistics of the last move
+
+        :return: tuple of float arrays of shape (7,) holding visits and scores per column
+        """
+        return self._visits, self._scores
+
+    def get_root_proofs(self) -> np.ndarray:
+        """
+        Getter function returning the merged proofs of the last move
+
+        :return: float array of shape (7,) holding the proven score per column, nan if not proven
+        """
+        return self._proven
+
+    def choose_action(self) -> PlayerAction:
+        """
+        Choose the column with the highest mean score over all workers. Proven columns count with their exact
+        score and are preferred over unproven columns of the same score
+
+        :return: action for the agent
+        """
+        mean = np.where(self._visits > 0, self._scores / np.maximum(self._visits, 1), -np.inf)
+        proven = ~np.isnan(self._proven)
+        mean[proven] = self._proven[proven]
+        best = np.flatnonzero(mean == mean.max())
+        best_proven = best[proven[best]]
+        return PlayerAction(best_proven[0] if best_proven.size else best[0])
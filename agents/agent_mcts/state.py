@@ -1,47 +1,237 @@
 import numpy as np
-import copy
+import sys
+from typing import Dict, Iterator, List, Optional
+
+from agents.common import BoardPiece, PlayerAction
+
+_ARRAY_BYTES = sys.getsizeof(np.empty(0))  # memory of an ndarray without its data
+
+
+def board_key(board: np.ndarray) -> bytes:
+    """
+    Hashable key of a board, equal for equal boards whatever their dtype
+
+    :param board: board of shape (6, 7)
+    :return: bytes of the board as BoardPiece array
+    """
+    return np.asarray(board, dtype=BoardPiece).tobytes()
 
 
 class State:
-    def __init__(self, board: np.ndarray):
+    def __init__(
+            self,
+            board: np.ndarray,
+            terminal: bool = False,
+            action: Optional[PlayerAction] = None,
+            n_replies: int = 0):
         """
         Class representing a node in a tree.
 
         :param board: board representing the state current node
+        :param terminal: True if the game has ended on board
+        :param action: move of the agent leading from the parent to the state, None for a root
+        :param n_replies: number of moves the competing player could answer `action` with, 0 if `action` ended
+            the game
         :type self._children: a list containing all the children node
         :type self._n: number of trial performed for tree
         :type self._score: score value of the tree
         :type self._board: current state board
+        :type self._key: board_key of the board
+        :type self._children_by_key: children indexed by their board_key
+        :type self._edges: tuple of the agent's move and the number of its replies for every child, a child that is
+            shared by several parents can be reached by different moves
+        :type self._parent: parent node, None for the root. The first parent if the state is shared
+        :type self._proven: exact score of the state for the agent with perfect play, None if not proven
         """
+        self._parent = None
         self._children = []
+        self._edges = []
+        self._children_by_key = {}
         self._score = 0
         self._n = 0
         self._board = board.copy()
+        self._key = board_key(board)
+        self._terminal = terminal
+        self._action = action
+        self._n_replies = n_replies
+        self._proven = None
+
+    def backpropagate(self, score: float, playouts: int = 1) -> None:
+        """
+        Backpropagation. Adds a playout result to the state and all of its ancestors, walking up the parent links.
+        Every edge of the tree spans the agent's move and the reply, so all states have the agent to move
+        and the score keeps its perspective on the way up
+
+        :param score: playout result from the agent's perspective, summed over the playouts
+        :param playouts: number of playouts the score stems from
+        """
+        state = self
+        while state is not None:
+            state.update(score, playouts)
+            state = state._parent
+
+    def update(self, score: float, playouts: int = 1) -> None:
+        """
+        Adds a playout result to the state only, used to backpropagate along an explicit path
 
-    def backpropagate(self, child_list) -> None:
+        :param score: playout result from the agent's perspective, summed over the playouts
+        :param playouts: number of playouts the score stems from
         """
-        Backpropagation. Update the intrinsic parameters of the state.
+        self._score += score
+        self._n += playouts
 
-        :param child_list: list of child index. representing the back propagation path
+    def get_action_proofs(self) -> Dict[PlayerAction, Optional[float]]:
         """
-        total_score = 0
-        total_n = 0
-        if len(child_list) > 1:
-            self._children[child_list[0]].backpropagate(child_list[1:])
+        Proven score of every move of the agent among the children. A move is worth the minimum over the replies
+        of the competing player, so it is proven once all of its replies are children and proven, or as soon
+        as one reply is a proven loss
 
-        self._score += self._children[child_list[0]].get_score()
-        # self._n += self._children[child_list[0]].get_n()
-        self._n += 1
+        :return: dictionary of action to proven score, None if the move is not proven
+        """
+        groups = {}
+        n_replies = {}
+        for child, (action, replies) in zip(self._children, self._edges):
+            groups.setdefault(action, []).append(child)
+            n_replies[action] = replies
+
+        ret = {}
+        for action, group in groups.items():
+            proven = [child._proven for child in group if child._proven is not None]
+            if len(proven) == len(group) and len(group) >= n_replies[action]:
+                ret[action] = min(proven)
+            elif proven and min(proven) == 0:
+                ret[action] = 0
+            else:
+                ret[action] = None
+        return ret
+
+    def prove(self) -> bool:
+        """
+        Tries to prove the state from its children: it is won if one move is won and proven once all moves are
+        proven, as the best of them
+
+        :return: True if the state got proven by this call
+        """
+        if self._proven is not None or not self._children:
+            return False
+
+        values = list(self.get_action_proofs().values())
+        if 1 in values:
+            self._proven = 1
+        elif None not in values:
+            self._proven = max(values)
+        else:
+            return False
+        return True
+
+    def propagate_proof(self, path: Optional[List['State']] = None) -> None:
+        """
+        Proves the state and its ancestors for as long as proofs are found. Along the parent links, only the first
+        parent of a shared state is reached. Along a path, every state of the path is tried, as a child that was
+        proven through its other parents can prove an ancestor that none of the states below it proves
+
+        :param path: states from the root down to the state, the parent links are followed if None
+        :return: None
+        """
+        if path is None:
+            state = self
+            while state is not None and state.prove():
+                state = state._parent
+            return
+
+        for state in reversed(path):
+            state.prove()
+
+    def get_proven(self) -> Optional[float]:
+        """
+        Getter function returning the proven score
+        :return: exact score for the agent, None if the state is not proven
+        """
+        return self._proven
+
+    def set_proven(self, score: float) -> None:
+        """
+        Marks the state as proven, used for terminal states
+
+        :param score: exact score for the agent
+        :return: None
+        """
+        self._proven = score
+
+    def get_action(self) -> Optional[PlayerAction]:
+        """
+        getter function returning the move of the agent leading to the State
+        :return: action, None for a root
+        """
+        return self._action
+
+    def get_child_actions(self) -> List[Optional[PlayerAction]]:
+        """
+        getter function returning the move of the agent leading to every child, in the order of get_children
+        :return: list of actions
+        """
+        return [action for action, _ in self._edges]
+
+    def iter_subtree(self) -> Iterator['State']:
+        """
+        Walks the tree or graph below the state, including itself
+
+        :return: iterator over the distinct states, each state once even if it is shared
+        """
+        seen = {id(self)}
+        stack = [self]
+        while stack:
+            state = stack.pop()
+            yield state
+            for child in state._children:
+                if id(child) not in seen:
+                    seen.add(id(child))
+                    stack.append(child)
+
+    def count_nodes(self) -> int:
+        """
+        Number of distinct states in the tree or graph below the state, including itself
+
+        :return: number of states
+        """
+        return sum(1 for _ in self.iter_subtree())
+
+    def nbytes(self) -> int:
+        """
+        Approximate memory of the state itself, without its children: the object and its attributes, the board,
+        its key and the containers of the children
+
+        :return: size in bytes
+        """
+        return (
+            sys.getsizeof(self) + sys.getsizeof(self.__dict__) + _ARRAY_BYTES + self._board.nbytes
+            + sys.getsizeof(self._key) + sys.getsizeof(self._children) + sys.getsizeof(self._edges)
+            + sys.getsizeof(self._children_by_key) + len(self._edges) * sys.getsizeof((0, 0))
+        )
+
+    def remove_children(self) -> None:
+        """
+        Drops the subtree below the state, which becomes a leaf again and keeps its visits, score and proof
+
+        :return: None
+        """
+        for child in self._children:
+            if child._parent is self:
+                child._parent = None
+        self._children = []
+        self._edges = []
+        self._children_by_key = {}
 
     def find_child(self, board: np.ndarray):
         """
-        Find the node that has the same board state
+        Find the node that has the same board state by searching the whole subtree. Use get_child to look up
+        a direct child
 
         :param board: current board state
         :return: Tuple of bool and State. return none if no child having given board
         """
         if (self._board == board).all():
-            return True, copy.deepcopy(self)
+            return True, self
 
         ret = False, None
         for child in self._children:
@@ -50,6 +240,46 @@ class State:
                 break
         return ret
 
+    def get_child(self, board: np.ndarray) -> Optional['State']:
+        """
+        Look up the direct child having the given board
+
+        :param board: board state of the child
+        :return: reference to the child, None if there is none
+        """
+        return self._children_by_key.get(board_key(board))
+
+    def get_parent(self) -> Optional['State']:
+        """
+        getter function returning the parent of the State
+        :return: parent, None for the root
+        """
+        return self._parent
+
+    def make_root(self) -> None:
+        """
+        Unlinks the state from its parent, so that the rest of the old tree can be freed
+
+        :return: None
+        """
+        self._parent = None
+
+    def set_parent(self, parent: 'State') -> None:
+        """
+        Links the state to one of its parents, the one parent links and proofs are followed to
+
+        :param parent: state that has the state as child
+        :return: None
+        """
+        self._parent = parent
+
+    def get_key(self) -> bytes:
+        """
+        getter function returning the board_key of the State
+        :return: key
+        """
+        return self._key
+
     def is_leaf_node(self) -> bool:
         """
         checking if the state is a leaf node
@@ -61,6 +291,14 @@ class State:
         else:
             return False
 
+    def is_terminal(self) -> bool:
+        """
+        checking if the game has ended in this state
+
+        :return: True if no move can be played from the state
+        """
+        return self._terminal
+
     def get_n(self) -> int:
         """
         Getter function returning number of simulation
@@ -103,10 +341,23 @@ class State:
         """
         return self._children
 
-    def add_child(self, child_state) -> None:
+    def add_child(
+            self,
+            child_state,
+            action: Optional[PlayerAction] = None,
+            n_replies: Optional[int] = None) -> None:
         """
         adding child state to the node
-        :param child_state: child state, should be a State. Automatically deep copy the child_state
+        :param child_state: child state, should be a State. It is added by reference, not copied
+        :param action: move of the agent leading to the child, the action of child_state if None
+        :param n_replies: number of replies to `action`, the n_replies of child_state if None
 
         """
-        self._children.append(copy.deepcopy(child_state))
+        if child_state._parent is None:
+            child_state._parent = self
+        self._children.append(child_state)
+        self._edges.append((
+            child_state._action if action is None else action,
+            child_state._n_replies if n_replies is None else n_replies
+        ))
+        self._children_by_key.setdefault(child_state.get_key(), child_state)
@@ -0,0 +1,265 @@
+import numpy as np
+from typing import Sequence
+
+from agents.common import BoardPiece
+from agents.bitboard import BitBoard
+
+NO_NODE = -1
+
+
+class ArrayTree:
+    _FIELDS = ('visits', 'pending', 'scores', 'parent', 'first_child', 'n_children', 'pieces', 'masks', 'actions', 'terminal')
+
+    def __init__(self, capacity: int = 1024):
+        """
+        Search tree stored as a struct of arrays. A node is an index into the arrays, the children of a node
+        occupy the contiguous block first_child[node] ... first_child[node] + n_children[node] - 1.
+        Positions are stored as the two bitmasks of the BitBoard layout, seen from the agent.
+
+        :param capacity: number of preallocated nodes, doubled whenever the tree is full
+        :type self.visits: number of playouts through the node, including pending ones
+        :type self.pending: number of virtual visits of pending playouts through the node, see add_virtual_loss
+        :type self.scores: summed playout results through the node, from the agent's perspective
+        :type self.parent: index of the parent, NO_NODE for the root
+        :type self.first_child: index of the first child, NO_NODE if the node is not expanded
+        :type self.n_children: number of children
+        :type self.pieces: bitmask of the agent's pieces
+        :type self.masks: bitmask of all occupied cells
+        :type self.actions: move of the agent leading from the parent to the node
+        :type self.terminal: True if the game has ended in the node
+        :type self._index: dictionary of position key (pieces + mask, as BitBoard.key) to the first node holding it
+        """
+        self.size = 0
+        self._index = {}
+        self.visits = np.zeros(capacity, dtype=np.int64)
+        self.pending = np.zeros(capacity, dtype=np.int32)
+        self.scores = np.zeros(capacity, dtype=np.float64)
+        self.parent = np.full(capacity, NO_NODE, dtype=np.int32)
+        self.first_child = np.full(capacity, NO_NODE, dtype=np.int32)
+        self.n_children = np.zeros(capacity, dtype=np.int8)
+        self.pieces = np.zeros(capacity, dtype=np.uint64)
+        self.masks = np.zeros(capacity, dtype=np.uint64)
+        self.actions = np.full(capacity, -1, dtype=np.int8)
+        self.terminal = np.zeros(capacity, dtype=bool)
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def capacity(self) -> int:
+        return self.visits.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        """
+        :return: bytes allocated by the arrays
+        """
+        return sum(getattr(self, field).nbytes for field in self._FIELDS)
+
+    def _reserve(self, n: int) -> None:
+        """
+        Grows all arrays geometrically until n more nodes fit
+
+        :param n: number of nodes to add
+        :return: None
+        """
+        capacity = self.capacity
+        if self.size + n <= capacity:
+            return
+        while capacity < self.size + n:
+            capacity *= 2
+
+        for field in self._FIELDS:
+            old = getattr(self, field)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, field, new)
+
+    def add_root(self, pieces: int, mask: int) -> int:
+        """
+        Clears the tree and adds a single root node
+
+        :param pieces: bitmask of the agent's pieces
+        :param mask: bitmask of all occupied cells
+        :return: index of the root, always 0
+        """
+        self.size = 0
+        self._index.clear()
+        self.add_children(NO_NODE, [pieces], [mask], [-1], [False])
+        return 0
+
+    def add_children(
+            self,
+            parent: int,
+            pieces: Sequence[int],
+            masks: Sequence[int],
+            actions: Sequence[int],
+            terminal: Sequence[bool]) -> int:
+        """
+        Appends a block of children to an unexpanded node
+
+        :param parent: index of the parent, NO_NODE to add a root
+        :param pieces: bitmask of the agent's pieces of every child
+        :param masks: bitmask of all occupied cells of every child
+        :param actions: move of the agent leading to every child
+        :param terminal: True for every child in which the game has ended
+        :return: index of the first child
+        """
+        n = len(pieces)
+        self._reserve(n)
+        first = self.size
+        block = slice(first, first + n)
+
+        self.visits[block] = 0
+        self.pending[block] = 0
+        self.scores[block] = 0.
+        self.parent[block] = parent
+        self.first_child[block] = NO_NODE
+        self.n_children[block] = 0
+        self.pieces[block] = np.array(pieces, dtype=np.uint64)
+        self.masks[block] = np.array(masks, dtype=np.uint64)
+        self.actions[block] = actions
+        self.terminal[block] = terminal
+        for node, key in enumerate((self.pieces[block] + self.masks[block]).tolist(), first):
+            self._index.setdefault(key, node)
+        self.size += n
+
+        if parent != NO_NODE:
+            self.first_child[parent] = first
+            self.n_children[parent] = n
+        return first
+
+    def children(self, node: int) -> range:
+        """
+        :param node: index of the node
+        :return: indices of the children
+        """
+        first = int(self.first_child[node])
+        return range(first, first + int(self.n_children[node])) if first != NO_NODE else range(0)
+
+    def is_leaf(self, node: int) -> bool:
+        """
+        :param node: index of the node
+        :return: True if the node has no children
+        """
+        return self.n_children[node] == 0
+
+    def playouts(self, node: int) -> int:
+        """
+        :param node: index of the node
+        :return: number of finished playouts through the node, without the pending ones
+        """
+        return int(self.visits[node] - self.pending[node])
+
+    def bitboard(self, node: int, player: BoardPiece) -> BitBoard:
+        """
+        Position of a node
+
+        :param node: index of the node
+        :param player: BoardPiece of the agent
+        :return: BitBoard with `player` to move. Its Zobrist key is not computed
+        """
+        return BitBoard(int(self.pieces[node]), int(self.masks[node]), player, zobrist=0)
+
+    def select_child(self, node: int, c: float, log_n: float) -> int:
+        """
+        Child maximizing UCB1, the first unvisited child if there is one
+
+        :param node: index of an expanded node
+        :param c: exploration constant
+        :param log_n: logarithm of the number of playouts the exploration term is based on
+        :return: index of the child
+        """
+        first = int(self.first_child[node])
+        block = slice(first, first + int(self.n_children[node]))
+        visits = self.visits[block]
+
+        unvisited = np.flatnonzero(visits == 0)
+        if unvisited.size:
+            return first + int(unvisited[0])
+
+        ucb1 = self.scores[block] / visits + c * np.sqrt(log_n / visits)
+        return first + int(np.argmax(ucb1))
+
+    def best_child(self, node: int) -> int:
+        """
+        Visited child with the highest mean score
+
+        :param node: index of an expanded node
+        :return: index of the child
+        """
+        first = int(self.first_child[node])
+        block = slice(first, first + int(self.n_children[node]))
+        visits = self.visits[block]
+        mean = np.where(visits > 0, self.scores[block] / np.maximum(visits, 1), -np.inf)
+        return first + int(np.argmax(mean))
+
+    def add_virtual_loss(self, node: int, loss: int) -> None:
+        """
+        Counts `loss` pending playouts without score on the node and all of its ancestors, so that concurrent
+        selections prefer other paths until the playout is backpropagated
+
+        :param node: index of the node the playout starts from
+        :param loss: number of virtual visits
+        :return: None
+        """
+        while node != NO_NODE:
+            self.visits[node] += loss
+            self.pending[node] += loss
+            node = self.parent[node]
+
+    def backpropagate(self, node: int, score: float, virtual_loss: int = 0, playouts: int = 1) -> None:
+        """
+        Adds a playout result to the node and all of its ancestors
+
+        :param node: index of the node the playout started from
+        :param score: playout result from the agent's perspective, summed over the playouts
+        :param virtual_loss: virtual visits added by add_virtual_loss for this playout, removed again
+        :param playouts: number of playouts the score stems from
+        :return: None
+        """
+        while node != NO_NODE:
+            self.visits[node] += playouts - virtual_loss
+            self.pending[node] -= virtual_loss
+            self.scores[node] += score
+            node = self.parent[node]
+
+    def find(self, pieces: int, mask: int) -> int:
+        """
+        :param pieces: bitmask of the agent's pieces
+        :param mask: bitmask of all occupied cells
+        :return: index of a node holding the position, NO_NODE if there is none
+        """
+        return self._index.get(int(pieces) + int(mask), NO_NODE)
+
+    def subtree(self, node: int) -> 'ArrayTree':
+        """
+        Copies the subtree below a node into a new, compact tree with the capacity of this tree
+
+        :param node: index of the new root
+        :return: ArrayTree whose root (index 0) is a copy of `node`
+        """
+        tree = ArrayTree(self.capacity)
+        tree.add_root(int(self.pieces[node]), int(self.masks[node]))
+        tree.visits[0] = self.visits[node]
+        tree.pending[0] = self.pending[node]
+        tree.scores[0] = self.scores[node]
+        tree.actions[0] = -1
+        tree.terminal[0] = self.terminal[node]
+
+        queue = [(node, 0)]
+        while queue:
+            old, new = queue.pop()
+            n = int(self.n_children[old])
+            if n == 0:
+                continue
+            block = slice(int(self.first_child[old]), int(self.first_child[old]) + n)
+            first = tree.add_children(
+                new, self.pieces[block], self.masks[block], self.actions[block], self.terminal[block]
+            )
+            tree.visits[first:first + n] = self.visits[block]
+            tree.pending[first:first + n] = self.pending[block]
+            tree.scores[first:first + n] = self.scores[block]
+            queue.extend(zip(range(block.start, block.stop), range(first, first + n)))
+
+        return tree
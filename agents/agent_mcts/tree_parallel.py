@@ -0,0 +1,157 @@
+import numpy as np
+import math
+import threading
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from agents.common import BoardPiece, other_player
+from agents.bitboard import BitBoard
+
+from agents.agent_mcts.mcts import Connect4MCTS, playout_score
+from agents.agent_mcts.array_mcts import Connect4ArrayMCTS
+
+_worker_agents = {}
+
+
+def _seed_worker() -> None:
+    """
+    Reseeds numpy in a new worker process, forked workers would otherwise share the random playouts
+    """
+    np.random.seed()
+
+
+def _rollout_worker(
+        pieces: int,
+        mask: int,
+        player: BoardPiece,
+        use_heuristic: bool,
+        fast_heuristic: bool,
+        playouts_per_leaf: int,
+        terminal: bool) -> Tuple[float, int]:
+    """
+    Rolls out one position in a worker process
+
+    :param pieces: bitmask of the agent's pieces
+    :param mask: bitmask of all occupied cells
+    :param player: BoardPiece of the agent
+    :param use_heuristic: play the rollout with the convolution heuristic instead of random moves
+    :param fast_heuristic: pick the heuristic moves with a GreedyLinePolicy
+    :param playouts_per_leaf: number of random playouts, see Connect4MCTS
+    :param terminal: True if the game has ended in the position
+    :return: tuple of the summed playout scores for the agent and the number of playouts
+    """
+    bitboard = BitBoard(pieces, mask, player, zobrist=0)
+    if terminal:
+        return playout_score(bitboard.check_end_state(player), bitboard.check_end_state(other_player(player))), 1
+
+    key = (player, use_heuristic, fast_heuristic, playouts_per_leaf)
+    agent = _worker_agents.get(key)
+    if agent is None:
+        agent = Connect4MCTS(
+            use_heuristic=use_heuristic, fast_heuristic=fast_heuristic, playouts_per_leaf=playouts_per_leaf
+        )
+        agent.set_player(player)
+        _worker_agents[key] = agent
+    if agent._batch_playouts():
+        return agent.play_out_batch(bitboard)
+    return agent.play_out(bitboard), 1
+
+
+class Connect4TreeParallelMCTS(Connect4ArrayMCTS):
+    def __init__(self, *args, n_workers: int = 4, virtual_loss: int = 1, **kwargs):
+        """
+        Tree parallel Monte-Carlo tree search: n_workers threads select on one shared ArrayTree and send the
+        rollouts of their leaves to a pool of as many processes. Selection, expansion and backpropagation
+        hold a lock, the rollouts run outside of it and outside of the GIL. Virtual loss on the selected
+        path makes the other threads spread out while a rollout is pending. The worker processes play
+        playouts_per_leaf random playouts per leaf at once, like Connect4MCTS.
+        Takes the arguments of Connect4ArrayMCTS, except early_stop, batch_size and batch_evaluation: every thread
+        evaluates one leaf at a time.
+
+        :type n_workers: number of selecting threads and rollout processes
+        :type virtual_loss: virtual visits added on the path of a pending rollout
+        :type self.iterations: number of iterations of the last move
+        :type self.iterations_per_second: iterations of the last move divided by its wall-clock time
+        """
+        for name, default in (('early_stop', False), ('batch_size', 1), ('batch_evaluation', 'playout')):
+            if kwargs.get(name, default) != default:
+                raise ValueError(f'{name} is not supported by Connect4TreeParallelMCTS')
+        super().__init__(*args, **kwargs)
+        self._n_workers = n_workers
+        self._virtual_loss = virtual_loss
+        self._lock = threading.Lock()
+        self._pool = None
+        self._shutdown_pool = None
+
+        self.iterations = 0
+        self.iterations_per_second = 0.
+
+    def close(self) -> None:
+        """
+        Shuts the rollout processes down. They are started again by the next move. Leaving a with block of the
+        agent closes it as well, and the processes of an agent that is garbage collected without close are shut
+        down by a finalizer
+
+        :return: None
+        """
+        if self._pool is not None:
+            self._shutdown_pool()
+            self._pool = None
+
+    def __enter__(self) -> 'Connect4TreeParallelMCTS':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _worker(self, deadline: float) -> None:
+        """
+        Iterates on the shared tree until the budget of the move is used up
+
+        :param deadline: time.time() at which to stop, inf if the budget is a number of iterations only
+        :return: None
+        """
+        while True:
+            with self._lock:
+                if time.time() > deadline:
+                    return
+                if not self._time_curb and self.iterations >= self._max_iter:
+                    return
+                self.iterations += 1
+
+                node = self.select_leaf()
+                tree = self._tree
+                tree.add_virtual_loss(node, self._virtual_loss)
+                args = (
+                    int(tree.pieces[node]), int(tree.masks[node]), self._player, self._use_heuristic,
+                    self._fast_heuristic, self._playouts_per_leaf, bool(tree.terminal[node])
+                )
+
+            score, playouts = self._pool.submit(_rollout_worker, *args).result()
+
+            with self._lock:
+                self._tree.backpropagate(node, score, self._virtual_loss, playouts)
+
+    def run_iteration(self, deadline: Optional[float] = None) -> None:
+        """
+        Runs the worker threads on the shared tree until _max_iter iterations are done, _max_t has passed or the
+        deadline is reached. Early stopping is not supported, the threads read the clock every iteration
+
+        :param deadline: time.time() by which the search has to stop, on top of the budget of the agent
+        :return: None
+        """
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self._n_workers, initializer=_seed_worker)
+            self._shutdown_pool = weakref.finalize(self, self._pool.shutdown)
+
+        self.iterations = 0
+        start = time.time()
+        deadline = self._deadline(start, deadline)
+        deadline = math.inf if deadline is None else deadline
+        with ThreadPoolExecutor(self._n_workers) as threads:
+            for future in [threads.submit(self._worker, deadline) for _ in range(self._n_workers)]:
+                future.result()
+        elapsed = time.time() - start
+        self.iterations_per_second = self.iterations / elapsed if elapsed > 0 else 0.
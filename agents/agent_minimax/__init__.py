@@ -1 +1,2 @@
 from .minimax import generate_move_minimax_ab as generate_move
+from .minimax import generate_move_minimax_id
@@ -1,97 +1,85 @@
 import numpy as np
-from typing import Optional, Tuple
+import time
+from typing import Optional, Tuple, Union
 from agents.common import BoardPiece, SavedState, PlayerAction, PLAYER1, PLAYER2, NO_PLAYER
-from agents.common import apply_player_action, check_end_state
-from agents.common import GameState
-from scipy.signal import convolve2d
+from agents.common import Board
+from agents.bitboard import BitBoard
+from agents.evaluation import evaluate_board
+from agents.transposition import TranspositionTable, EXACT, LOWER, UPPER
+from agents.ordering import MoveOrdering, center_order
+from agents.solver import Solver, solve_endgame, SOLVER_THRESHOLD
+from agents.opening_book import OpeningBook
 
 
-kernel_v = np.ones((4, 1))
-kernel_h = np.ones((1, 4))
-kernel_dl = np.zeros((4, 4), dtype=int)
-np.fill_diagonal(kernel_dl, val=1)
-kernel_dr = np.flipud(kernel_dl)
+class SearchTimeout(Exception):
+    """
+    Raised inside minimax_ab when the deadline of the search has passed
+    """
+    pass
 
 
-def compute_score(convolved_board: np.ndarray) -> float:
-    """
+class MinimaxSavedState(SavedState):
+    def __init__(self, table_size: int = 1 << 16):
+        """
+        State kept by generate_move_minimax_ab between moves
 
-    :param convolved_board: array of convolution values
-    :return: score the heuristic respective to convolution kernel
-    """
-    v4 = np.sum(convolved_board == 4) * 9999
-    v3 = np.sum(convolved_board == 3) * 999
-    v2 = np.sum(convolved_board == 2) * 99
-    v1 = np.sum(convolved_board == 1) * 9
-    vm4 = np.sum(convolved_board == -4) * 9999
-    vm3 = np.sum(convolved_board == -3) * 999
-    vm2 = np.sum(convolved_board == -2) * 99
-    vm1 = np.sum(convolved_board == -1) * 9
+        :param table_size: number of slots of the transposition table. The default holds several seconds of
+            iterative deepening, about 15000 stores per second
+        :type self.table: transposition table shared by all searches of the agent
+        :type self.ordering: move ordering and node counters shared by all searches of the agent
+        :type self.solver: exact solver used once few cells are empty
+        :type self.depth: deepest depth completed by the last iterative deepening search
+        """
+        self.table = TranspositionTable(table_size)
+        self.ordering = MoveOrdering()
+        self.solver = Solver()
+        self.depth = 0
 
-    return v4 + v3 + v2 + v1 - (vm4 + vm3 + vm2 + vm1)
+    def new_search(self) -> None:
+        """
+        Prepares table and move ordering for the search of a new move
+
+        :return: None
+        """
+        self.table.new_search()
+        self.ordering.new_search()
 
 
 def get_minimax_heuristic(board: np.ndarray) -> float:
     """
 
     :param board: current board state
-    :return: heuristic value
+    :return: heuristic value, positive values favour PLAYER1
     """
-    board_tr = np.zeros_like(board)
-    board_tr[board == PLAYER1] = 1
-    board_tr[board == PLAYER2] = -1
-
-    ret = 0
-    conv_v = convolve2d(kernel_v, board_tr, mode='valid')
-    ret += compute_score(conv_v)
-
-    conv_h = convolve2d(kernel_h, board_tr, mode='valid')
-    ret += compute_score(conv_h)
-
-    conv_dl = convolve2d(kernel_dl, board_tr, mode='valid')
-    ret += compute_score(conv_dl)
-
-    conv_dr = convolve2d(kernel_dr, board_tr, mode='valid')
-    ret += compute_score(conv_dr)
-
-    return ret
+    return evaluate_board(board, PLAYER1)
 
 
 def minimax(
-        board: np.ndarray,
-        depth: int,
-        player: BoardPiece) -> (float, PlayerAction):
+        board: Union[Board, BitBoard],
+        depth: int) -> (float, PlayerAction):
     """
-    :param board: current board state
+    :param board: current position, board.player is PLAYER1 for maximizing agent, PLAYER2 for minimizing agent.
+        Moves are played on it in place and taken back before returning
     :param depth: depth of the node
-    :param player: PLAYER1 for maximizing agent, PLAYER2 for minimizing agent
     :return: tuple of heuristic value and the move
     """
     move = -1
+    player = board.player
     if player == PLAYER1:
         value = -np.inf
     else:
         value = np.inf
 
-    if depth == 0 or (check_end_state(board, player) != GameState.STILL_PLAYING):
-        return get_minimax_heuristic(board), move
-
-    available_node = np.where(board[0, :] == NO_PLAYER)[0]
+    if depth == 0 or (board.moves and board.is_win()) or board.is_full():
+        return get_minimax_heuristic(board.array), move
 
-    if player == PLAYER1:
-        for node in available_node:
-            new_board = apply_player_action(board, node, player, True)
-            new_val, _ = minimax(new_board, depth - 1, PLAYER2)
-            if new_val > value:
-                value = new_val
-                move = node
-    else:
-        for node in available_node:
-            new_board = apply_player_action(board, node, player, True)
-            new_val, _ = minimax(new_board, depth - 1, PLAYER1)
-            if new_val < value:
-                value = new_val
-                move = node
+    for node in board.valid_actions():
+        board.play(node)
+        new_val, _ = minimax(board, depth - 1)
+        board.undo()
+        if (player == PLAYER1 and new_val > value) or (player == PLAYER2 and new_val < value):
+            value = new_val
+            move = node
 
     return value, move
 
@@ -110,58 +98,100 @@ def generate_move_minimax(
     :return: tuple of action/move and saved state
     """
 
-    _, action = minimax(board, depth, player)
+    _, action = minimax(Board(board.copy(), player), depth)
     return action, saved_state
 
 
 def minimax_ab(
-        board: np.ndarray,
+        board: Union[Board, BitBoard],
         depth: int,
         alpha: float,
         beta: float,
-        player: BoardPiece) -> (float, PlayerAction):
+        table: Optional[TranspositionTable] = None,
+        deadline: Optional[float] = None,
+        first_move: Optional[PlayerAction] = None,
+        ordering: Optional[MoveOrdering] = None) -> (float, PlayerAction):
     """
-    :param board: current board state
+    :param board: current position, board.player is PLAYER1 for maximizing agent, PLAYER2 for minimizing agent.
+        Moves are played on it in place and taken back before returning
     :param depth: depth of the node
     :param alpha: alpha value for alpha-beta pruning
     :param beta: beta value for alpha-beta pruning
-    :param player: PLAYER1 for maximizing agent, PLAYER2 for minimizing agent
+    :param table: transposition table to look up and store positions, not used if None
+    :param deadline: time.time() after which SearchTimeout is raised, no time limit if None
+    :param first_move: move searched first at this node, e.g. the best move of a shallower search
+    :param ordering: hash move, killer and history move ordering. Moves are searched center first if None
     :return: tuple of heuristic value and the move
     """
+    if deadline is not None and time.time() > deadline:
+        raise SearchTimeout()
+    if ordering is not None:
+        ordering.nodes += 1
 
     move = -1
+    player = board.player
 
     if player == PLAYER1:
         value = -np.inf
     else:
         value = np.inf
 
-    if depth == 0 or (check_end_state(board, player) != GameState.STILL_PLAYING):
-        return get_minimax_heuristic(board), move
+    if depth == 0 or (board.moves and board.is_win()) or board.is_full():
+        return get_minimax_heuristic(board.array), move
+
+    hash_move = first_move
+    if table is not None:
+        entry = table.probe(board.zobrist)
+        if entry is not None and hash_move is None:
+            hash_move = entry.move
+        if entry is not None and entry.depth >= depth:
+            if entry.flag == EXACT:
+                return entry.value, entry.move
+            if entry.flag == LOWER:
+                alpha = max(alpha, entry.value)
+            else:
+                beta = min(beta, entry.value)
+            if alpha >= beta:
+                return entry.value, entry.move
 
-    available_node = np.where(board[0, :] == NO_PLAYER)[0]
-    np.random.shuffle(available_node)
+    window = (alpha, beta)
 
-    if player == PLAYER1:
-        for node in available_node:
-            new_board = apply_player_action(board, node, player, True)
-            new_val, _ = minimax_ab(new_board, depth - 1, alpha, beta, PLAYER2)
+    ply = len(board.moves)
+    if ordering is not None:
+        available_node = ordering.order(board.valid_actions(), ply, player, hash_move)
+    else:
+        available_node = center_order(board.valid_actions())
+        if hash_move in available_node:
+            available_node.remove(hash_move)
+            available_node.insert(0, hash_move)
+
+    for node in available_node:
+        board.play(node)
+        new_val, _ = minimax_ab(board, depth - 1, alpha, beta, table, deadline, None, ordering)
+        board.undo()
+        if player == PLAYER1:
             if new_val > value:
                 value = new_val
                 move = node
             alpha = max(value, alpha)
-            if alpha >= beta:
-                break
-    else:
-        for node in available_node:
-            new_board = apply_player_action(board, node, player, True)
-            new_val, _ = minimax_ab(new_board, depth - 1, alpha, beta, PLAYER1)
+        else:
             if new_val < value:
                 value = new_val
                 move = node
             beta = min(value, beta)
-            if beta <= alpha:
-                break
+        if alpha >= beta:
+            if ordering is not None:
+                ordering.record_cutoff(node, ply, player, depth)
+            break
+
+    if table is not None:
+        if value <= window[0]:
+            flag = UPPER
+        elif value >= window[1]:
+            flag = LOWER
+        else:
+            flag = EXACT
+        table.store(board.zobrist, depth, flag, value, move)
 
     return value, move
 
@@ -170,16 +200,104 @@ def generate_move_minimax_ab(
         board: np.ndarray,
         player: BoardPiece,
         saved_state: Optional[SavedState],
-        depth: int = 2) -> Tuple[PlayerAction, Optional[SavedState]]:
+        depth: int = 2,
+        use_bitboard: bool = False,
+        solver_threshold: int = SOLVER_THRESHOLD,
+        book: Optional[OpeningBook] = None) -> Tuple[PlayerAction, Optional[SavedState]]:
     """
 
     :param board: current board state
     :param player: Moving BoardPiece
-    :param saved_state: unused in this implementation
+    :param saved_state: MinimaxSavedState holding the transposition table of previous moves.
+        A new one is created if it is None or of another type
     :param depth: depth of the search tree, optimal value is 2
+    :param use_bitboard: search on a BitBoard instead of the ndarray board
+    :param solver_threshold: play the move of the exact solver when at most this many cells are empty, 0 never solves
+    :param book: opening book, its move is played without searching if the position is in it
     :return: tuple of action/move and saved state
 
     """
+    if not isinstance(saved_state, MinimaxSavedState):
+        saved_state = MinimaxSavedState()
+    saved_state.new_search()
+
+    if book is not None:
+        book_move = book.lookup_board(board, player)
+        if book_move is not None:
+            return book_move, saved_state
+
+    solved = solve_endgame(board, player, saved_state.solver, solver_threshold)
+    if solved is not None:
+        return PlayerAction(solved.move), saved_state
+
+    if use_bitboard:
+        position = BitBoard.from_array(board, player)
+    else:
+        position = Board(board.copy(), player)
+
+    _, action = minimax_ab(position, depth, -np.inf, np.inf, saved_state.table, ordering=saved_state.ordering)
+    return action, saved_state
+
+
+def generate_move_minimax_id(
+        board: np.ndarray,
+        player: BoardPiece,
+        saved_state: Optional[SavedState],
+        max_t: float = 1.,
+        max_depth: Optional[int] = None,
+        use_bitboard: bool = False,
+        solver_threshold: int = SOLVER_THRESHOLD,
+        book: Optional[OpeningBook] = None) -> Tuple[PlayerAction, Optional[SavedState]]:
+    """
+    Iterative deepening alpha-beta search. Searches depth 1, 2, 3 ... until max_t seconds are used up and returns
+    the move of the deepest completed search. Every iteration searches the previous best move first.
+
+    :param board: current board state
+    :param player: Moving BoardPiece
+    :param saved_state: MinimaxSavedState holding the transposition table of previous moves.
+        A new one is created if it is None or of another type
+    :param max_t: time budget of the move in seconds. Depth 1 is always completed
+    :param max_depth: deepest depth to search, limited by the number of empty cells if None
+    :param use_bitboard: search on a BitBoard instead of the ndarray board
+    :param solver_threshold: play the move of the exact solver when at most this many cells are empty, 0 never solves
+    :param book: opening book, its move is played without searching if the position is in it
+    :return: tuple of action/move and saved state
+    """
+    deadline = time.time() + max_t
+
+    if not isinstance(saved_state, MinimaxSavedState):
+        saved_state = MinimaxSavedState()
+    saved_state.new_search()
+
+    if book is not None:
+        book_move = book.lookup_board(board, player)
+        if book_move is not None:
+            return book_move, saved_state
+
+    solved = solve_endgame(board, player, saved_state.solver, solver_threshold)
+    if solved is not None:
+        return PlayerAction(solved.move), saved_state
+
+    if use_bitboard:
+        position = BitBoard.from_array(board, player)
+    else:
+        position = Board(board.copy(), player)
+
+    empty = int(np.count_nonzero(board == NO_PLAYER))
+    max_depth = empty if max_depth is None else min(max_depth, empty)
+
+    action = -1
+    for depth in range(1, max_depth + 1):
+        try:
+            _, action = minimax_ab(
+                position, depth, -np.inf, np.inf, saved_state.table, deadline if depth > 1 else None,
+                action if depth > 1 else None, saved_state.ordering
+            )
+        except SearchTimeout:
+            break
+
+        saved_state.depth = depth
+        if time.time() > deadline:
+            break
 
-    _, action = minimax_ab(board, depth, -np.inf, np.inf, player)
     return action, saved_state
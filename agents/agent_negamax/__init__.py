@@ -0,0 +1 @@
+from .negamax import generate_move_negamax as generate_move
@@ -0,0 +1,195 @@
+import numpy as np
+import time
+from typing import Optional, Tuple, Union
+from agents.common import BoardPiece, SavedState, PlayerAction, NO_PLAYER
+from agents.common import Board
+from agents.bitboard import BitBoard
+from agents.evaluation import evaluate_board
+from agents.transposition import TranspositionTable, EXACT, LOWER, UPPER
+from agents.ordering import MoveOrdering, center_order
+from agents.agent_minimax.minimax import MinimaxSavedState, SearchTimeout
+
+
+def negamax(
+        board: Union[Board, BitBoard],
+        depth: int,
+        alpha: float,
+        beta: float,
+        table: Optional[TranspositionTable] = None,
+        deadline: Optional[float] = None,
+        first_move: Optional[PlayerAction] = None,
+        ordering: Optional[MoveOrdering] = None) -> (float, PlayerAction):
+    """
+    Principal variation search: the first move is searched with the full window, the others with a null window
+    around alpha and only re-searched if they turn out to be better.
+
+    :param board: current position. Moves are played on it in place and taken back before returning
+    :param depth: depth of the node
+    :param alpha: lower bound of the window, from the view of the player to move
+    :param beta: upper bound of the window, from the view of the player to move
+    :param table: transposition table to look up and store positions, not used if None
+    :param deadline: time.time() after which SearchTimeout is raised, no time limit if None
+    :param first_move: move searched first at this node, e.g. the best move of a shallower search
+    :param ordering: hash move, killer and history move ordering. Moves are searched center first if None
+    :return: tuple of heuristic value for the player to move and the move
+    """
+    if deadline is not None and time.time() > deadline:
+        raise SearchTimeout()
+    if ordering is not None:
+        ordering.nodes += 1
+
+    move = -1
+    player = board.player
+
+    if depth == 0 or (board.moves and board.is_win()) or board.is_full():
+        return evaluate_board(board.array, player), move
+
+    hash_move = first_move
+    if table is not None:
+        entry = table.probe(board.zobrist)
+        if entry is not None and hash_move is None:
+            hash_move = entry.move
+        if entry is not None and entry.depth >= depth:
+            if entry.flag == EXACT:
+                return entry.value, entry.move
+            if entry.flag == LOWER:
+                alpha = max(alpha, entry.value)
+            else:
+                beta = min(beta, entry.value)
+            if alpha >= beta:
+                return entry.value, entry.move
+
+    window = (alpha, beta)
+
+    ply = len(board.moves)
+    if ordering is not None:
+        available_node = ordering.order(board.valid_actions(), ply, player, hash_move)
+    else:
+        available_node = center_order(board.valid_actions())
+        if hash_move in available_node:
+            available_node.remove(hash_move)
+            available_node.insert(0, hash_move)
+
+    value = -np.inf
+    for i, node in enumerate(available_node):
+        board.play(node)
+        if i == 0:
+            new_val = -negamax(board, depth - 1, -beta, -alpha, table, deadline, None, ordering)[0]
+        else:
+            new_val = -negamax(board, depth - 1, -alpha - 1, -alpha, table, deadline, None, ordering)[0]
+            if alpha < new_val < beta:
+                new_val = -negamax(board, depth - 1, -beta, -new_val, table, deadline, None, ordering)[0]
+        board.undo()
+
+        if new_val > value:
+            value = new_val
+            move = node
+        alpha = max(value, alpha)
+        if alpha >= beta:
+            if ordering is not None:
+                ordering.record_cutoff(node, ply, player, depth)
+            break
+
+    if table is not None:
+        if value <= window[0]:
+            flag = UPPER
+        elif value >= window[1]:
+            flag = LOWER
+        else:
+            flag = EXACT
+        table.store(board.zobrist, depth, flag, value, move)
+
+    return value, move
+
+
+def aspiration_search(
+        board: Union[Board, BitBoard],
+        depth: int,
+        guess: float,
+        window: float,
+        table: Optional[TranspositionTable] = None,
+        deadline: Optional[float] = None,
+        first_move: Optional[PlayerAction] = None,
+        ordering: Optional[MoveOrdering] = None) -> (float, PlayerAction):
+    """
+    Searches with the window (guess - window, guess + window). If the value falls outside of it, the failing side
+    is opened up to infinity and the position searched again.
+
+    :param board: current position
+    :param depth: depth of the search
+    :param guess: expected value, e.g. the value of the previous iteration. Full window search if infinite
+    :param window: half width of the aspiration window
+    :param table: transposition table, not used if None
+    :param deadline: time.time() after which SearchTimeout is raised, no time limit if None
+    :param first_move: move searched first at the root
+    :param ordering: move ordering, moves are searched center first if None
+    :return: tuple of heuristic value for the player to move and the move
+    """
+    alpha = guess - window
+    beta = guess + window
+    if not np.isfinite(guess):
+        alpha, beta = -np.inf, np.inf
+
+    while True:
+        value, move = negamax(board, depth, alpha, beta, table, deadline, first_move, ordering)
+        if value <= alpha and alpha > -np.inf:
+            alpha = -np.inf
+        elif value >= beta and beta < np.inf:
+            beta = np.inf
+        else:
+            return value, move
+        first_move = move
+
+
+def generate_move_negamax(
+        board: np.ndarray,
+        player: BoardPiece,
+        saved_state: Optional[SavedState],
+        max_t: float = 1.,
+        max_depth: Optional[int] = None,
+        window: float = 100.,
+        use_bitboard: bool = False) -> Tuple[PlayerAction, Optional[SavedState]]:
+    """
+    Iterative deepening negamax agent. Every iteration after the first searches with an aspiration window
+    around the value of the previous one.
+
+    :param board: current board state
+    :param player: Moving BoardPiece
+    :param saved_state: MinimaxSavedState holding the transposition table of previous moves.
+        A new one is created if it is None or of another type
+    :param max_t: time budget of the move in seconds. Depth 1 is always completed
+    :param max_depth: deepest depth to search, limited by the number of empty cells if None
+    :param window: half width of the aspiration window
+    :param use_bitboard: search on a BitBoard instead of the ndarray board
+    :return: tuple of action/move and saved state
+    """
+    deadline = time.time() + max_t
+
+    if not isinstance(saved_state, MinimaxSavedState):
+        saved_state = MinimaxSavedState()
+    saved_state.new_search()
+
+    if use_bitboard:
+        position = BitBoard.from_array(board, player)
+    else:
+        position = Board(board.copy(), player)
+
+    empty = int(np.count_nonzero(board == NO_PLAYER))
+    max_depth = empty if max_depth is None else min(max_depth, empty)
+
+    action = -1
+    value = np.inf
+    for depth in range(1, max_depth + 1):
+        try:
+            value, action = aspiration_search(
+                position, depth, value if depth > 1 else np.inf, window, saved_state.table,
+                deadline if depth > 1 else None, action if depth > 1 else None, saved_state.ordering
+            )
+        except SearchTimeout:
+            break
+
+        saved_state.depth = depth
+        if time.time() > deadline:
+            break
+
+    return action, saved_state
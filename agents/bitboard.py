@@ -0,0 +1,283 @@
+import numpy as np
+from typing import List, Optional
+
+from agents.common import BoardPiece, PlayerAction, GameState, NO_PLAYER, PLAYER1, PLAYER2
+from agents.common import other_player, zobrist_hash, ZOBRIST_KEYS, ZOBRIST_SIDE
+
+ROWS = 6
+COLS = 7
+COL_STRIDE = ROWS + 1  # every column gets one empty sentinel bit on top, so shifts never wrap around
+
+BOTTOM_MASK = sum(1 << (col * COL_STRIDE) for col in range(COLS))
+BOARD_MASK = BOTTOM_MASK * ((1 << ROWS) - 1)
+
+_BOTTOM = [1 << (col * COL_STRIDE) for col in range(COLS)]
+_TOP = [1 << (ROWS - 1 + col * COL_STRIDE) for col in range(COLS)]
+_COLUMN = [((1 << ROWS) - 1) << (col * COL_STRIDE) for col in range(COLS)]
+
+# CELL_BITS[r, c] is the bit of the ndarray cell board[r, c]. board[0, :] is the top row, bit 0 of a column its bottom
+CELL_BITS = np.array(
+    [[1 << ((ROWS - 1 - row) + col * COL_STRIDE) for col in range(COLS)] for row in range(ROWS)],
+    dtype=np.uint64
+)
+
+
+def connected_four_bits(pieces: int) -> bool:
+    """
+    Shift-and-mask check for four aligned bits in vertical, diagonal or horizontal direction
+
+    :param pieces: bitmask of the pieces of one player
+    :return: True if the pieces contain four in a row
+    """
+    for shift in (1, COL_STRIDE - 1, COL_STRIDE, COL_STRIDE + 1):
+        pairs = pieces & (pieces >> shift)
+        if pairs & (pairs >> (2 * shift)):
+            return True
+    return False
+
+
+def array_to_bits(board: np.ndarray, player: BoardPiece) -> int:
+    """
+    Packs the pieces of `player` on an ndarray board into a bitmask
+
+    :param board: board of shape (6, 7)
+    :param player: BoardPiece to pack
+    :return: bitmask of the pieces
+    """
+    return int(CELL_BITS[board == player].sum())
+
+
+def bits_to_array(pieces: int) -> np.ndarray:
+    """
+    Unpacks a bitmask into a boolean (6, 7) array
+
+    :param pieces: bitmask of pieces
+    :return: boolean array, True where the bit is set
+    """
+    return (CELL_BITS & np.uint64(pieces)) != 0
+
+
+def pack_boards(boards: np.ndarray, player: BoardPiece) -> np.ndarray:
+    """
+    Packs the pieces of `player` on a stack of ndarray boards into bitmasks
+
+    :param boards: stack of boards with shape (N, 6, 7)
+    :param player: BoardPiece to pack
+    :return: uint64 array of shape (N,)
+    """
+    return np.where(np.asarray(boards) == player, CELL_BITS, np.uint64(0)).sum(axis=(1, 2), dtype=np.uint64)
+
+
+def connected_four_bits_batch(pieces: np.ndarray) -> np.ndarray:
+    """
+    Vectorized connected_four_bits
+
+    :param pieces: uint64 array of bitmasks
+    :return: boolean array, True where the pieces contain four in a row
+    """
+    pieces = np.asarray(pieces, dtype=np.uint64)
+    ret = np.zeros(pieces.shape, dtype=bool)
+    for shift in (1, COL_STRIDE - 1, COL_STRIDE, COL_STRIDE + 1):
+        pairs = pieces & (pieces >> np.uint64(shift))
+        ret |= (pairs & (pairs >> np.uint64(2 * shift))) != 0
+    return ret
+
+
+def check_end_state_batch(positions: np.ndarray, masks: np.ndarray, players: np.ndarray) -> np.ndarray:
+    """
+    Vectorized BitBoard.check_end_state over N packed positions, for both players at once
+
+    :param positions: uint64 array of the pieces of the player to move
+    :param masks: uint64 array of the occupied cells
+    :param players: BoardPiece of the player to move, either one for all positions or an array
+    :return: int8 array of shape (N, 2) holding the GameState value of every position for PLAYER1 (column 0)
+        and PLAYER2 (column 1)
+    """
+    positions = np.asarray(positions, dtype=np.uint64)
+    masks = np.asarray(masks, dtype=np.uint64)
+    to_move_is_1 = np.asarray(players) == PLAYER1
+
+    pieces_1 = np.where(to_move_is_1, positions, positions ^ masks)
+    pieces_2 = pieces_1 ^ masks
+
+    ret = np.zeros((positions.shape[0], 2), dtype=np.int8)
+    ret[masks == np.uint64(BOARD_MASK)] = GameState.IS_DRAW.value
+    ret[connected_four_bits_batch(pieces_1), 0] = GameState.IS_WIN.value
+    ret[connected_four_bits_batch(pieces_2), 1] = GameState.IS_WIN.value
+
+    return ret
+
+
+class BitBoard:
+    __slots__ = ('position', 'mask', 'player', 'heights', 'moves', 'zobrist')
+
+    def __init__(
+            self,
+            position: int = 0,
+            mask: int = 0,
+            player: BoardPiece = PLAYER1,
+            heights: Optional[List[int]] = None,
+            moves: Optional[List[int]] = None,
+            zobrist: Optional[int] = None):
+        """
+        Connect 4 position stored as two integers, using 7 bits per column (6 rows plus one sentinel bit).
+
+        :param position: bitmask of the pieces of the player to move
+        :param mask: bitmask of all occupied cells
+        :param player: BoardPiece of the player to move
+        :param heights: number of pieces in each column
+        :param moves: stack of played columns, used by undo
+        :param zobrist: Zobrist key of the position, computed if None
+        """
+        self.position = position
+        self.mask = mask
+        self.player = player
+        if heights is None:
+            heights = [bin(mask & _COLUMN[col]).count('1') for col in range(COLS)]
+        self.heights = heights
+        self.moves = [] if moves is None else moves
+        self.zobrist = zobrist_hash(self.to_array(), player) if zobrist is None else zobrist
+
+    @classmethod
+    def from_array(cls, board: np.ndarray, player: BoardPiece) -> 'BitBoard':
+        """
+        Builds a BitBoard from an ndarray board
+
+        :param board: board of shape (6, 7)
+        :param player: BoardPiece of the player to move
+        :return: BitBoard of the same position
+        """
+        position = array_to_bits(board, player)
+        mask = position | array_to_bits(board, other_player(player))
+        heights = (board != NO_PLAYER).sum(axis=0).tolist()
+        return cls(position, mask, player, heights, zobrist=zobrist_hash(board, player))
+
+    def to_array(self) -> np.ndarray:
+        """
+        Converts the position back into an ndarray board as returned by initialize_game_state
+
+        :return: board of shape (6, 7) and dtype BoardPiece
+        """
+        board = np.zeros((ROWS, COLS), dtype=BoardPiece)
+        board[bits_to_array(self.position)] = self.player
+        board[bits_to_array(self.position ^ self.mask)] = other_player(self.player)
+        return board
+
+    @property
+    def array(self) -> np.ndarray:
+        """
+        ndarray board of the position, rebuilt on every access. Mirrors agents.common.Board.array
+
+        :return: board of shape (6, 7) and dtype BoardPiece
+        """
+        return self.to_array()
+
+    def copy(self) -> 'BitBoard':
+        """
+        :return: independent copy of the BitBoard
+        """
+        return BitBoard(
+            self.position, self.mask, self.player, self.heights.copy(), self.moves.copy(), self.zobrist
+        )
+
+    def key(self) -> int:
+        """
+        Unique key of the position, valid as long as the player to move follows from the piece count
+
+        :return: position + mask
+        """
+        return self.position + self.mask
+
+    def pieces(self, player: BoardPiece) -> int:
+        """
+        :param player: BoardPiece
+        :return: bitmask of the pieces of `player`
+        """
+        if player == self.player:
+            return self.position
+        return self.position ^ self.mask
+
+    def can_play(self, action: PlayerAction) -> bool:
+        """
+        :param action: column
+        :return: True if the column is not full
+        """
+        return not self.mask & _TOP[action]
+
+    def valid_moves_mask(self) -> int:
+        """
+        :return: bitmask with the landing cell of every non-full column set
+        """
+        return (self.mask + BOTTOM_MASK) & BOARD_MASK
+
+    def valid_actions(self) -> List[PlayerAction]:
+        """
+        :return: list of columns that are not full
+        """
+        return [col for col in range(COLS) if not self.mask & _TOP[col]]
+
+    def play(self, action: PlayerAction) -> None:
+        """
+        Drops a piece of the player to move into column `action` and passes the turn. The column must not be full.
+
+        :param action: column
+        """
+        self.zobrist ^= ZOBRIST_KEYS[self.player][ROWS - 1 - self.heights[action]][action] ^ ZOBRIST_SIDE
+        self.position ^= self.mask
+        self.mask |= self.mask + _BOTTOM[action]
+        self.heights[action] += 1
+        self.moves.append(action)
+        self.player = PLAYER2 if self.player == PLAYER1 else PLAYER1
+
+    def undo(self) -> PlayerAction:
+        """
+        Takes back the last move played with play()
+
+        :return: column of the removed piece
+        """
+        action = self.moves.pop()
+        self.heights[action] -= 1
+        self.mask ^= _BOTTOM[action] << self.heights[action]
+        self.position ^= self.mask
+        self.player = PLAYER2 if self.player == PLAYER1 else PLAYER1
+        self.zobrist ^= ZOBRIST_KEYS[self.player][ROWS - 1 - self.heights[action]][action] ^ ZOBRIST_SIDE
+        return action
+
+    def is_winning_move(self, action: PlayerAction) -> bool:
+        """
+        :param action: playable column
+        :return: True if playing `action` connects four for the player to move
+        """
+        return connected_four_bits(self.position | ((self.mask + _BOTTOM[action]) & _COLUMN[action]))
+
+    def is_win(self) -> bool:
+        """
+        :return: True if the player who moved last has four in a row
+        """
+        return connected_four_bits(self.position ^ self.mask)
+
+    def is_full(self) -> bool:
+        """
+        :return: True if no move is left
+        """
+        return self.mask == BOARD_MASK
+
+    def connected_four(self, player: BoardPiece) -> bool:
+        """
+        :param player: BoardPiece
+        :return: True if `player` has four in a row
+        """
+        return connected_four_bits(self.pieces(player))
+
+    def check_end_state(self, player: BoardPiece) -> GameState:
+        """
+        Same as agents.common.check_end_state on the equivalent ndarray board
+
+        :param player: BoardPiece
+        :return: game state for `player`
+        """
+        if self.connected_four(player):
+            return GameState.IS_WIN
+        if self.is_full():
+            return GameState.IS_DRAW
+        return GameState.STILL_PLAYING
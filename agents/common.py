@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Optional, Callable, Tuple
+from typing import Optional, Callable, Tuple, List
 import numpy as np
 from scipy.signal import convolve2d
 
@@ -26,6 +26,13 @@ class SavedState:
     pass
 
 
+# random 64 bit keys of every (player, row, col) for Zobrist hashing, XOR-ed with ZOBRIST_SIDE when PLAYER2 is to move
+ZOBRIST_TABLE = np.random.default_rng(0xC4).integers(
+    0, np.iinfo(np.uint64).max, size=(2, 6, 7), dtype=np.uint64, endpoint=True
+)
+ZOBRIST_KEYS = {PLAYER1: ZOBRIST_TABLE[0].tolist(), PLAYER2: ZOBRIST_TABLE[1].tolist()}
+ZOBRIST_SIDE = 0x9E3779B97F4A7C15
+
 GenMove = Callable[
     [np.ndarray, BoardPiece, Optional[SavedState]],  # Arguments for the generate_move function
     Tuple[PlayerAction, Optional[SavedState]]  # Return type of the generate_move function
@@ -138,15 +145,32 @@ def apply_player_action(
         return ret
 
 
+def other_player(player: BoardPiece) -> BoardPiece:
+    """
+    Returns the opponent of `player`
+
+    :param player: PLAYER1 or PLAYER2
+    :return: the other BoardPiece
+    """
+    return PLAYER2 if player == PLAYER1 else PLAYER1
+
+
 def connected_four(
     board: np.ndarray, player: BoardPiece, last_action: Optional[PlayerAction] = None,
 ) -> bool:
     """
     Returns True if there are four adjacent pieces equal to `player` arranged
     in either a horizontal, vertical, or diagonal line. Returns False otherwise.
-    If desired, the last action taken (i.e. last column played) can be provided
-    for potential speed optimisation.
+    If the last action taken (i.e. last column played) is provided and the top piece
+    of that column belongs to `player`, only the four lines through that piece are
+    inspected. This assumes there was no four in a row before the last action.
     """
+    if last_action is not None:
+        col = int(np.ravel(last_action)[0])  # agents may return the action as a one element array
+        column = board[:, col]
+        filled = np.flatnonzero(column != NO_PLAYER)
+        if filled.size and column[filled[0]] == player:
+            return connected_four_at(board, player, int(filled[0]), col)
 
     board_bin = np.array(board == player, dtype=int)
 
@@ -174,6 +198,33 @@ def connected_four(
     return False
 
 
+def connected_four_at(board: np.ndarray, player: BoardPiece, row: int, col: int) -> bool:
+    """
+    Returns True if the piece at board[row, col] is part of four adjacent pieces
+    equal to `player` in a horizontal, vertical or diagonal line.
+
+    :param board: current board state
+    :param player: BoardPiece to check
+    :param row: row of the piece
+    :param col: column of the piece
+    :return: True if a line through (row, col) is connected
+    """
+    rows, cols = board.shape
+    for d_row, d_col in ((1, 0), (0, 1), (1, 1), (1, -1)):
+        count = 1
+        for sign in (1, -1):
+            r = row + sign * d_row
+            c = col + sign * d_col
+            while 0 <= r < rows and 0 <= c < cols and board[r, c] == player:
+                count += 1
+                r += sign * d_row
+                c += sign * d_col
+        if count >= 4:
+            return True
+
+    return False
+
+
 def check_end_state(
     board: np.ndarray, player: BoardPiece, last_action: Optional[PlayerAction] = None,
 ) -> GameState:
@@ -189,6 +240,46 @@ def check_end_state(
 
     return GameState.STILL_PLAYING
 
+def check_end_state_batch(boards: np.ndarray) -> np.ndarray:
+    """
+    Vectorized check_end_state over a stack of boards, for both players at once
+
+    :param boards: stack of boards with shape (N, rows, cols)
+    :return: int8 array of shape (N, 2) holding the GameState value of every board for PLAYER1 (column 0)
+        and PLAYER2 (column 1)
+    """
+    boards = np.asarray(boards)
+    ret = np.zeros((boards.shape[0], 2), dtype=np.int8)
+
+    full = (boards != NO_PLAYER).all(axis=(1, 2))
+    ret[full] = GameState.IS_DRAW.value
+
+    for i, player in enumerate((PLAYER1, PLAYER2)):
+        b = boards == player
+        won = (b[:, 3:, :] & b[:, 2:-1, :] & b[:, 1:-2, :] & b[:, :-3, :]).any(axis=(1, 2))
+        won |= (b[:, :, 3:] & b[:, :, 2:-1] & b[:, :, 1:-2] & b[:, :, :-3]).any(axis=(1, 2))
+        won |= (b[:, 3:, 3:] & b[:, 2:-1, 2:-1] & b[:, 1:-2, 1:-2] & b[:, :-3, :-3]).any(axis=(1, 2))
+        won |= (b[:, :-3, 3:] & b[:, 1:-2, 2:-1] & b[:, 2:-1, 1:-2] & b[:, 3:, :-3]).any(axis=(1, 2))
+        ret[won, i] = GameState.IS_WIN.value
+
+    return ret
+
+
+def zobrist_hash(board: np.ndarray, player: BoardPiece) -> int:
+    """
+    Computes the Zobrist key of a (6, 7) board from scratch. Board and BitBoard keep it up to date incrementally.
+
+    :param board: current board state
+    :param player: BoardPiece of the player to move
+    :return: 64 bit key
+    """
+    key = int(np.bitwise_xor.reduce(ZOBRIST_TABLE[0][board == PLAYER1]))
+    key ^= int(np.bitwise_xor.reduce(ZOBRIST_TABLE[1][board == PLAYER2]))
+    if player == PLAYER2:
+        key ^= ZOBRIST_SIDE
+    return key
+
+
 def check_valid_action(
         board: np.ndarray, action: PlayerAction) -> bool:
     """
@@ -200,3 +291,111 @@ def check_valid_action(
     """
 
     return board[0, action] == NO_PLAYER
+
+
+class Board:
+    def __init__(self, board: Optional[np.ndarray] = None, player: BoardPiece = PLAYER1):
+        """
+        Mutable board that plays and takes back moves in place, keeping the height of every column
+        and a stack of the played columns.
+
+        :param board: ndarray board to wrap. It is not copied, moves are written into it directly.
+            A new empty board is created if None
+        :param player: BoardPiece of the player to move
+        :type self.array: the wrapped ndarray, usable with every function working on ndarray boards
+        :type self.heights: number of pieces in each column
+        :type self.moves: stack of played columns
+        :type self.zobrist: Zobrist key of the position, see zobrist_hash
+        """
+        self.array = initialize_game_state() if board is None else board
+        self.player = player
+        self.heights = np.count_nonzero(self.array != NO_PLAYER, axis=0).tolist()
+        self.moves = []
+        self.zobrist = zobrist_hash(self.array, player)
+
+    def copy(self) -> 'Board':
+        """
+        :return: Board wrapping a copy of the ndarray, with the same player, heights and move stack
+        """
+        ret = Board.__new__(Board)
+        ret.array = self.array.copy()
+        ret.player = self.player
+        ret.heights = self.heights.copy()
+        ret.moves = self.moves.copy()
+        ret.zobrist = self.zobrist
+        return ret
+
+    def to_array(self) -> np.ndarray:
+        """
+        :return: copy of the wrapped ndarray
+        """
+        return self.array.copy()
+
+    def can_play(self, action: PlayerAction) -> bool:
+        """
+        :param action: column
+        :return: True if the column is not full
+        """
+        return self.heights[action] < self.array.shape[0]
+
+    def valid_actions(self) -> List[PlayerAction]:
+        """
+        :return: list of columns that are not full
+        """
+        rows = self.array.shape[0]
+        return [col for col, height in enumerate(self.heights) if height < rows]
+
+    def play(self, action: PlayerAction) -> None:
+        """
+        Drops a piece of the player to move into column `action` and passes the turn. The column must not be full.
+
+        :param action: column
+        """
+        row = self.array.shape[0] - 1 - self.heights[action]
+        self.array[row, action] = self.player
+        self.zobrist ^= ZOBRIST_KEYS[self.player][row][action] ^ ZOBRIST_SIDE
+        self.heights[action] += 1
+        self.moves.append(action)
+        self.player = other_player(self.player)
+
+    def undo(self) -> PlayerAction:
+        """
+        Takes back the last move played with play()
+
+        :return: column of the removed piece
+        """
+        action = self.moves.pop()
+        self.heights[action] -= 1
+        self.player = other_player(self.player)
+        row = self.array.shape[0] - 1 - self.heights[action]
+        self.array[row, action] = NO_PLAYER
+        self.zobrist ^= ZOBRIST_KEYS[self.player][row][action] ^ ZOBRIST_SIDE
+        return action
+
+    def is_win(self) -> bool:
+        """
+        Checks the lines through the last played piece only. Without played moves the whole board is checked.
+
+        :return: True if the player who moved last has four in a row
+        """
+        if not self.moves:
+            return connected_four(self.array, other_player(self.player))
+        action = self.moves[-1]
+        row = self.array.shape[0] - self.heights[action]
+        return connected_four_at(self.array, other_player(self.player), row, action)
+
+    def is_full(self) -> bool:
+        """
+        :return: True if no move is left
+        """
+        return min(self.heights) >= self.array.shape[0]
+
+    def check_end_state(self, player: BoardPiece) -> GameState:
+        """
+        Same as check_end_state on the wrapped ndarray
+
+        :param player: BoardPiece
+        :return: game state for `player`
+        """
+        last_action = self.moves[-1] if self.moves else None
+        return check_end_state(self.array, player, last_action)
@@ -0,0 +1,130 @@
+import numpy as np
+
+from agents.common import BoardPiece, PLAYER1, other_player
+
+ROWS = 6
+COLS = 7
+
+
+def _win_lines() -> np.ndarray:
+    """
+    Flat indices of the cells of every four-cell line on a (ROWS, COLS) board, in the order vertical, horizontal,
+    diagonal and anti-diagonal
+
+    :return: int array of shape (69, 4)
+    """
+    lines = []
+    for d_row, d_col in ((1, 0), (0, 1), (1, 1), (1, -1)):
+        for row in range(ROWS):
+            for col in range(COLS):
+                cells = [(row + i * d_row, col + i * d_col) for i in range(4)]
+                if all(0 <= r < ROWS and 0 <= c < COLS for r, c in cells):
+                    lines.append([r * COLS + c for r, c in cells])
+    return np.array(lines, dtype=np.intp)
+
+
+WIN_LINES = _win_lines()
+# CELL_LINES[i] holds the indices (into WIN_LINES) of the lines going through flat cell i
+CELL_LINES = [np.flatnonzero((WIN_LINES == cell).any(axis=1)) for cell in range(ROWS * COLS)]
+
+# score of a line indexed by (own pieces - opponent pieces) + 4, same weights as compute_score
+LINE_SCORES = np.array([-9999, -999, -99, -9, 0, 9, 99, 999, 9999], dtype=np.int64)
+
+
+def line_sums(board: np.ndarray, player: BoardPiece) -> np.ndarray:
+    """
+    Gathers the cells of every win line and sums them, counting +1 for `player` and -1 for the opponent
+
+    :param board: board of shape (6, 7)
+    :param player: player whose perspective is taken
+    :return: int array of shape (69,)
+    """
+    signed = (board == player).astype(np.int8) - (board == other_player(player)).astype(np.int8)
+    return signed.ravel()[WIN_LINES].sum(axis=1)
+
+
+def evaluate_board(board: np.ndarray, player: BoardPiece) -> int:
+    """
+    Heuristic value of the board for `player`. The closer a line is to four pieces of one player, the bigger
+    its contribution. Gives the same value as summing compute_score over the four directional convolutions
+
+    :param board: board of shape (6, 7)
+    :param player: player whose perspective is taken
+    :return: heuristic value
+    """
+    return int(LINE_SCORES[line_sums(board, player) + 4].sum())
+
+
+def evaluate_boards(boards: np.ndarray, player: BoardPiece) -> np.ndarray:
+    """
+    Vectorized evaluate_board over a stack of boards
+
+    :param boards: boards of shape (N, 6, 7)
+    :param player: player whose perspective is taken
+    :return: int array of shape (N,) holding the heuristic values
+    """
+    boards = np.asarray(boards)
+    signed = (boards == player).astype(np.int8) - (boards == other_player(player)).astype(np.int8)
+    sums = signed.reshape(boards.shape[0], -1)[:, WIN_LINES].sum(axis=2)
+    return LINE_SCORES[sums + 4].sum(axis=1)
+
+
+class LineEvaluator:
+    def __init__(self, board: np.ndarray, player: BoardPiece = PLAYER1):
+        """
+        Keeps the line sums and heuristic value of a board, so that adding or removing one piece
+        only updates the lines going through its cell.
+
+        :param board: board of shape (6, 7)
+        :param player: player whose perspective is taken
+        :type self.sums: line sums as returned by line_sums
+        :type self.score: heuristic value as returned by evaluate_board
+        """
+        self.player = player
+        self.sums = line_sums(board, player)
+        self.score = int(LINE_SCORES[self.sums + 4].sum())
+
+    def delta(self, row: int, col: int, piece: BoardPiece) -> int:
+        """
+        Change of the score if `piece` is placed at (row, col), without applying it
+
+        :param row: row of the cell
+        :param col: column of the cell
+        :param piece: BoardPiece placed
+        :return: score difference
+        """
+        lines = self.sums[CELL_LINES[row * COLS + col]] + 4
+        step = 1 if piece == self.player else -1
+        return int(LINE_SCORES[lines + step].sum() - LINE_SCORES[lines].sum())
+
+    def add(self, row: int, col: int, piece: BoardPiece) -> None:
+        """
+        Updates sums and score for `piece` placed at (row, col)
+
+        :param row: row of the cell
+        :param col: column of the cell
+        :param piece: BoardPiece placed
+        """
+        self.score += self.delta(row, col, piece)
+        self.sums[CELL_LINES[row * COLS + col]] += 1 if piece == self.player else -1
+
+    def remove(self, row: int, col: int, piece: BoardPiece) -> None:
+        """
+        Updates sums and score for `piece` removed from (row, col)
+
+        :param row: row of the cell
+        :param col: column of the cell
+        :param piece: BoardPiece removed
+        """
+        lines = CELL_LINES[row * COLS + col]
+        step = 1 if piece == self.player else -1
+        old = LINE_SCORES[self.sums[lines] + 4].sum()
+        self.sums[lines] -= step
+        self.score += int(LINE_SCORES[self.sums[lines] + 4].sum() - old)
+
+    def get_score(self, player: BoardPiece) -> int:
+        """
+        :param player: player whose perspective is taken
+        :return: heuristic value of the current board for `player`
+        """
+        return self.score if player == self.player else -self.score
@@ -0,0 +1,197 @@
+import numpy as np
+from typing import Dict, Optional
+
+from agents.common import BoardPiece, PlayerAction
+from agents.bitboard import BitBoard, COLS, COL_STRIDE
+
+BOOK_DTYPE = np.dtype([('key', '<u8'), ('move', 'i1')])
+EMPTY_KEY = np.iinfo(np.uint64).max  # key of unused slots, never produced by BitBoard.key()
+
+_COLUMN_BITS = (1 << COL_STRIDE) - 1
+_MASK64 = (1 << 64) - 1
+_FIBONACCI = 0x9E3779B97F4A7C15
+
+
+def mirror_bits(bits: int) -> int:
+    """
+    Mirrors a bitmask at the center column
+
+    :param bits: bitmask in BitBoard layout
+    :return: bitmask with column c moved to column COLS - 1 - c
+    """
+    ret = 0
+    for col in range(COLS):
+        ret |= ((bits >> (col * COL_STRIDE)) & _COLUMN_BITS) << ((COLS - 1 - col) * COL_STRIDE)
+    return ret
+
+
+def canonical_key(bitboard: BitBoard) -> (int, bool):
+    """
+    Key shared by a position and its mirror image
+
+    :param bitboard: position
+    :return: tuple of the smaller of both keys and whether it belongs to the mirrored position
+    """
+    key = bitboard.key()
+    mirrored = mirror_bits(bitboard.position) + mirror_bits(bitboard.mask)
+    if mirrored < key:
+        return mirrored, True
+    return key, False
+
+
+def hash_slot(key: int, bits: int) -> int:
+    """
+    Home slot of a key in an open addressing table, by Fibonacci hashing
+
+    :param key: 64 bit key
+    :param bits: log2 of the table size
+    :return: slot index
+    """
+    return ((key * _FIBONACCI) & _MASK64) >> (64 - bits)
+
+
+class OpeningBook:
+    def __init__(self, table: np.ndarray):
+        """
+        Best moves of opening positions stored in an open addressing hash table with linear probing.
+        The table is a structured array of BOOK_DTYPE, usually memory-mapped from a .npy file,
+        and holds every position only once for itself and its mirror image.
+
+        :param table: array whose length is a power of two
+        """
+        self._table = table
+        self._bits = int(len(table)).bit_length() - 1
+
+    @classmethod
+    def from_moves(cls, moves: Dict[int, PlayerAction]) -> 'OpeningBook':
+        """
+        Builds the hash table from a dictionary of canonical keys and moves
+
+        :param moves: dictionary of canonical_key to best move of that orientation
+        :return: OpeningBook holding the moves, at most half full
+        """
+        bits = max(1, (2 * len(moves) - 1).bit_length())
+        table = np.empty(1 << bits, dtype=BOOK_DTYPE)
+        table['key'] = EMPTY_KEY
+        table['move'] = -1
+
+        size_mask = (1 << bits) - 1
+        for key, move in moves.items():
+            slot = hash_slot(key, bits)
+            while table['key'][slot] != EMPTY_KEY:
+                slot = (slot + 1) & size_mask
+            table[slot] = (key, move)
+
+        return cls(table)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'OpeningBook':
+        """
+        Loads a book written by save
+
+        :param path: .npy file
+        :param mmap: memory-map the file read-only instead of reading it, so processes share the pages
+        :return: OpeningBook
+        """
+        return cls(np.load(path, mmap_mode='r' if mmap else None))
+
+    def save(self, path: str) -> None:
+        """
+        Writes the hash table as .npy file
+
+        :param path: file name
+        :return: None
+        """
+        np.save(path, np.asarray(self._table))
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._table['key'] != EMPTY_KEY))
+
+    def lookup(self, bitboard: BitBoard) -> Optional[PlayerAction]:
+        """
+        Looks up the best move of a position or of its mirror image
+
+        :param bitboard: position
+        :return: best move, None if the position is not in the book
+        """
+        key, mirrored = canonical_key(bitboard)
+        size_mask = (1 << self._bits) - 1
+        slot = hash_slot(key, self._bits)
+        while True:
+            stored = int(self._table[slot]['key'])
+            if stored == key:
+                move = int(self._table[slot]['move'])
+                return PlayerAction(COLS - 1 - move if mirrored else move)
+            if stored == EMPTY_KEY:
+                return None
+            slot = (slot + 1) & size_mask
+
+    def lookup_board(self, board: np.ndarray, player: BoardPiece) -> Optional[PlayerAction]:
+        """
+        Same as lookup for an ndarray board
+
+        :param board: current board state
+        :param player: BoardPiece of the player to move
+        :return: best move, None if the position is not in the book
+        """
+        return self.lookup(BitBoard.from_array(board, player))
+
+
+def build_opening_book(max_ply: int = 4, depth: int = 8, verbose: bool = False) -> OpeningBook:
+    """
+    Searches every position up to max_ply pieces with the negamax agent and collects the best moves.
+    Positions that are won already are left out, mirror images are searched once.
+
+    :param max_ply: largest number of pieces of the book positions
+    :param depth: search depth of every position
+    :param verbose: print the progress
+    :return: OpeningBook
+    """
+    from agents.agent_negamax.negamax import aspiration_search
+    from agents.agent_minimax.minimax import MinimaxSavedState
+
+    positions = {}
+    frontier = [BitBoard()]
+    for ply in range(max_ply + 1):
+        next_frontier = []
+        for bitboard in frontier:
+            key, mirrored = canonical_key(bitboard)
+            if key in positions:
+                continue
+            positions[key] = bitboard
+            if ply == max_ply:
+                continue
+            for action in bitboard.valid_actions():
+                if not bitboard.is_winning_move(action):
+                    child = bitboard.copy()
+                    child.play(action)
+                    next_frontier.append(child)
+        frontier = next_frontier
+
+    saved_state = MinimaxSavedState()
+    moves = {}
+    for i, (key, bitboard) in enumerate(positions.items()):
+        saved_state.new_search()
+        bitboard = bitboard.copy()
+        bitboard.moves = []
+        _, move = aspiration_search(
+            bitboard, depth, np.inf, 100., saved_state.table, None, None, saved_state.ordering
+        )
+        _, mirrored = canonical_key(bitboard)
+        moves[key] = COLS - 1 - move if mirrored else move
+        if verbose:
+            print(f'{i + 1}/{len(positions)}')
+
+    return OpeningBook.from_moves(moves)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build an opening book of best moves found by deep search')
+    parser.add_argument('path', help='output .npy file')
+    parser.add_argument('--plies', type=int, default=4, help='largest number of pieces of the book positions')
+    parser.add_argument('--depth', type=int, default=8, help='search depth of every position')
+    args = parser.parse_args()
+
+    build_opening_book(args.plies, args.depth, verbose=True).save(args.path)
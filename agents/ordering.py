@@ -0,0 +1,103 @@
+from typing import List, Optional
+
+from agents.common import BoardPiece, PlayerAction, PLAYER1
+
+COLS = 7
+# distance of every column to the center column, used as the last ordering criterion
+CENTER_DISTANCE = [abs(col - COLS // 2) for col in range(COLS)]
+
+
+def center_order(moves: List[PlayerAction]) -> List[PlayerAction]:
+    """
+    Sorts moves by distance to the center column, ties broken by column index
+
+    :param moves: list of columns
+    :return: sorted list
+    """
+    return sorted(moves, key=lambda move: (CENTER_DISTANCE[move], move))
+
+
+class MoveOrdering:
+    def __init__(self, max_ply: int = 42, n_killers: int = 2, use_killers: bool = True, use_history: bool = True):
+        """
+        Deterministic move ordering for alpha-beta search: the hash move first, then the killer moves of the ply,
+        then moves by history score and finally by distance to the center column.
+        Also counts the searched nodes and beta cutoffs.
+
+        :param max_ply: deepest ply killer moves are kept for
+        :param n_killers: number of killer moves kept per ply
+        :param use_killers: order killer moves before the others
+        :param use_history: order moves by history score
+        :type self.nodes: number of nodes searched since the last new_search
+        :type self.cutoffs: number of beta cutoffs since the last new_search
+        """
+        self._n_killers = n_killers
+        self._use_killers = use_killers
+        self._use_history = use_history
+
+        self._killers = [[] for _ in range(max_ply + 1)]
+        self._history = [[0] * COLS, [0] * COLS]
+
+        self.nodes = 0
+        self.cutoffs = 0
+
+    def new_search(self) -> None:
+        """
+        Clears the killer moves and node counters and halves the history scores of previous searches
+
+        :return: None
+        """
+        for killers in self._killers:
+            killers.clear()
+        self._history = [[score // 2 for score in history] for history in self._history]
+        self.nodes = 0
+        self.cutoffs = 0
+
+    def order(
+            self,
+            moves: List[PlayerAction],
+            ply: int,
+            player: BoardPiece,
+            hash_move: Optional[PlayerAction] = None) -> List[PlayerAction]:
+        """
+        Sorts the moves of a node
+
+        :param moves: valid moves of the node
+        :param ply: distance of the node to the root of the search
+        :param player: BoardPiece to move at the node
+        :param hash_move: best move stored in the transposition table or found by a shallower search
+        :return: sorted list of moves
+        """
+        killers = self._killers[ply] if self._use_killers and ply < len(self._killers) else []
+        history = self._history[0 if player == PLAYER1 else 1]
+        use_history = self._use_history
+
+        def key(move):
+            if move == hash_move:
+                return 0, 0, 0, move
+            if move in killers:
+                return 1, killers.index(move), 0, move
+            return 2, -history[move] if use_history else 0, CENTER_DISTANCE[move], move
+
+        return sorted(moves, key=key)
+
+    def record_cutoff(self, move: PlayerAction, ply: int, player: BoardPiece, depth: int) -> None:
+        """
+        Updates killer moves and history scores with a move that caused a beta cutoff
+
+        :param move: move that caused the cutoff
+        :param ply: distance of the node to the root of the search
+        :param player: BoardPiece to move at the node
+        :param depth: remaining depth of the node
+        :return: None
+        """
+        self.cutoffs += 1
+
+        if ply < len(self._killers):
+            killers = self._killers[ply]
+            if move in killers:
+                killers.remove(move)
+            killers.insert(0, move)
+            del killers[self._n_killers:]
+
+        self._history[0 if player == PLAYER1 else 1][move] += depth * depth
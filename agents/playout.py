@@ -0,0 +1,69 @@
+import numpy as np
+from typing import Optional
+
+from agents.bitboard import BOARD_MASK, BOTTOM_MASK, COL_STRIDE, COLS, ROWS, connected_four_bits_batch
+
+_TOP = np.array([1 << (ROWS - 1 + col * COL_STRIDE) for col in range(COLS)], dtype=np.uint64)
+_COLUMN = np.array([((1 << ROWS) - 1) << (col * COL_STRIDE) for col in range(COLS)], dtype=np.uint64)
+
+WIN = 0
+DRAW = 1
+LOSS = 2
+
+
+def random_playouts(
+        positions: np.ndarray,
+        masks: np.ndarray,
+        n_playouts: int = 1,
+        rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """
+    Plays n_playouts uniformly random games from every start position, all games at once as array operations
+    on packed bitboards, one move of every unfinished game per step.
+
+    :param positions: uint64 array of the pieces of the player to move, see BitBoard.position
+    :param masks: uint64 array of the occupied cells
+    :param n_playouts: number of games per start position
+    :param rng: random generator, a new unseeded one if None
+    :return: int array of shape (N, 3) holding the number of wins, draws and losses (columns WIN, DRAW and LOSS)
+        of the player to move in every start position
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    positions = np.asarray(positions, dtype=np.uint64).ravel()
+    masks = np.asarray(masks, dtype=np.uint64).ravel()
+
+    start = np.repeat(np.arange(positions.shape[0]), n_playouts)
+    position = positions[start]
+    mask = masks[start]
+    outcome = np.full(start.shape[0], -1, dtype=np.int8)
+
+    # a start position in which the opponent has already won counts as a loss, a full board as a draw
+    outcome[connected_four_bits_batch(position ^ mask)] = LOSS
+    outcome[(outcome < 0) & (mask == np.uint64(BOARD_MASK))] = DRAW
+
+    active = np.flatnonzero(outcome < 0)
+    own_turn = True  # every active game has made the same number of moves, so the player to move is shared
+    bottom = np.uint64(BOTTOM_MASK)
+    while active.size:
+        cur_position = position[active]
+        cur_mask = mask[active]
+
+        playable = (cur_mask[:, None] & _TOP) == 0
+        column = np.argmax(rng.random(playable.shape) * playable, axis=1)
+        move = (cur_mask + bottom) & _COLUMN[column]
+
+        cur_mask = cur_mask | move
+        mover = cur_position | move
+        won = connected_four_bits_batch(mover)
+        full = cur_mask == np.uint64(BOARD_MASK)
+
+        outcome[active[won]] = WIN if own_turn else LOSS
+        outcome[active[full & ~won]] = DRAW
+
+        position[active] = mover ^ cur_mask  # pieces of the next player to move
+        mask[active] = cur_mask
+        active = active[~(won | full)]
+        own_turn = not own_turn
+
+    counts = np.zeros((positions.shape[0], 3), dtype=np.int64)
+    np.add.at(counts, (start, outcome), 1)
+    return counts
@@ -0,0 +1,208 @@
+import numpy as np
+from typing import NamedTuple, Optional
+
+from agents.common import BoardPiece, PlayerAction, NO_PLAYER, PLAYER1, PLAYER2
+from agents.bitboard import BitBoard, BOARD_MASK, BOTTOM_MASK, COL_STRIDE, COLS, ROWS
+from agents.transposition import TranspositionTable, LOWER, UPPER
+
+SIZE = ROWS * COLS
+# default number of empty cells below which the agents play the solver's move, solved within a fraction of a second
+SOLVER_THRESHOLD = 16
+
+_COLUMN = [((1 << ROWS) - 1) << (col * COL_STRIDE) for col in range(COLS)]
+_CENTER_ORDER = [3, 2, 4, 1, 5, 0, 6]
+
+
+class SolveResult(NamedTuple):
+    outcome: int  # 1 if the player to move wins, 0 for a draw, -1 for a loss
+    plies: int  # number of moves until the game ends with perfect play of both sides
+    move: PlayerAction  # a best move: the fastest win, or the slowest loss
+    value: int  # SIZE + 1 - (pieces on the board when the game is won) for a win, its negation for a loss, 0 for a draw
+
+
+def winning_cells(position: int, mask: int) -> int:
+    """
+    Empty cells that would complete four in a row for the pieces in `position`, whether playable or not
+
+    :param position: bitmask of the pieces of one player
+    :param mask: bitmask of all occupied cells
+    :return: bitmask of the cells
+    """
+    ret = (position << 1) & (position << 2) & (position << 3)
+
+    for shift in (COL_STRIDE, COL_STRIDE - 1, COL_STRIDE + 1):
+        pairs = (position << shift) & (position << (2 * shift))
+        ret |= pairs & (position << (3 * shift))
+        ret |= pairs & (position >> shift)
+        pairs = (position >> shift) & (position >> (2 * shift))
+        ret |= pairs & (position << shift)
+        ret |= pairs & (position >> (3 * shift))
+
+    return ret & (BOARD_MASK ^ mask)
+
+
+def _popcount(bits: int) -> int:
+    return bin(bits).count('1')
+
+
+class Solver:
+    def __init__(self, table_size: int = 1 << 18):
+        """
+        Exact Connect 4 solver for (late) positions: negamax on bitboards with null-window searches that bisect
+        the value range, a transposition table of bounds and move ordering by the number of created threats.
+
+        :param table_size: number of slots of the transposition table
+        :type self.table: transposition table, keyed by BitBoard.key()
+        :type self.nodes: number of searched nodes since the solver was created
+        """
+        self.table = TranspositionTable(table_size)
+        self.nodes = 0
+
+    def negamax(self, position: int, mask: int, moves: int, alpha: int, beta: int) -> int:
+        """
+        Value of a position that is not won yet and where the player to move cannot win immediately.
+        Fail-soft within (alpha, beta)
+
+        :param position: bitmask of the pieces of the player to move
+        :param mask: bitmask of all occupied cells
+        :param moves: number of pieces on the board
+        :param alpha: lower bound of the window
+        :param beta: upper bound of the window
+        :return: value of the position, see SolveResult.value
+        """
+        self.nodes += 1
+
+        possible = (mask + BOTTOM_MASK) & BOARD_MASK
+        opponent_wins = winning_cells(position ^ mask, mask)
+        forced = possible & opponent_wins
+        if forced:
+            if forced & (forced - 1):
+                return -(SIZE - 1 - moves)  # two threats at once, the opponent wins with its next move
+            possible = forced
+        possible &= ~(opponent_wins >> 1)  # never play right below a winning cell of the opponent
+        if not possible:
+            return -(SIZE - 1 - moves)
+
+        if moves >= SIZE - 2:
+            return 0
+
+        upper = SIZE - 2 - moves  # we cannot win right now, the earliest win is with our next move
+        if beta > upper:
+            beta = upper
+            if alpha >= beta:
+                return beta
+
+        key = position + mask
+        entry = self.table.probe(key)
+        if entry is not None:
+            if entry.flag == UPPER and entry.value < beta:
+                beta = entry.value
+            elif entry.flag == LOWER and entry.value > alpha:
+                alpha = entry.value
+            if alpha >= beta:
+                return entry.value
+
+        candidates = []
+        for col in _CENTER_ORDER:
+            move_bit = possible & _COLUMN[col]
+            if move_bit:
+                threats = _popcount(winning_cells(position | move_bit, mask | move_bit))
+                candidates.append((-threats, len(candidates), move_bit))
+        candidates.sort()
+
+        for _, _, move_bit in candidates:
+            new_mask = mask | move_bit
+            value = -self.negamax(position ^ mask, new_mask, moves + 1, -beta, -alpha)
+            if value >= beta:
+                self.table.store(key, 0, LOWER, value, -1)
+                return value
+            if value > alpha:
+                alpha = value
+
+        self.table.store(key, 0, UPPER, alpha, -1)
+        return alpha
+
+    def value(self, position: int, mask: int, moves: int) -> int:
+        """
+        Exact value of a position that is not won yet, found by null-window searches that bisect the value range
+
+        :param position: bitmask of the pieces of the player to move
+        :param mask: bitmask of all occupied cells
+        :param moves: number of pieces on the board
+        :return: value of the position, see SolveResult.value
+        """
+        if winning_cells(position, mask) & (mask + BOTTOM_MASK):
+            return SIZE - moves
+
+        low = -(SIZE - moves)
+        high = SIZE - moves
+        while low < high:
+            med = low + (high - low) // 2
+            if med <= 0 and low // 2 < med:
+                med = low // 2
+            elif med >= 0 and high // 2 > med:
+                med = high // 2
+            ret = self.negamax(position, mask, moves, med, med + 1)
+            if ret <= med:
+                high = ret
+            else:
+                low = ret
+        return low
+
+    def solve(self, bitboard: BitBoard) -> SolveResult:
+        """
+        Solves a position that is not won yet and has at least one valid move
+
+        :param bitboard: position to solve, bitboard.player is the player to move
+        :return: outcome, distance to the end and best move
+        """
+        position, mask = bitboard.position, bitboard.mask
+        moves = _popcount(mask)
+        value = self.value(position, mask, moves)
+
+        best_move = -1
+        for col in _CENTER_ORDER:
+            if not bitboard.can_play(col):
+                continue
+            move_bit = (mask + BOTTOM_MASK) & _COLUMN[col]
+            if best_move < 0:
+                best_move = col
+            if winning_cells(position, mask) & move_bit:
+                if value == SIZE - moves:
+                    best_move = col
+                    break
+                continue
+            child_position, child_mask = position ^ mask, mask | move_bit
+            if winning_cells(child_position, child_mask) & (child_mask + BOTTOM_MASK):
+                continue  # the opponent wins right away
+            # the move keeps the value if the child is worth at most -value for the opponent
+            child_value = self.negamax(child_position, child_mask, moves + 1, -value, -value + 1)
+            if child_value <= -value:
+                best_move = col
+                break
+
+        if value > 0:
+            return SolveResult(1, SIZE + 1 - value - moves, best_move, value)
+        if value < 0:
+            return SolveResult(-1, SIZE + 1 + value - moves, best_move, value)
+        return SolveResult(0, SIZE - moves, best_move, value)
+
+
+def solve_endgame(board: np.ndarray, player: BoardPiece, solver: Solver, threshold: int) -> Optional[SolveResult]:
+    """
+    Solves the board exactly if few enough cells are empty
+
+    :param board: current board state
+    :param player: BoardPiece of the player to move
+    :param solver: Solver to use, its transposition table is kept between calls
+    :param threshold: largest number of empty cells to solve, 0 never solves
+    :return: the SolveResult, None if the board has more empty cells or the game is already over
+    """
+    if np.count_nonzero(board == NO_PLAYER) > threshold:
+        return None
+
+    bitboard = BitBoard.from_array(board, player)
+    if bitboard.connected_four(PLAYER1) or bitboard.connected_four(PLAYER2) or bitboard.is_full():
+        return None
+
+    return solver.solve(bitboard)
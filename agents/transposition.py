@@ -0,0 +1,108 @@
+from typing import NamedTuple, Optional
+
+from agents.common import PlayerAction
+
+EXACT = 0  # stored value is the exact value of the position
+LOWER = 1  # search failed high, the value is a lower bound
+UPPER = 2  # search failed low, the value is an upper bound
+
+
+class TTEntry(NamedTuple):
+    key: int
+    depth: int
+    flag: int
+    value: float
+    move: PlayerAction
+    generation: int
+
+
+class TranspositionTable:
+    def __init__(self, size: int = 1 << 16):
+        """
+        Fixed size hash table of search results indexed by Zobrist key.
+
+        A slot is overwritten when it is empty, holds the same position, holds an entry of an older search
+        (see new_search) or holds an entry searched to a smaller or equal depth. Otherwise the new entry is dropped.
+
+        :param size: number of slots
+        :type self.probes: number of probe calls
+        :type self.hits: number of probes that found the position
+        :type self.stores: number of entries written
+        :type self.overwrites: number of entries of another position that got replaced
+        """
+        self._size = size
+        self._slots = [None] * size
+        self._filled = 0
+        self._generation = 0
+
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def __len__(self) -> int:
+        return self._filled
+
+    def new_search(self) -> None:
+        """
+        Marks the beginning of a new search. Entries of previous searches stay usable but get replaced first
+
+        :return: None
+        """
+        self._generation += 1
+
+    def probe(self, key: int) -> Optional[TTEntry]:
+        """
+        Looks up a position
+
+        :param key: Zobrist key of the position
+        :return: the stored entry, None if the position is not in the table
+        """
+        self.probes += 1
+        entry = self._slots[key % self._size]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, flag: int, value: float, move: PlayerAction) -> None:
+        """
+        Stores a search result according to the replacement policy
+
+        :param key: Zobrist key of the position
+        :param depth: remaining depth the position was searched with
+        :param flag: EXACT, LOWER or UPPER
+        :param value: value found by the search
+        :param move: best move found by the search
+        :return: None
+        """
+        idx = key % self._size
+        old = self._slots[idx]
+        if old is None:
+            self._filled += 1
+        elif old.key != key:
+            if old.generation == self._generation and old.depth > depth:
+                return
+            self.overwrites += 1
+
+        self._slots[idx] = TTEntry(key, depth, flag, value, move, self._generation)
+        self.stores += 1
+
+    def hit_rate(self) -> float:
+        """
+        :return: fraction of probes that found their position
+        """
+        return self.hits / self.probes if self.probes else 0.
+
+    def clear(self) -> None:
+        """
+        Removes all entries and resets the counters
+
+        :return: None
+        """
+        self._slots = [None] * self._size
+        self._filled = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
@@ -0,0 +1,36 @@
+from typing import Dict, Sequence
+
+from agents.common import PLAYER1, initialize_game_state
+
+from agents.agent_mcts.array_mcts import Connect4ArrayMCTS
+
+
+def benchmark_batch_size(
+        batch_sizes: Sequence[int] = (1, 8, 32, 128),
+        max_t: float = 2.,
+        batch_evaluation: str = 'playout') -> Dict[int, float]:
+    """
+    Measures the iterations per second of Connect4ArrayMCTS with random rollouts on the empty board
+    for several batch sizes
+
+    :param batch_sizes: batch sizes to measure, 1 plays the rollouts one by one
+    :param max_t: time budget of every measurement
+    :param batch_evaluation: leaf evaluation of batch sizes above 1
+    :return: dictionary of batch size to iterations per second
+    """
+    ret = {}
+    for batch_size in batch_sizes:
+        agent = Connect4ArrayMCTS(
+            use_heuristic=False, curb_iter_time=True, max_t=max_t, batch_size=batch_size,
+            batch_evaluation=batch_evaluation
+        )
+        agent.set_player(PLAYER1)
+        agent.set_current_board(initialize_game_state())
+        agent.run_iteration()
+        ret[batch_size] = agent.iterations_per_second
+    return ret
+
+
+if __name__ == '__main__':
+    for size, speed in benchmark_batch_size().items():
+        print(f'batch size {size}: {speed:.0f} iterations/s')
@@ -0,0 +1,134 @@
+import numpy as np
+import time
+from typing import Tuple
+
+from agents.common import Board, PLAYER1, PLAYER2, other_player
+
+from agents.agent_mcts import State
+from agents.agent_mcts.mcts import Connect4MCTS, playout_score
+
+
+def benchmark_heuristic_rollouts(n_playouts: int = 50, use_bitboard: bool = False) -> Tuple[float, float]:
+    """
+    Measures the time of one heuristic rollout from the empty board with get_conv_action and with the
+    GreedyLinePolicy
+
+    :param n_playouts: number of rollouts of every measurement
+    :param use_bitboard: roll out on a BitBoard instead of the ndarray board
+    :return: tuple of seconds per rollout with get_conv_action and with the GreedyLinePolicy
+    """
+    ret = []
+    for fast_heuristic in (False, True):
+        agent = Connect4MCTS(use_bitboard=use_bitboard, fast_heuristic=fast_heuristic)
+        agent.set_player(PLAYER1)
+        start = time.time()
+        for _ in range(n_playouts):
+            agent.rollout(State(np.zeros((6, 7))))
+        ret.append((time.time() - start) / n_playouts)
+    return ret[0], ret[1]
+
+
+def play_game(agent_1: Connect4MCTS, agent_2: Connect4MCTS) -> float:
+    """
+    Plays one game between two agents, agent_1 moving first
+
+    :param agent_1: agent playing PLAYER1
+    :param agent_2: agent playing PLAYER2
+    :return: score of the game for agent_1, see playout_score
+    """
+    board = Board(player=PLAYER1)
+    agents = {PLAYER1: agent_1, PLAYER2: agent_2}
+    while not (board.is_win() or board.is_full()):
+        action, _ = agents[board.player].generate_move_mcts(board.to_array(), board.player, None)
+        board.play(action)
+    return playout_score(board.check_end_state(PLAYER1), board.check_end_state(PLAYER2))
+
+
+def benchmark_transpositions(
+        max_iter: int = 1000,
+        n_searches: int = 5,
+        n_games: int = 10,
+        use_heuristic: bool = False,
+        expansion_rate: int = 3) -> Tuple[float, float, float]:
+    """
+    Compares the search with and without transpositions: mean number of nodes after one search from the empty
+    board, and the score of the agent with transpositions in games against the agent without, both with the same
+    budget
+
+    :param max_iter: iterations per move of both agents
+    :param n_searches: number of searches the node counts are averaged over
+    :param n_games: number of games, the agents take turns moving first
+    :param use_heuristic: roll out with the convolution heuristic instead of random moves
+    :param expansion_rate: replies per move of the agent in the expansion if use_heuristic is False
+    :return: tuple of the mean number of nodes of the tree, of the graph and the mean score of the graph agent
+    """
+    def make_agent(transpositions: bool) -> Connect4MCTS:
+        return Connect4MCTS(
+            use_heuristic=use_heuristic, expansion_rate=expansion_rate, max_iter=max_iter, use_bitboard=True,
+            transpositions=transpositions
+        )
+
+    nodes = []
+    for transpositions in (False, True):
+        count = 0
+        for _ in range(n_searches):
+            agent = make_agent(transpositions)
+            agent.generate_move_mcts(Board().to_array(), PLAYER1, None)
+            count += agent.get_root_node().count_nodes()
+        nodes.append(count / max(n_searches, 1))
+
+    score = 0.
+    for game in range(n_games):
+        graph, tree = make_agent(True), make_agent(False)
+        if game % 2 == 0:
+            score += play_game(graph, tree)
+        else:
+            score += 1 - play_game(tree, graph)
+    return nodes[0], nodes[1], score / max(n_games, 1)
+
+
+def benchmark_early_stop(
+        max_iter: int = 400,
+        n_games: int = 4,
+        use_heuristic: bool = True) -> Tuple[float, float, float]:
+    """
+    Measures the iterations per move with and without early stopping in games between two agents with the same
+    budget, taking turns moving first. Moves of the solver are not counted
+
+    :param max_iter: iterations per move of both agents
+    :param n_games: number of games
+    :param use_heuristic: roll out with the convolution heuristic instead of random moves
+    :return: tuple of the mean iterations per move without and with early stopping, and the mean score of the agent
+        stopping early
+    """
+    iterations = {False: [], True: []}
+    score = 0.
+    for game in range(n_games):
+        agents = [
+            Connect4MCTS(
+                use_heuristic=use_heuristic, fast_heuristic=True, max_iter=max_iter, use_bitboard=True,
+                early_stop=early_stop
+            )
+            for early_stop in (game % 2 == 0, game % 2 == 1)
+        ]
+        board = Board(player=PLAYER1)
+        while not (board.is_win() or board.is_full()):
+            agent = agents[board.player - PLAYER1]
+            action, _ = agent.generate_move_mcts(board.to_array(), board.player, None)
+            if agent.iterations > 0:
+                iterations[agent is agents[game % 2]].append(agent.iterations)
+            board.play(action)
+        early = PLAYER1 if game % 2 == 0 else PLAYER2
+        score += playout_score(board.check_end_state(early), board.check_end_state(other_player(early)))
+    return float(np.mean(iterations[False])), float(np.mean(iterations[True])), score / max(n_games, 1)
+
+
+if __name__ == '__main__':
+    slow, fast = benchmark_heuristic_rollouts()
+    print(f'get_conv_action: {slow * 1e3:.2f} ms per rollout, GreedyLinePolicy: {fast * 1e3:.2f} ms per rollout')
+    tree_nodes, graph_nodes, graph_score = benchmark_transpositions()
+    print(f'nodes without transpositions: {tree_nodes:.0f}, with transpositions: {graph_nodes:.0f}, '
+          f'score with transpositions: {graph_score:.2f}')
+    plain, early, early_score = benchmark_early_stop()
+    print(f'iterations per move without early stopping: {plain:.0f}, with early stopping: {early:.0f}, '
+          f'score with early stopping: {early_score:.2f}')
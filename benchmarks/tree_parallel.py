@@ -0,0 +1,39 @@
+from typing import Dict, Sequence
+
+from agents.common import PLAYER1, initialize_game_state
+
+from agents.agent_mcts.tree_parallel import Connect4TreeParallelMCTS
+
+
+def benchmark_tree_parallel(
+        worker_counts: Sequence[int] = (1, 2, 4, 8),
+        max_t: float = 2.,
+        use_heuristic: bool = False) -> Dict[int, float]:
+    """
+    Measures the iterations per second of the tree parallel search on the empty board for several worker counts
+
+    :param worker_counts: numbers of workers to measure
+    :param max_t: time budget of every measurement
+    :param use_heuristic: roll out with the convolution heuristic instead of random moves
+    :return: dictionary of worker count to iterations per second
+    """
+    ret = {}
+    for n_workers in worker_counts:
+        agent = Connect4TreeParallelMCTS(
+            n_workers=n_workers, use_heuristic=use_heuristic, curb_iter_time=True, max_t=max_t
+        )
+        agent.set_player(PLAYER1)
+        agent.set_current_board(initialize_game_state())
+        try:
+            agent.run_iteration()  # first run includes starting the processes
+            agent.flush_tree()
+            agent.run_iteration()
+        finally:
+            agent.close()
+        ret[n_workers] = agent.iterations_per_second
+    return ret
+
+
+if __name__ == '__main__':
+    for workers, speed in benchmark_tree_parallel().items():
+        print(f'{workers} workers: {speed:.0f} iterations/s')
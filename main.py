@@ -56,7 +56,7 @@ def human_vs_agent(
                 )
                 print(f"Move time: {time.time() - t0:.3f}s")
                 apply_player_action(board, action, player)
-                end_state = check_end_state(board, player)
+                end_state = check_end_state(board, player, action)
                 if end_state != GameState.STILL_PLAYING:
                     print(pretty_print_board(board))
                     if end_state == GameState.IS_DRAW:
@@ -110,7 +110,7 @@ def agent_vs_agent(
                 )
                 print(f"Move time: {time.time() - t0:.3f}s")
                 apply_player_action(board, action, player)
-                end_state = check_end_state(board, player)
+                end_state = check_end_state(board, player, action)
                 if end_state != GameState.STILL_PLAYING:
                     print(pretty_print_board(board))
                     if end_state == GameState.IS_DRAW:
@@ -133,6 +133,8 @@ if __name__ == "__main__":
     # for _ in range(100):
     #     # r = agent_vs_agent(agents.agent_minimax.generate_move, agents.agent_minimax.generate_move)
     #     # r = agent_vs_agent(agent.generate_move_mcts, agents.agent_minimax.generate_move)
+    #     # r = agent_vs_agent(agents.agent_minimax.generate_move_minimax_id, agents.agent_minimax.generate_move,
+    #     #                    args_1=(1.,))
     #     r = agent_vs_agent(agent.generate_move_mcts, agents.agent_random.generate_move)
     #     winner_list.append(r)
     #
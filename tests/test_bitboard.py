@@ -0,0 +1,140 @@
+import numpy as np
+
+from agents.bitboard import BitBoard
+from agents.common import NO_PLAYER, PLAYER1, PLAYER2, initialize_game_state, apply_player_action, connected_four
+
+
+def test_bitboard_array_round_trip():
+    """
+    assert that converting an ndarray board to a BitBoard and back gives the same board
+    """
+    board = initialize_game_state()
+    player = PLAYER1
+    for action in [3, 3, 2, 4, 4, 0, 6, 3]:
+        apply_player_action(board, action, player)
+        player = PLAYER2 if player == PLAYER1 else PLAYER1
+
+    bitboard = BitBoard.from_array(board, player)
+
+    assert bitboard.player == player
+    assert bitboard.heights == [1, 0, 1, 3, 2, 0, 1]
+    assert (bitboard.to_array() == board).all()
+
+
+def test_bitboard_play_undo():
+    """
+    assert that playing on a BitBoard mirrors apply_player_action and that undo restores the position
+    """
+    board = initialize_game_state()
+    bitboard = BitBoard()
+    start = (bitboard.position, bitboard.mask)
+
+    player = PLAYER1
+    for action in [0, 1, 0, 1, 5]:
+        apply_player_action(board, action, player)
+        bitboard.play(action)
+        player = PLAYER2 if player == PLAYER1 else PLAYER1
+
+        assert bitboard.player == player
+        assert (bitboard.to_array() == board).all()
+
+    for _ in range(5):
+        bitboard.undo()
+
+    assert (bitboard.position, bitboard.mask) == start
+    assert bitboard.heights == [0] * 7
+
+
+def test_bitboard_valid_moves():
+    """
+    assert that full columns are excluded from the valid moves
+    """
+    bitboard = BitBoard()
+    for _ in range(6):
+        bitboard.play(2)
+
+    assert not bitboard.can_play(2)
+    assert bitboard.valid_actions() == [0, 1, 3, 4, 5, 6]
+    assert bin(bitboard.valid_moves_mask()).count('1') == 6
+
+
+def test_bitboard_connected_four():
+    """
+    assert that the shift-and-mask win detection agrees with connected_four on random boards
+    """
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        board = initialize_game_state()
+        player = PLAYER1
+        for _ in range(rng.integers(0, 30)):
+            valid = np.flatnonzero(board[0, :] == NO_PLAYER)
+            apply_player_action(board, rng.choice(valid), player)
+            player = PLAYER2 if player == PLAYER1 else PLAYER1
+
+        bitboard = BitBoard.from_array(board, player)
+        for p in (PLAYER1, PLAYER2):
+            assert bitboard.connected_four(p) == connected_four(board, p)
+
+
+def test_bitboard_winning_move():
+    """
+    assert that is_winning_move and is_win detect a vertical four
+    """
+    bitboard = BitBoard()
+    for action in [0, 1, 0, 1, 0, 1]:
+        bitboard.play(action)
+
+    assert bitboard.is_winning_move(0)
+    assert not bitboard.is_winning_move(2)
+
+    bitboard.play(0)
+    assert bitboard.is_win()
+    assert bitboard.connected_four(PLAYER1)
+
+
+def test_agents_on_bitboard():
+    """
+    assert that the minimax and mcts agents find the winning move when running on bitboards
+    """
+    from agents.agent_minimax import generate_move
+    from agents.agent_mcts import Connect4MCTS
+
+    test_board = np.zeros((6, 7))
+    test_board[3:, 0] = PLAYER1
+    test_board[5, 1:3] = PLAYER2
+
+    action, _ = generate_move(test_board, PLAYER1, None, 2, True)
+    assert action == 0
+
+    agent = Connect4MCTS(use_bitboard=True, use_heuristic=False, max_iter=20)
+    action, _ = agent.generate_move_mcts(initialize_game_state(), PLAYER1, None)
+    assert 0 <= int(np.ravel(action)[0]) < 7
+
+
+def test_bitboard_check_end_state_batch():
+    """
+    assert that the vectorized end state check on packed bitboards agrees with the ndarray batch check
+    """
+    from agents.bitboard import check_end_state_batch, pack_boards
+    from agents.common import check_end_state_batch as check_end_state_batch_array
+
+    rng = np.random.default_rng(3)
+    boards = []
+    players = []
+    for _ in range(100):
+        board = initialize_game_state()
+        player = PLAYER1
+        for _ in range(rng.integers(0, 43)):
+            valid = np.flatnonzero(board[0, :] == NO_PLAYER)
+            apply_player_action(board, rng.choice(valid), player)
+            player = PLAYER2 if player == PLAYER1 else PLAYER1
+        boards.append(board)
+        players.append(player)
+    boards = np.stack(boards)
+    players = np.array(players)
+
+    positions = np.where(players == PLAYER1, pack_boards(boards, PLAYER1), pack_boards(boards, PLAYER2))
+    masks = pack_boards(boards, PLAYER1) | pack_boards(boards, PLAYER2)
+
+    assert positions[0] == BitBoard.from_array(boards[0], players[0]).position
+    assert (check_end_state_batch(positions, masks, players) == check_end_state_batch_array(boards)).all()
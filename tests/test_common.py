@@ -105,4 +105,99 @@ def test_connected_four():
 
     assert(connected_four(test_arr, PLAYER1))
 
-    assert(connected_four(np.flipud(test_arr), PLAYER1))
\ No newline at end of file
+    assert(connected_four(np.flipud(test_arr), PLAYER1))
+
+def test_connected_four_last_action():
+    from agents.common import connected_four, apply_player_action, initialize_game_state
+
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        board = initialize_game_state()
+        player = PLAYER1
+        for _ in range(42):
+            valid = np.flatnonzero(board[0, :] == NO_PLAYER)
+            action = rng.choice(valid)
+            apply_player_action(board, action, player)
+
+            won = connected_four(board, player, action)
+            assert won == connected_four(board, player)
+            if won or not (board == NO_PLAYER).any():
+                break
+            player = PLAYER2 if player == PLAYER1 else PLAYER1
+
+    test_arr = np.zeros((6, 7))
+    test_arr[5, 0:3] = PLAYER1
+    test_arr[5, 4] = PLAYER1
+    assert not connected_four(test_arr, PLAYER1, 4)
+    test_arr[5, 3] = PLAYER1
+    assert connected_four(test_arr, PLAYER1, 3)
+
+
+def test_board_play_undo():
+    from agents.common import Board, apply_player_action, initialize_game_state
+
+    test_arr = initialize_game_state()
+    board = Board(test_arr.copy(), PLAYER1)
+
+    player = PLAYER1
+    for action in [3, 3, 4, 2, 3]:
+        apply_player_action(test_arr, action, player)
+        board.play(action)
+        player = PLAYER2 if player == PLAYER1 else PLAYER1
+
+        assert board.player == player
+        assert (board.array == test_arr).all()
+
+    assert board.heights == [0, 0, 1, 3, 1, 0, 0]
+    assert board.moves == [3, 3, 4, 2, 3]
+
+    for _ in range(5):
+        board.undo()
+
+    assert (board.array == NO_PLAYER).all()
+    assert board.heights == [0] * 7
+
+
+def test_board_end_state():
+    from agents.common import Board, GameState
+
+    board = Board()
+    for action in [0, 1, 0, 1, 0, 1]:
+        board.play(action)
+    assert not board.is_win()
+
+    board.play(0)
+    assert board.is_win()
+    assert board.check_end_state(PLAYER1) == GameState.IS_WIN
+
+    test_arr = np.full((6, 7), PLAYER2)
+    test_arr[0, 0] = NO_PLAYER
+    board = Board(test_arr, PLAYER1)
+    assert board.valid_actions() == [0]
+    assert not board.is_full()
+    board.play(0)
+    assert board.is_full()
+
+
+def test_check_end_state_batch():
+    from agents.common import check_end_state_batch, check_end_state, apply_player_action, initialize_game_state
+
+    rng = np.random.default_rng(2)
+    boards = []
+    for _ in range(100):
+        board = initialize_game_state()
+        player = PLAYER1
+        for _ in range(rng.integers(0, 43)):
+            valid = np.flatnonzero(board[0, :] == NO_PLAYER)
+            apply_player_action(board, rng.choice(valid), player)
+            player = PLAYER2 if player == PLAYER1 else PLAYER1
+        boards.append(board)
+    boards.append(np.full((6, 7), PLAYER1))
+    boards = np.stack(boards)
+
+    ret = check_end_state_batch(boards)
+
+    assert ret.shape == (len(boards), 2)
+    for board, codes in zip(boards, ret):
+        assert codes[0] == check_end_state(board, PLAYER1).value
+        assert codes[1] == check_end_state(board, PLAYER2).value
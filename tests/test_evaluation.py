@@ -0,0 +1,99 @@
+import numpy as np
+from scipy.signal import convolve2d
+
+from agents.common import BoardPiece, NO_PLAYER, PLAYER1, PLAYER2, initialize_game_state, apply_player_action
+
+
+def convolution_heuristic(board: np.ndarray, player) -> float:
+    """
+    reference implementation with four 2-D convolutions and compute_score
+    """
+    from agents.agent_mcts import compute_score
+
+    board_tr = np.zeros(board.shape, dtype=int)
+    board_tr[board == player] = 1
+    board_tr[(board != player) & (board != NO_PLAYER)] = -1
+
+    kernel_dl = np.zeros((4, 4), dtype=int)
+    np.fill_diagonal(kernel_dl, val=1)
+    kernels = [np.ones((4, 1), dtype=int), np.ones((1, 4), dtype=int), kernel_dl, np.flipud(kernel_dl)]
+
+    return sum(compute_score(convolve2d(kernel, board_tr, mode='valid')) for kernel in kernels)
+
+
+def random_board(rng: np.random.Generator) -> np.ndarray:
+    board = initialize_game_state()
+    player = PLAYER1
+    for _ in range(rng.integers(0, 43)):
+        valid = np.flatnonzero(board[0, :] == NO_PLAYER)
+        apply_player_action(board, rng.choice(valid), player)
+        player = PLAYER2 if player == PLAYER1 else PLAYER1
+    return board
+
+
+def test_win_lines():
+    from agents.evaluation import WIN_LINES, CELL_LINES
+
+    assert WIN_LINES.shape == (69, 4)
+    assert len({tuple(line) for line in WIN_LINES}) == 69
+    assert sum(len(lines) for lines in CELL_LINES) == 69 * 4
+
+
+def test_evaluate_board():
+    """
+    assert that the win-line evaluator gives the same value as the convolution heuristic
+    """
+    from agents.evaluation import evaluate_board
+    from agents.agent_minimax.minimax import get_minimax_heuristic
+
+    rng = np.random.default_rng(4)
+    for _ in range(100):
+        board = random_board(rng)
+        for player in (PLAYER1, PLAYER2):
+            assert evaluate_board(board, player) == convolution_heuristic(board, player)
+        assert get_minimax_heuristic(board) == convolution_heuristic(board, PLAYER1)
+
+
+def test_line_evaluator_incremental():
+    """
+    assert that adding and removing pieces keeps the score equal to a full evaluation
+    """
+    from agents.evaluation import evaluate_board, LineEvaluator
+
+    rng = np.random.default_rng(5)
+    board = initialize_game_state()
+    evaluator = LineEvaluator(board, PLAYER1)
+    placed = []
+
+    player = PLAYER1
+    for _ in range(20):
+        col = rng.choice(np.flatnonzero(board[0, :] == NO_PLAYER))
+        row = np.flatnonzero(board[:, col] == NO_PLAYER)[-1]
+
+        expected = evaluator.get_score(PLAYER1) + evaluator.delta(row, col, player)
+        board[row, col] = player
+        evaluator.add(row, col, player)
+        placed.append((row, col, player))
+
+        assert evaluator.get_score(PLAYER1) == expected == evaluate_board(board, PLAYER1)
+        assert evaluator.get_score(PLAYER2) == evaluate_board(board, PLAYER2)
+        player = PLAYER2 if player == PLAYER1 else PLAYER1
+
+    for row, col, piece in reversed(placed):
+        board[row, col] = NO_PLAYER
+        evaluator.remove(row, col, piece)
+        assert evaluator.get_score(PLAYER1) == evaluate_board(board, PLAYER1)
+
+
+def test_evaluate_boards():
+    """
+    assert that the vectorized evaluation agrees with evaluate_board
+    """
+    from agents.evaluation import evaluate_board, evaluate_boards
+
+    rng = np.random.default_rng(5)
+    boards = rng.choice([NO_PLAYER, PLAYER1, PLAYER2], size=(20, 6, 7)).astype(BoardPiece)
+
+    values = evaluate_boards(boards, PLAYER2)
+    assert values.shape == (20,)
+    assert values.tolist() == [evaluate_board(board, PLAYER2) for board in boards]
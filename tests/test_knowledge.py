@@ -0,0 +1,90 @@
+import pickle
+
+import numpy as np
+
+from agents.agent_mcts import Connect4MCTS, TreeKnowledge
+from agents.bitboard import BitBoard
+from agents.common import PLAYER1, PLAYER2, initialize_game_state, apply_player_action
+
+
+def test_tree_knowledge_save_load(tmp_path):
+    """
+    assert that saved statistics are memory-mapped on load, found for mirror images and shared by path when pickled
+    """
+    agent = Connect4MCTS(use_heuristic=False, max_iter=200)
+    agent.set_player(PLAYER1)
+    agent.set_current_board(initialize_game_state())
+    agent.run_iteration()
+
+    path = str(tmp_path / 'tree.npy')
+    saved = agent.save_tree(path, min_visits=2)
+    knowledge = TreeKnowledge.load(path)
+
+    assert isinstance(knowledge._table, np.memmap)
+    assert len(knowledge) == len(saved)
+    assert knowledge.nbytes == saved.nbytes
+    assert knowledge.lookup(BitBoard()) == (200, agent.get_root_node().get_score())
+
+    for child in agent.get_root_node().get_children():
+        stats = knowledge.lookup_board(child.get_board(), PLAYER1)
+        if child.get_n() < 2:
+            continue
+        assert stats[0] >= child.get_n()
+        assert knowledge.lookup_board(child.get_board()[:, ::-1], PLAYER1) == stats
+
+    board = apply_player_action(initialize_game_state(), np.int8(3), PLAYER1)
+    assert knowledge.lookup_board(board, PLAYER2) is None
+
+    shared = pickle.loads(pickle.dumps(knowledge))
+    assert isinstance(shared._table, np.memmap)
+    assert shared.lookup(BitBoard()) == knowledge.lookup(BitBoard())
+
+
+def test_tree_knowledge_warm_start(tmp_path):
+    """
+    assert that a new agent starts its nodes with the saved statistics
+    """
+    agent = Connect4MCTS(use_heuristic=False, max_iter=100)
+    agent.set_player(PLAYER1)
+    agent.set_current_board(initialize_game_state())
+    agent.run_iteration()
+    child = max(agent.get_root_node().get_children(), key=lambda state: state.get_n())
+
+    path = str(tmp_path / 'tree.npy')
+    agent.save_tree(path)
+
+    # the mirror image of the child may be in the tree as well, the more visited of both is then stored
+    visits, score = TreeKnowledge.load(path).lookup_board(child.get_board(), PLAYER1)
+    assert visits >= child.get_n()
+
+    warm = Connect4MCTS(use_heuristic=False, max_iter=1, prior=TreeKnowledge.load(path))
+    warm.set_player(PLAYER1)
+    warm.set_current_board(child.get_board())
+    assert warm.get_root_node().get_n() == visits
+    assert np.isclose(warm.get_root_node().get_score(), score)
+
+
+def test_tree_knowledge_consistent_visits(tmp_path):
+    """
+    assert that a stored position keeps the visits of one node, and that warm-started children never have more
+    visits than their parent
+    """
+    agent = Connect4MCTS(use_heuristic=False, max_iter=300)
+    agent.set_player(PLAYER1)
+    agent.set_current_board(initialize_game_state())
+    agent.run_iteration()
+
+    path = str(tmp_path / 'tree.npy')
+    knowledge = agent.save_tree(path)
+    for child in agent.get_root_node().get_children():
+        stats = knowledge.lookup_board(child.get_board(), PLAYER1)
+        mirror = agent.get_root_node().get_child(child.get_board()[:, ::-1])
+        visits = max(child.get_n(), 0 if mirror is None else mirror.get_n())
+        assert stats is None or stats[0] == visits
+
+    warm = Connect4MCTS(use_heuristic=False, max_iter=50, prior=TreeKnowledge.load(path))
+    warm.set_player(PLAYER1)
+    warm.set_current_board(max(agent.get_root_node().get_children(), key=lambda state: state.get_n()).get_board())
+    warm.run_iteration()
+    for state in warm.get_root_node().iter_subtree():
+        assert state.get_n() >= sum(child.get_n() for child in state.get_children())
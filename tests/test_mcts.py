@@ -1,7 +1,7 @@
 import numpy as np
 
 from agents.agent_mcts import Connect4MCTS
-from agents.common import PLAYER1, PLAYER2, NO_PLAYER, apply_player_action, SavedState
+from agents.common import PLAYER1, PLAYER2, NO_PLAYER, Board, apply_player_action, SavedState
 
 
 def test_mcts_set_player():
@@ -52,6 +52,56 @@ def test_mcts_rollout():
     assert (rn_board != agent.get_root_node().get_board()).any()
 
 
+def test_mcts_simulate_score():
+    """
+    assert that the rollouts score a game won by the opponent as a loss and a game won by the agent as a win
+    """
+    lost = np.full((6, 7), NO_PLAYER)
+    lost[5, 2:5] = PLAYER2
+    lost[4, 2:5] = PLAYER1
+    won = np.where(lost == PLAYER1, PLAYER2, np.where(lost == PLAYER2, PLAYER1, NO_PLAYER))
+
+    for fast_heuristic in (False, True):
+        agent = Connect4MCTS(fast_heuristic=fast_heuristic)
+        agent.set_player(PLAYER1)
+        assert agent.simulate(lost.copy()) == 0
+        assert agent.simulate_bitboard(lost.copy()) == 0
+        assert agent.simulate(won.copy()) == 1
+        assert agent.simulate_bitboard(won.copy()) == 1
+
+
+def test_mcts_full_board_loss():
+    """
+    assert that a reply filling the last cell with four in a row of the competing player is proven lost, not drawn
+    """
+    from agents.agent_mcts import Connect4ArrayMCTS
+
+    moves = [
+        3, 4, 1, 0, 1, 1, 3, 3, 2, 2, 2, 2, 4, 4, 6, 5, 0, 3, 3, 6, 4,
+        2, 4, 4, 1, 2, 0, 0, 5, 3, 6, 0, 1, 6, 0, 6, 1, 6, 5, 5,
+    ]
+    board = Board()
+    for action in moves:
+        board.play(action)
+
+    agent = Connect4MCTS(solver_threshold=0)
+    agent.set_player(PLAYER1)
+    agent.set_current_board(board.to_array())
+    agent.expand(agent.get_root_node())
+    child, = agent.get_root_node().get_children()
+    assert child.is_terminal()
+    assert child.get_proven() == 0
+    assert agent.get_root_node().get_action_proofs() == {5: 0}
+
+    agent = Connect4ArrayMCTS(solver_threshold=0)
+    agent.set_player(PLAYER1)
+    agent.set_current_board(board.to_array())
+    agent.expand_node(0)
+    child, = agent.get_tree().children(0)
+    assert agent.get_tree().terminal[child]
+    assert agent.evaluate_node(child) == 0
+
+
 def test_mcts_expand():
     """
     assert that the agent expand a desired node state
@@ -149,3 +199,243 @@ def test_mcts_generate_move():
     for i in range(7):
         assert agent.get_root_node().get_children()[0].get_score() <= biggest_score
 
+
+
+def test_mcts_reuse_tree():
+    """
+    assert that the child holding the next board becomes the root without being copied
+    """
+    init_board = np.full((6, 7), NO_PLAYER)
+
+    agent = Connect4MCTS(max_iter=20)
+    agent.set_player(PLAYER1)
+    agent.set_current_board(init_board)
+    agent.run_iteration()
+
+    root = agent.get_root_node()
+    child = root.get_children()[0]
+    agent.set_current_board(child.get_board())
+    assert agent.get_root_node() is child
+
+    agent.set_current_board(child.get_board())
+    assert agent.get_root_node() is child
+
+    agent.set_current_board(init_board)
+    assert agent.get_root_node() is not root
+    assert agent.get_root_node().get_n() == 0
+
+
+def test_mcts_solver():
+    """
+    assert that a winning move is proven right away, the search stops early and the move is chosen
+    """
+    board = np.full((6, 7), NO_PLAYER)
+    board[3:, 2] = PLAYER1
+    board[5, 4:6] = PLAYER2
+
+    agent = Connect4MCTS(max_iter=100)
+    action, _ = agent.generate_move_mcts(board, PLAYER1, None)
+
+    assert action == 2
+    assert agent.get_root_node().get_proven() == 1
+    assert agent.get_root_node().get_n() < 100
+
+    # every heuristic reply to a move other than blocking column 2 loses
+    board = np.full((6, 7), NO_PLAYER)
+    board[3:, 2] = PLAYER2
+    board[5, 4:6] = PLAYER1
+
+    agent = Connect4MCTS(max_iter=100)
+    action, _ = agent.generate_move_mcts(board, PLAYER1, None)
+
+    proofs = agent.get_root_node().get_action_proofs()
+    assert action == 2
+    assert all(proofs[a] == 0 for a in proofs if a != 2)
+
+
+def test_mcts_ponder():
+    """
+    assert that the agent keeps searching below its move after returning it and reuses that tree for any reply
+    """
+    board = np.full((6, 7), NO_PLAYER)
+
+    agent = Connect4MCTS(max_iter=30, ponder=True)
+    action, _ = agent.generate_move_mcts(board, PLAYER1, None)
+    assert agent.wait_pondering()
+    assert agent.ponder_iterations == 30
+
+    board = apply_player_action(board, action, PLAYER1)
+    board = apply_player_action(board, np.int8(6 - action), PLAYER2)
+    child = agent.get_root_node().get_child(board)
+    assert child is not None
+    pondered = child.get_n()
+
+    agent.generate_move_mcts(board, PLAYER1, None)
+    assert agent.get_root_node() is child
+    agent.flush_tree()  # stops the pondering, like every public method changing the tree
+    assert agent.wait_pondering(timeout=0)
+    assert child.get_n() >= pondered + 30
+
+
+def test_mcts_ponder_transpositions():
+    """
+    assert that pondering on a graph without a prior plays legal moves over several moves, its shared children
+    may carry visits through other parents
+    """
+    np.random.seed(1)
+    for _ in range(3):
+        board = np.full((6, 7), NO_PLAYER)
+        agent = Connect4MCTS(max_iter=100, ponder=True, transpositions=True)
+        for _ in range(3):
+            action, _ = agent.generate_move_mcts(board, PLAYER1, None)
+            assert board[0, action] == NO_PLAYER
+            assert agent.wait_pondering()
+            assert agent.ponder_iterations == 100
+            board = apply_player_action(board, action, PLAYER1)
+            board = apply_player_action(board, np.random.choice(np.flatnonzero(board[0] == NO_PLAYER)), PLAYER2)
+        agent.stop_pondering()
+
+
+def test_mcts_transpositions():
+    """
+    assert that a position reached by different move orders is stored once and that visits follow the paths
+    """
+    board = np.full((6, 7), NO_PLAYER)
+
+    np.random.seed(0)
+    agent = Connect4MCTS(use_heuristic=False, expansion_rate=7, max_iter=400, transpositions=True)
+    agent.set_player(PLAYER1)
+    agent.set_current_board(board)
+    agent.run_iteration()
+
+    root = agent.get_root_node()
+    assert root.get_n() == 400
+    assert sum(child.get_n() for child in root.get_children()) == 400
+
+    seen, shared = {}, 0
+    stack = [root]
+    while stack:
+        state = stack.pop()
+        for child in state.get_children():
+            if child.get_key() in seen:
+                assert seen[child.get_key()] is child
+                shared += 1
+            else:
+                seen[child.get_key()] = child
+                stack.append(child)
+    assert shared > 0
+    assert root.count_nodes() == len(seen) + 1
+
+    child = root.get_children()[0]
+    agent.set_current_board(child.get_board())
+    assert agent.get_root_node() is child
+    assert len(agent._nodes) == child.count_nodes()
+
+    # shared nodes that were first reached from a dropped branch are linked to a live parent
+    live = {id(state) for state in child.iter_subtree()}
+    for state in child.iter_subtree():
+        if state is not child:
+            assert id(state.get_parent()) in live
+            assert state in state.get_parent().get_children()
+
+
+def test_mcts_deadline_early_stop():
+    """
+    assert that the search stops at the first clock check after the deadline, and as soon as the move is decided
+    """
+    import time
+
+    init_board = np.full((6, 7), NO_PLAYER)
+
+    agent = Connect4MCTS(max_iter=1000, check_every=8)
+    agent.set_player(PLAYER1)
+    agent.set_current_board(init_board)
+    agent.run_iteration(deadline=time.time() - 1)
+    assert agent.iterations == 8
+    assert not agent.stopped_early
+
+    # only column 6 is left, so the move is decided at the first check
+    board = np.full((6, 7), NO_PLAYER)
+    board[:, :6] = [[PLAYER1, PLAYER1, PLAYER2, PLAYER2, PLAYER1, PLAYER1]] * 3 \
+        + [[PLAYER2, PLAYER2, PLAYER1, PLAYER1, PLAYER2, PLAYER2]] * 3
+
+    agent = Connect4MCTS(use_heuristic=False, max_iter=1000, solver_threshold=0, check_every=1, early_stop=True)
+    action, _ = agent.generate_move_mcts(board, PLAYER1, None)
+    assert action == 6
+    assert agent.stopped_early
+    assert agent.iterations == 1
+
+    # the most visited move is chosen, and decided once no move that is not proven lost can catch up
+    agent = Connect4MCTS(use_heuristic=False, early_stop=True)
+    agent.set_player(PLAYER1)
+    agent.set_current_board(init_board)
+    root = agent.get_root_node()
+    agent.expand(root)
+    children = dict(zip(root.get_child_actions(), root.get_children()))
+    children[3].update(10, 50)
+    children[0].update(10, 10)
+    children[1].update(0, 49)
+    children[1].set_proven(0)
+
+    assert agent.choose_action() == 3
+    assert agent.is_decided(39)
+    assert not agent.is_decided(40)
+
+
+def test_mcts_memory_budget():
+    """
+    assert that a tree with a node or byte budget stays within it, by pruning or by no longer expanding
+    """
+    init_board = np.full((6, 7), NO_PLAYER)
+
+    for kwargs in ({'max_nodes': 300}, {'max_nodes': 300, 'memory_policy': 'freeze'}, {'max_bytes': 100000}):
+        agent = Connect4MCTS(use_heuristic=False, max_iter=1000, **kwargs)
+        agent.generate_move_mcts(init_board, PLAYER1, None)
+
+        nodes, nbytes = agent.tree_size()
+        root = agent.get_root_node()
+        assert root.get_n() == 1000
+        assert nodes == root.count_nodes()
+        # one expansion may exceed the budget by 7 children
+        assert nodes <= kwargs.get('max_nodes', np.inf) + 7
+        assert nbytes <= kwargs.get('max_bytes', np.inf) + 7 * root.nbytes()
+        assert len(root.get_children()) == 7
+        if kwargs.get('memory_policy') == 'freeze':
+            assert agent.pruned_nodes == 0
+        else:
+            assert agent.pruned_nodes > 0
+
+    agent = Connect4MCTS(use_heuristic=False, max_iter=500)
+    agent.generate_move_mcts(init_board, PLAYER1, None)
+    nodes = agent.get_root_node().count_nodes()
+    dropped = agent.prune_tree(100)
+    assert agent.tree_size()[0] == nodes - dropped <= 100
+    assert agent.get_root_node().get_n() == 500
+
+
+def test_mcts_prune_proven():
+    """
+    assert that pruning keeps the children of proven nodes, so that a proven child still has a move to choose
+    once it becomes the root
+    """
+    board = np.full((6, 7), NO_PLAYER)
+    board[5, 2:4] = PLAYER1
+    board[4, 2:4] = PLAYER2
+
+    np.random.seed(0)
+    agent = Connect4MCTS(use_heuristic=False, max_iter=300, solver_threshold=0)
+    agent.generate_move_mcts(board, PLAYER1, None)
+    proven = [
+        child for child in agent.get_root_node().get_children()
+        if child.get_proven() == 1 and child.get_children()
+    ]
+    assert proven
+
+    agent.prune_tree(0)
+    child = proven[0]
+    assert child.get_children()
+
+    action, _ = agent.generate_move_mcts(child.get_board(), PLAYER1, None)
+    assert agent.get_root_node() is child
+    assert agent.iterations == 0
+    assert child.get_action_proofs()[action] == 1
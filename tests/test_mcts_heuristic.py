@@ -45,3 +45,47 @@ def test_get_heuristic_action():
     assert (action == 0)
 
 
+
+
+def test_greedy_line_policy():
+    """
+    assert that the incrementally updated policy picks the moves of get_conv_action and that undo restores it
+    """
+    from agents.agent_mcts.heuristic import GreedyLinePolicy
+    from agents.common import Board, initialize_game_state
+
+    rng = np.random.default_rng(4)
+    for _ in range(20):
+        game = Board(initialize_game_state())
+        policy = GreedyLinePolicy(game.array)
+        while not game.is_full():
+            for piece in (PLAYER1, PLAYER2):
+                assert policy.choose(piece) == get_conv_action(game.array, piece)
+
+            action = rng.choice(game.valid_actions())
+            sums = list(policy.sums)
+            policy.play(action, game.player)
+            policy.undo(action, game.player)
+            assert policy.sums == sums
+
+            policy.play(action, game.player)
+            game.play(action)
+            if game.is_win():
+                break
+
+
+def test_mcts_fast_heuristic():
+    """
+    assert that both agents run with the fast heuristic policy
+    """
+    from agents.agent_mcts import Connect4MCTS, Connect4ArrayMCTS
+    from agents.common import initialize_game_state
+
+    for use_bitboard in (False, True):
+        agent = Connect4MCTS(fast_heuristic=True, use_bitboard=use_bitboard, max_iter=20)
+        agent.generate_move_mcts(initialize_game_state(), PLAYER1, None)
+        assert agent.get_root_node().get_n() == 20
+
+    agent = Connect4ArrayMCTS(fast_heuristic=True, max_iter=20)
+    action, _ = agent.generate_move_mcts(initialize_game_state(), PLAYER2, None)
+    assert 0 <= action < 7
@@ -29,3 +29,27 @@ def test_generate_minimax_move():
 
     action, _ = generate_move(test_board, PLAYER2, None)
     assert (action == 0)
+
+
+def test_generate_minimax_id_move():
+    """
+    Checks that the iterative deepening agent stays within its time budget,
+    reports the completed depth and finds the winning move
+    """
+    from time import time
+    from agents.agent_minimax import generate_move_minimax_id
+    from agents.common import PLAYER1, PLAYER2
+
+    test_board = np.zeros((6, 7))
+    test_board[3:, 0] = PLAYER1
+    test_board[5, 1:3] = PLAYER2
+
+    t0 = time()
+    action, saved_state = generate_move_minimax_id(test_board, PLAYER1, None, 0.3)
+    assert time() - t0 < 2.
+    assert action == 0
+    assert saved_state.depth >= 1
+
+    action, saved_state = generate_move_minimax_id(test_board, PLAYER2, saved_state, 10., 3)
+    assert action == 0
+    assert saved_state.depth == 3
@@ -0,0 +1,63 @@
+import numpy as np
+
+from agents.common import PLAYER1, PLAYER2, Board
+
+
+def test_negamax_matches_minimax():
+    """
+    assert that principal variation search returns the alpha-beta value seen from the player to move
+    """
+    from agents.agent_negamax.negamax import negamax
+    from agents.agent_minimax.minimax import minimax_ab
+    from agents.transposition import TranspositionTable
+    from agents.ordering import MoveOrdering
+
+    board = Board()
+    for action in [3, 3, 4, 2, 2]:
+        board.play(action)
+
+    for depth in (1, 2, 3, 4):
+        value, _ = minimax_ab(board, depth, -np.inf, np.inf)
+        nega_value, _ = negamax(board, depth, -np.inf, np.inf)
+        nega_value_tt, _ = negamax(board, depth, -np.inf, np.inf, TranspositionTable(1 << 12), None, None,
+                                   MoveOrdering())
+        sign = 1 if board.player == PLAYER1 else -1
+        assert sign * value == nega_value == nega_value_tt
+
+
+def test_aspiration_search():
+    """
+    assert that aspiration windows give the full window value, also when the guess is far off
+    """
+    from agents.agent_negamax.negamax import negamax, aspiration_search
+
+    board = Board()
+    for action in [3, 2, 3]:
+        board.play(action)
+
+    value, _ = negamax(board, 4, -np.inf, np.inf)
+    for guess in (value, value - 1000, value + 1000):
+        assert aspiration_search(board, 4, guess, 10)[0] == value
+
+
+def test_generate_negamax_move():
+    """
+    assert that the negamax agent returns a move, keeps its saved state and finds the winning move
+    """
+    from agents.agent_negamax import generate_move
+    from agents.agent_minimax.minimax import MinimaxSavedState
+
+    test_board = np.zeros((6, 7))
+    action, saved_state = generate_move(test_board, PLAYER1, None, 0.2)
+    assert 0 <= action < 7
+    assert isinstance(saved_state, MinimaxSavedState)
+
+    test_board[3:, 0] = PLAYER1
+    test_board[5, 1:3] = PLAYER2
+
+    action, saved_state = generate_move(test_board, PLAYER1, saved_state, 0.2)
+    assert action == 0
+
+    action, saved_state = generate_move(test_board, PLAYER2, saved_state, 10., 3)
+    assert action == 0
+    assert saved_state.depth == 3
@@ -0,0 +1,74 @@
+import numpy as np
+
+from agents.bitboard import BitBoard
+from agents.common import PLAYER1, PLAYER2, initialize_game_state, apply_player_action
+from agents.opening_book import OpeningBook, build_opening_book, canonical_key, mirror_bits
+
+
+def test_mirror_bits():
+    """
+    assert that mirroring moves the pieces to the mirrored columns and that mirrored positions share their key
+    """
+    bitboard = BitBoard()
+    mirrored = BitBoard()
+    for action in [0, 1, 1, 3]:
+        bitboard.play(action)
+        mirrored.play(6 - action)
+
+    assert mirror_bits(bitboard.position) == mirrored.position
+    assert mirror_bits(mirror_bits(bitboard.mask)) == bitboard.mask
+    assert canonical_key(bitboard)[0] == canonical_key(mirrored)[0]
+    assert canonical_key(bitboard)[1] != canonical_key(mirrored)[1]
+
+
+def test_opening_book_lookup(tmp_path):
+    """
+    assert that a saved book is memory-mapped on load and answers for positions, their mirror images and
+    nothing else
+    """
+    start = BitBoard()
+    left = BitBoard()
+    left.play(1)
+    right = BitBoard()
+    right.play(5)
+
+    book = OpeningBook.from_moves({canonical_key(start)[0]: 3, canonical_key(left)[0]: 2})
+    path = str(tmp_path / 'book.npy')
+    book.save(path)
+    book = OpeningBook.load(path)
+
+    assert isinstance(book._table, np.memmap)
+    assert len(book) == 2
+    assert book.lookup(start) == 3
+    assert book.lookup(left) == 2
+    assert book.lookup(right) == 4
+
+    other = BitBoard()
+    other.play(3)
+    assert book.lookup(other) is None
+
+
+def test_build_opening_book():
+    """
+    assert that the built book covers every position up to max_ply and that the agents play its moves
+    """
+    from agents.agent_minimax import generate_move
+    from agents.agent_mcts import Connect4MCTS
+
+    book = build_opening_book(max_ply=1, depth=2)
+    assert len(book) == 5  # the empty board and four distinct first moves
+
+    board = initialize_game_state()
+    apply_player_action(board, 6, PLAYER1)
+    book_move = book.lookup_board(board, PLAYER2)
+    assert book_move is not None
+
+    action, _ = generate_move(board, PLAYER2, None, 2, book=book)
+    assert action == book_move
+
+    agent = Connect4MCTS(max_iter=1, book=book)
+    action, _ = agent.generate_move_mcts(board, PLAYER2, None)
+    assert action == book_move
+
+    apply_player_action(board, 0, PLAYER2)
+    assert book.lookup_board(board, PLAYER1) is None
@@ -0,0 +1,57 @@
+import numpy as np
+
+from agents.common import PLAYER1, PLAYER2, Board
+from agents.ordering import MoveOrdering, center_order
+
+
+def test_center_order():
+    assert center_order(list(range(7))) == [3, 2, 4, 1, 5, 0, 6]
+    assert center_order([0, 6, 5]) == [5, 0, 6]
+
+
+def test_move_ordering_priorities():
+    """
+    assert that the hash move comes first, then killers, then history, then center columns
+    """
+    ordering = MoveOrdering()
+    moves = list(range(7))
+
+    assert ordering.order(moves, 0, PLAYER1) == [3, 2, 4, 1, 5, 0, 6]
+    assert ordering.order(moves, 0, PLAYER1, hash_move=6)[0] == 6
+
+    ordering.record_cutoff(0, 2, PLAYER1, 3)
+    ordering.record_cutoff(5, 2, PLAYER1, 1)
+    assert ordering.order(moves, 2, PLAYER1)[:2] == [5, 0]
+    assert ordering.order(moves, 2, PLAYER1, hash_move=1)[:3] == [1, 5, 0]
+
+    # no killers on ply 4, history of PLAYER1 prefers 0 (depth 3) before 5 (depth 1)
+    assert ordering.order(moves, 4, PLAYER1)[:3] == [0, 5, 3]
+    assert ordering.order(moves, 4, PLAYER2)[0] == 3
+    assert ordering.cutoffs == 2
+
+    # killers are cleared, history halved: 9 // 2 for column 0 and 1 // 2 for column 5
+    ordering.new_search()
+    assert ordering.order(moves, 2, PLAYER1)[:2] == [0, 3]
+    assert ordering.cutoffs == 0
+
+
+def test_move_ordering_node_count():
+    """
+    assert that the search is deterministic and killer/history ordering searches fewer nodes at equal depth
+    """
+    from agents.agent_minimax.minimax import minimax_ab
+
+    board = Board()
+    for action in [3, 3, 4, 2]:
+        board.play(action)
+
+    results = []
+    nodes = []
+    for use_heuristics in (False, True, True):
+        ordering = MoveOrdering(use_killers=use_heuristics, use_history=use_heuristics)
+        results.append(minimax_ab(board, 5, -np.inf, np.inf, ordering=ordering))
+        nodes.append(ordering.nodes)
+
+    assert results[0] == results[1] == results[2]
+    assert nodes[1] == nodes[2]
+    assert nodes[1] < nodes[0]
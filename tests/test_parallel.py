@@ -0,0 +1,102 @@
+import gc
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from agents.agent_mcts import RootParallelMCTS
+from agents.common import PLAYER1, NO_PLAYER
+
+
+def test_root_parallel_merge():
+    """
+    assert that the root statistics of all workers are merged and the split budget is kept
+    """
+    with RootParallelMCTS(n_workers=2, split_budget=True, max_iter=41, use_heuristic=False) as agent:
+        action, _ = agent.generate_move_mcts(np.full((6, 7), NO_PLAYER), PLAYER1, None)
+
+        visits, scores = agent.get_root_stats()
+        assert agent.playouts == 41
+        assert visits.sum() == 41
+        assert (scores <= visits).all()
+        assert agent.playouts_per_second > 0
+
+        board = np.full((6, 7), NO_PLAYER)
+        board[3:, 2] = PLAYER1
+        action, _ = agent.generate_move_mcts(board, PLAYER1, None)
+        assert action == 2  # the workers prove the win and stop early
+        assert agent.playouts < 41
+
+
+def test_tree_parallel():
+    """
+    assert that the workers share one tree, remove their virtual losses and find the winning move
+    """
+    from agents.agent_mcts import Connect4TreeParallelMCTS
+
+    board = np.full((6, 7), NO_PLAYER)
+    board[3:, 2] = PLAYER1
+
+    with Connect4TreeParallelMCTS(n_workers=3, max_iter=60, use_heuristic=False) as agent:
+        action, _ = agent.generate_move_mcts(board, PLAYER1, None)
+
+    tree = agent.get_tree()
+    assert agent.iterations == 60
+    assert tree.visits[0] == 60
+    assert tree.visits[list(tree.children(0))].sum() == 60
+    best = tree.best_child(0)
+    assert action == tree.actions[best]
+    assert tree.scores[best] == tree.visits[best]  # as good as the winning move
+
+
+def test_root_parallel_no_ponder():
+    """
+    assert that pondering is rejected, the workers of the root parallel search only live for one move
+    """
+    with pytest.raises(ValueError):
+        RootParallelMCTS(ponder=True)
+
+
+def test_tree_parallel_unsupported():
+    """
+    assert that early stopping and batched leaves are rejected by the tree parallel search instead of being ignored
+    """
+    from agents.agent_mcts import Connect4TreeParallelMCTS
+
+    for kwargs in ({'early_stop': True}, {'batch_size': 8}, {'batch_evaluation': 'heuristic'}):
+        with pytest.raises(ValueError):
+            Connect4TreeParallelMCTS(**kwargs)
+
+
+def test_tree_parallel_playouts_per_leaf():
+    """
+    assert that the worker processes play and count playouts_per_leaf playouts per leaf
+    """
+    from agents.agent_mcts import Connect4TreeParallelMCTS
+
+    with Connect4TreeParallelMCTS(n_workers=2, max_iter=10, use_heuristic=False, playouts_per_leaf=8) as agent:
+        agent.generate_move_mcts(np.full((6, 7), NO_PLAYER), PLAYER1, None)
+
+    tree = agent.get_tree()
+    assert agent.iterations == 10
+    assert tree.visits[0] == 10 * 8
+    assert tree.pending[0] == 0
+
+
+def test_parallel_pool_shutdown():
+    """
+    assert that the process pools are shut down by close and when an agent is garbage collected without close
+    """
+    from agents.agent_mcts import Connect4TreeParallelMCTS
+
+    for agent_class in (RootParallelMCTS, Connect4TreeParallelMCTS):
+        for collect in (False, True):
+            agent = agent_class(n_workers=1, max_iter=4, use_heuristic=False)
+            agent.generate_move_mcts(np.full((6, 7), NO_PLAYER), PLAYER1, None)
+            assert multiprocessing.active_children()
+            if collect:
+                del agent
+                gc.collect()
+            else:
+                agent.close()
+            assert not multiprocessing.active_children()
@@ -0,0 +1,75 @@
+import numpy as np
+
+from agents.bitboard import BitBoard
+from agents.common import Board, PLAYER1, PLAYER2, initialize_game_state
+from agents.playout import random_playouts, DRAW, LOSS
+
+
+def _drawn_game(rng: np.random.Generator) -> list:
+    """
+    :return: moves of a random game that fills the board without a win
+    """
+    while True:
+        board = Board(initialize_game_state())
+        while not board.is_full():
+            board.play(rng.choice(board.valid_actions()))
+            if board.is_win():
+                break
+        else:
+            return board.moves
+
+
+def test_random_playouts_counts():
+    """
+    assert that every start position gets n_playouts games and that finished or forced games have fixed results
+    """
+    rng = np.random.default_rng(1)
+    moves = _drawn_game(rng)
+
+    last_move = BitBoard()
+    for action in moves[:-1]:
+        last_move.play(action)
+    full = last_move.copy()
+    full.play(moves[-1])
+
+    won = BitBoard()
+    for action in [0, 1, 0, 1, 0, 1, 0]:
+        won.play(action)
+
+    positions = [BitBoard().position, last_move.position, full.position, won.position]
+    masks = [BitBoard().mask, last_move.mask, full.mask, won.mask]
+    counts = random_playouts(np.array(positions), np.array(masks), 100, rng)
+
+    assert counts.shape == (4, 3)
+    assert (counts.sum(axis=1) == 100).all()
+    assert counts[1, DRAW] == 100
+    assert counts[2, DRAW] == 100
+    assert counts[3, LOSS] == 100
+
+
+def test_random_playouts_statistics():
+    """
+    assert that the player to move wins most random games with three open pieces in the bottom row
+    """
+    bitboard = BitBoard()
+    for action in [2, 2, 3, 3, 4, 4]:
+        bitboard.play(action)
+
+    wins, draws, losses = random_playouts(bitboard.position, bitboard.mask, 2000, np.random.default_rng(2))[0]
+    assert wins > 2 * losses
+
+
+def test_mcts_playouts_per_leaf():
+    """
+    assert that the agents count every batched playout as a visit
+    """
+    from agents.agent_mcts import Connect4MCTS, Connect4ArrayMCTS
+
+    agent = Connect4MCTS(use_heuristic=False, max_iter=10, playouts_per_leaf=16)
+    agent.generate_move_mcts(initialize_game_state(), PLAYER2, None)
+    assert agent.get_root_node().get_n() == 10 * 16
+
+    agent = Connect4ArrayMCTS(use_heuristic=False, max_iter=10, playouts_per_leaf=16)
+    action, _ = agent.generate_move_mcts(initialize_game_state(), PLAYER1, None)
+    assert agent.get_tree().visits[0] == 10 * 16
+    assert 0 <= action < 7
@@ -0,0 +1,117 @@
+import time
+
+import numpy as np
+
+from agents.bitboard import BitBoard
+from agents.common import PLAYER1, PLAYER2, NO_PLAYER
+from agents.solver import Solver, SIZE, SOLVER_THRESHOLD, solve_endgame
+
+
+def brute_force_value(bitboard: BitBoard) -> int:
+    """
+    exhaustive search of the value defined in SolveResult.value
+    """
+    moves = bin(bitboard.mask).count('1')
+    for action in bitboard.valid_actions():
+        if bitboard.is_winning_move(action):
+            return SIZE - moves
+    if bitboard.is_full():
+        return 0
+
+    best = -SIZE
+    for action in bitboard.valid_actions():
+        bitboard.play(action)
+        best = max(best, -brute_force_value(bitboard))
+        bitboard.undo()
+    return best
+
+
+def random_late_positions(n: int, pieces: int, seed: int):
+    rng = np.random.default_rng(seed)
+    positions = []
+    while len(positions) < n:
+        bitboard = BitBoard()
+        for _ in range(pieces):
+            action = rng.choice(bitboard.valid_actions())
+            if bitboard.is_winning_move(action):
+                break
+            bitboard.play(action)
+        else:
+            positions.append(bitboard)
+    return positions
+
+
+def test_solver_exact():
+    """
+    assert that the solver value, distance and best move agree with an exhaustive search
+    """
+    solver = Solver()
+    for bitboard in random_late_positions(30, 33, 0):
+        result = solver.solve(bitboard)
+        value = brute_force_value(bitboard)
+        assert result.value == value
+        assert result.outcome == np.sign(value)
+
+        moves = bin(bitboard.mask).count('1')
+        if value > 0:
+            assert result.plies == SIZE + 1 - value - moves
+        elif value == 0:
+            assert result.plies == SIZE - moves
+
+        bitboard.play(result.move)
+        if bitboard.is_win():
+            move_value = SIZE - moves
+        elif bitboard.is_full():
+            move_value = 0
+        else:
+            move_value = -brute_force_value(bitboard)
+        assert move_value == value
+
+
+def test_solver_default_threshold_time():
+    """
+    assert that positions with as many empty cells as the default threshold of the agents are solved quickly,
+    as the agents solve them instead of searching
+    """
+    for bitboard in random_late_positions(20, SIZE - SOLVER_THRESHOLD, 2):
+        start = time.time()
+        assert solve_endgame(bitboard.to_array(), bitboard.player, Solver(), SOLVER_THRESHOLD) is not None
+        assert time.time() - start < 1.
+
+
+def test_solve_endgame_threshold():
+    """
+    assert that only boards with few empty cells of unfinished games get solved
+    """
+    solver = Solver()
+    board = np.zeros((6, 7))
+    assert solve_endgame(board, PLAYER1, solver, 16) is None
+
+    bitboard = random_late_positions(1, 30, 1)[0]
+    board = bitboard.to_array()
+    assert solve_endgame(board, bitboard.player, solver, 11) is None
+    assert solve_endgame(board, bitboard.player, solver, 12).move in bitboard.valid_actions()
+
+    board = np.full((6, 7), PLAYER2)
+    board[0, 0] = NO_PLAYER
+    assert solve_endgame(board, PLAYER1, solver, 16) is None
+
+
+def test_agents_play_solved_move():
+    """
+    assert that both agents switch to the solver late in the game and play its move
+    """
+    from agents.agent_minimax import generate_move
+    from agents.agent_mcts import Connect4MCTS
+
+    solver = Solver()
+    for bitboard in random_late_positions(5, 30, 2):
+        board = bitboard.to_array()
+        result = solver.solve(bitboard)
+
+        action, _ = generate_move(board, bitboard.player, None)
+        assert action == result.move
+
+        agent = Connect4MCTS(max_iter=1)
+        action, _ = agent.generate_move_mcts(board, bitboard.player, None)
+        assert action == result.move
@@ -18,30 +18,33 @@ def test_backpropagation():
 
     scores = np.random.choice([0, 0.5, 1], 3)
 
-    child_node_21.set_score(scores[0])
-    child_node_12.set_score(scores[1])
-    child_node_11.set_score(scores[2])
-
     child_node_12.add_child(child_node_21)
 
     parent_node.add_child(child_node_11)
     parent_node.add_child(child_node_12)
 
-    parent_node.backpropagate([1, 0])
+    child_node_21.backpropagate(scores[0])
+    child_node_11.backpropagate(scores[1])
 
+    assert (child_node_21.get_parent() is child_node_12)
+    assert (child_node_12.get_score() == scores[0])
+    assert (child_node_12.get_n() == 1)
     assert (parent_node.get_score() == (scores[0]+scores[1]))
-    # assert (parent_node.get_n() == 3)
-
-    score = np.random.choice([0, 0.5, 1])
+    assert (parent_node.get_n() == 2)
 
     child_node_13 = State(test_board)
-    child_node_13.set_score(score)
     parent_node.add_child(child_node_13)
 
-    parent_node.backpropagate([2])
+    child_node_13.backpropagate(scores[2])
 
-    assert (parent_node.get_score() == (scores[0]+scores[1] + score))
-    # assert (parent_node.get_n() == 4)
+    assert (parent_node.get_score() == (scores[0]+scores[1]+scores[2]))
+    assert (parent_node.get_n() == 3)
+
+    child_node_12.make_root()
+    child_node_21.backpropagate(scores[2])
+
+    assert (child_node_12.get_n() == 2)
+    assert (parent_node.get_n() == 3)
 
 
 def test_state_find_child():
@@ -174,3 +177,105 @@ def test_state_add_get_children():
     assert (children[1].get_board() == test_board_12).all()
     assert (children[1].get_children()[0].get_board() == test_board_21).all()
 
+
+
+def test_state_get_child():
+    """
+    assert that children are added by reference and looked up by their board
+    """
+    test_board_1 = np.full((6, 7), NO_PLAYER)
+    test_board_2 = apply_player_action(test_board_1, np.int8(0), PLAYER1, copy=True)
+    test_board_3 = apply_player_action(test_board_2, np.int8(2), PLAYER2, copy=True)
+
+    state_1 = State(test_board_1)
+    state_2 = State(test_board_2.astype(float))
+    state_1.add_child(state_2)
+
+    assert state_1.get_children()[0] is state_2
+    assert state_1.get_child(test_board_2) is state_2
+    assert state_1.get_child(test_board_3) is None
+    assert state_2.get_child(test_board_3) is None
+
+
+def test_state_prove():
+    """
+    assert that a move is lost by one lost reply, won only if all replies are won, and that proofs reach the root
+    """
+    test_board = np.full((6, 7), NO_PLAYER)
+
+    root = State(test_board)
+    parent = State(test_board, action=0, n_replies=1)
+    root.add_child(parent)
+    root.add_child(State(test_board, action=1, n_replies=2))
+
+    won = State(test_board, terminal=True, action=3, n_replies=2)
+    lost = State(test_board, terminal=True, action=4, n_replies=2)
+    unknown = State(test_board, action=4, n_replies=2)
+    won.set_proven(1)
+    lost.set_proven(0)
+    parent.add_child(won)
+    parent.add_child(lost)
+    parent.add_child(unknown)
+
+    assert parent.get_action_proofs() == {3: None, 4: 0}
+    parent.propagate_proof()
+    assert parent.get_proven() is None
+
+    other = State(test_board, terminal=True, action=3, n_replies=2)
+    other.set_proven(1)
+    parent.add_child(other)
+    parent.propagate_proof()
+
+    assert parent.get_action_proofs()[3] == 1
+    assert parent.get_proven() == 1
+    assert root.get_proven() == 1
+
+
+def test_state_shared_child():
+    """
+    assert that a child shared by two parents keeps its first parent and is reached by a move of its own per parent
+    """
+    test_board = np.full((6, 7), NO_PLAYER)
+
+    parent_1 = State(test_board)
+    parent_2 = State(test_board)
+    child = State(test_board, terminal=True, action=2, n_replies=1)
+    child.set_proven(1)
+    parent_1.add_child(child)
+    parent_2.add_child(child, action=5, n_replies=1)
+
+    assert child.get_parent() is parent_1
+    assert parent_1.get_child_actions() == [2]
+    assert parent_2.get_child_actions() == [5]
+    assert parent_2.get_action_proofs() == {5: 1}
+    assert parent_1.count_nodes() == parent_2.count_nodes() == 2
+
+
+def test_state_prove_path():
+    """
+    assert that a shared child proves its other parent along a path through that parent, but not along the parent
+    links
+    """
+    test_board = np.full((6, 7), NO_PLAYER)
+
+    root = State(test_board)
+    parent_1 = State(test_board, action=0, n_replies=1)
+    parent_2 = State(test_board, action=1, n_replies=1)
+    root.add_child(parent_1)
+    root.add_child(parent_2)
+
+    child = State(test_board, action=2, n_replies=1)
+    leaf = State(test_board, action=3, n_replies=1)
+    parent_1.add_child(child)
+    parent_2.add_child(child)
+    parent_2.add_child(leaf)
+    child.add_child(State(test_board, terminal=True, action=4, n_replies=0))
+    child.get_children()[0].set_proven(1)
+
+    child.propagate_proof()
+    assert child.get_proven() == parent_1.get_proven() == root.get_proven() == 1
+    assert parent_2.get_proven() is None
+
+    leaf.propagate_proof([root, parent_2, leaf])
+    assert leaf.get_proven() is None
+    assert parent_2.get_proven() == 1
@@ -0,0 +1,105 @@
+import numpy as np
+
+from agents.common import PLAYER1, Board, zobrist_hash
+from agents.transposition import TranspositionTable, EXACT, LOWER
+
+
+def test_zobrist_incremental():
+    """
+    assert that the incrementally updated key matches the key computed from scratch
+    """
+    from agents.bitboard import BitBoard
+
+    board = Board()
+    bitboard = BitBoard()
+    keys = [board.zobrist]
+    for action in [3, 3, 2, 4, 4, 0, 6]:
+        board.play(action)
+        bitboard.play(action)
+        keys.append(board.zobrist)
+        assert board.zobrist == bitboard.zobrist == zobrist_hash(board.array, board.player)
+
+    assert len(set(keys)) == len(keys)
+
+    for key in reversed(keys[:-1]):
+        board.undo()
+        bitboard.undo()
+        assert board.zobrist == bitboard.zobrist == key
+
+    transposed = Board()
+    for action in [2, 0, 3, 0, 6]:
+        transposed.play(action)
+    board = Board()
+    for action in [6, 0, 3, 0, 2]:
+        board.play(action)
+    assert transposed.zobrist == board.zobrist
+
+
+def test_transposition_table_store_probe():
+    """
+    assert that entries can be found again and the counters are updated
+    """
+    table = TranspositionTable(16)
+    assert table.probe(5) is None
+
+    table.store(5, 3, EXACT, 1.5, 2)
+    entry = table.probe(5)
+    assert entry.depth == 3 and entry.flag == EXACT and entry.value == 1.5 and entry.move == 2
+
+    assert table.probes == 2
+    assert table.hits == 1
+    assert table.hit_rate() == 0.5
+    assert len(table) == 1
+
+
+def test_transposition_table_replacement():
+    """
+    assert that deeper entries of the current search are kept and entries of older searches are replaced
+    """
+    table = TranspositionTable(16)
+    table.store(1, 4, EXACT, 1., 0)
+    table.store(17, 2, LOWER, 2., 1)
+    assert table.probe(1) is not None
+    assert table.probe(17) is None
+
+    table.store(17, 5, LOWER, 2., 1)
+    assert table.probe(17) is not None
+    assert table.overwrites == 1
+
+    table.new_search()
+    table.store(1, 1, EXACT, 1., 0)
+    assert table.probe(1) is not None
+    assert table.probe(17) is None
+    assert len(table) == 1
+
+    table.store(2, 1, EXACT, 1., 0)
+    assert len(table) == 2
+    table.clear()
+    assert len(table) == 0
+
+
+def test_minimax_ab_transposition_table():
+    """
+    assert that the transposition table does not change the searched value and persists through saved_state
+    """
+    from agents.agent_minimax.minimax import minimax_ab, generate_move_minimax_ab, MinimaxSavedState
+
+    board = Board()
+    for action in [3, 3, 2, 4]:
+        board.play(action)
+
+    table = TranspositionTable(1 << 12)
+    value, _ = minimax_ab(board, 3, -np.inf, np.inf)
+    value_tt, _ = minimax_ab(board, 3, -np.inf, np.inf, table)
+    assert value == value_tt
+    assert table.stores > 0
+
+    action, saved_state = generate_move_minimax_ab(board.array, PLAYER1, None)
+    assert isinstance(saved_state, MinimaxSavedState)
+    probes = saved_state.table.probes
+
+    board.play(action)
+    board.play(0)
+    _, saved_state_2 = generate_move_minimax_ab(board.array, PLAYER1, saved_state)
+    assert saved_state_2 is saved_state
+    assert saved_state.table.probes > probes
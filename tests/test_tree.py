@@ -0,0 +1,157 @@
+import numpy as np
+import pytest
+
+from agents.agent_mcts import ArrayTree, Connect4ArrayMCTS, Connect4TreeParallelMCTS, TreeKnowledge
+from agents.agent_mcts.tree import NO_NODE
+from agents.common import PLAYER1, PLAYER2, NO_PLAYER
+
+
+def test_array_tree_grow():
+    """
+    assert that children are stored as contiguous blocks and that the arrays grow past the initial capacity
+    """
+    tree = ArrayTree(capacity=2)
+    root = tree.add_root(0, 0)
+
+    first = tree.add_children(root, [1, 2, 3], [1, 2, 3], [0, 1, 2], [False, False, True])
+    assert tree.capacity >= 4
+    assert list(tree.children(root)) == [first, first + 1, first + 2]
+    assert (tree.parent[first:first + 3] == root).all()
+    assert tree.terminal[first + 2]
+
+    second = tree.add_children(first, [4] * 7, [5] * 7, list(range(7)), [False] * 7)
+    assert len(tree) == 11
+    assert tree.capacity == 16
+    assert list(tree.children(first)) == list(range(second, second + 7))
+    assert tree.is_leaf(second)
+    assert tree.find(4, 5) == second
+    assert tree.find(9, 9) == NO_NODE
+
+
+def test_array_tree_backpropagate_select():
+    """
+    assert that playout results reach all ancestors and that unvisited children are selected first
+    """
+    tree = ArrayTree()
+    root = tree.add_root(0, 0)
+    first = tree.add_children(root, [0, 0], [1, 2], [0, 1], [False, False])
+    leaf = tree.add_children(first, [0], [3], [0], [False])
+
+    tree.backpropagate(leaf, 1)
+    assert tree.visits[root] == tree.visits[first] == tree.visits[leaf] == 1
+    assert tree.scores[root] == 1
+    assert tree.select_child(root, 2, np.log(1)) == first + 1
+
+    tree.backpropagate(first + 1, 0.5)
+    assert tree.best_child(root) == first
+    assert tree.scores[root] == 1.5
+
+    subtree = tree.subtree(first)
+    assert len(subtree) == 2
+    assert subtree.capacity == tree.capacity
+    assert subtree.find(0, 3) == 1
+    assert subtree.find(0, 2) == NO_NODE
+    assert subtree.visits[0] == 1
+    assert subtree.parent[1] == 0
+    assert subtree.masks[1] == 3
+
+
+def test_array_mcts_generate_move():
+    """
+    assert that the array tree agent finds the winning move and keeps the subtree of the next position
+    """
+    board = np.full((6, 7), NO_PLAYER)
+    board[3:, 2] = PLAYER1
+    board[5, 4:6] = PLAYER2
+
+    agent = Connect4ArrayMCTS(use_heuristic=False, max_iter=200)
+    action, _ = agent.generate_move_mcts(board, PLAYER1, None)
+    assert action == 2
+
+    board = np.full((6, 7), NO_PLAYER)
+    agent = Connect4ArrayMCTS(max_iter=50)
+    action, _ = agent.generate_move_mcts(board, PLAYER1, None)
+    assert 0 <= action < 7
+    assert agent.get_tree().visits[0] == 50
+
+    tree = agent.get_tree()
+    child = int(tree.first_child[0])
+    board = tree.bitboard(child, PLAYER1).to_array()
+    assert np.count_nonzero(board) == 2
+
+    agent.set_current_board(board)
+    assert agent.get_tree().visits[0] == tree.visits[child]
+
+
+def test_array_tree_virtual_loss():
+    """
+    assert that a virtual loss steers the selection away from a pending path and is removed by backpropagation
+    """
+    tree = ArrayTree()
+    root = tree.add_root(0, 0)
+    first = tree.add_children(root, [0, 0], [1, 2], [0, 1], [False, False])
+
+    tree.add_virtual_loss(first, 1)
+    assert tree.select_child(root, 2, np.log(1)) == first + 1
+    assert tree.visits[root] == 1
+    assert tree.playouts(first) == 0
+
+    tree.backpropagate(first, 1, virtual_loss=1)
+    assert tree.visits[root] == tree.visits[first] == 1
+    assert tree.playouts(first) == 1
+    assert tree.scores[first] == 1
+
+
+def test_array_mcts_pending_leaf():
+    """
+    assert that a leaf whose playout is still pending is not expanded by the next selection
+    """
+    agent = Connect4ArrayMCTS(use_heuristic=False)
+    agent.set_player(PLAYER1)
+    agent.set_current_board(np.full((6, 7), NO_PLAYER))
+
+    tree = agent.get_tree()
+    for _ in range(7):
+        tree.add_virtual_loss(agent.select_leaf(), 1)
+    size = len(tree)
+
+    leaf = agent.select_leaf()
+    assert tree.parent[leaf] == 0
+    assert len(tree) == size
+
+
+def test_array_mcts_batch():
+    """
+    assert that batched iterations evaluate the requested number of leaves and remove all virtual losses
+    """
+    board = np.full((6, 7), NO_PLAYER)
+    board[3:, 2] = PLAYER1
+
+    for evaluation in ('playout', 'heuristic'):
+        agent = Connect4ArrayMCTS(
+            use_heuristic=False, max_iter=100, batch_size=16, batch_evaluation=evaluation, playouts_per_leaf=4
+        )
+        action, _ = agent.generate_move_mcts(board, PLAYER1, None)
+
+        tree = agent.get_tree()
+        children = list(tree.children(0))
+        assert agent.iterations == 100
+        assert tree.visits[children].sum() == tree.visits[0]
+        assert (tree.scores[:len(tree)] <= tree.visits[:len(tree)]).all()
+
+        best = tree.best_child(0)
+        assert action == tree.actions[best]
+        assert tree.scores[best] == tree.visits[best]  # as good as the winning move
+
+
+def test_array_mcts_state_tree_only():
+    """
+    assert that the array tree agents reject the arguments that only apply to the State tree instead of ignoring them
+    """
+    for agent_class in (Connect4ArrayMCTS, Connect4TreeParallelMCTS):
+        for kwargs in (
+                {'max_nodes': 100}, {'max_bytes': 10000}, {'memory_policy': 'freeze'}, {'ponder': True},
+                {'prior': TreeKnowledge.from_stats({})}, {'transpositions': True}):
+            with pytest.raises(ValueError):
+                agent_class(**kwargs)
+        agent_class(max_nodes=None, memory_policy='prune', transpositions=False)